@@ -0,0 +1,50 @@
+"""Line-of-sight and visibility tools for the TrailRadar LOS research module.
+
+Importing the package loads only the headless core (numpy + rasterio): ``Dem``,
+``line_of_sight`` and ``viewshed``. Everything else below is imported on first
+attribute access, and optional dependencies (pyproj, Pillow, shapely,
+starlette, ...) only inside the functions that need them. Batch jobs run
+through ``python -m los_module <command>``.
+"""
+
+from importlib import import_module
+
+from .dem import Dem
+from .los import LosResult, line_of_sight
+from .viewshed import Viewshed, viewshed
+
+# name -> submodule, resolved lazily by ``__getattr__``
+_LAZY = {
+    "DemSampler": "sampler",
+    "ElevationSamples": "sampler",
+    "curvature_drop": "los",
+    "elevation_to_terrain_rgb": "tiles",
+    "terrain_rgb_to_elevation": "tiles",
+    "encode_tile": "tiles",
+    "destripe_mask": "destripe",
+    "TilePyramid": "tile_dem",
+    "ensure_raw_cache": "rawdem",
+    "Track": "route",
+    "load_track": "route",
+    "RouteIndex": "route_index",
+    "ViewshedCache": "cache",
+    "ViewshedTracker": "incremental",
+    "cumulative_viewshed": "cumulative",
+    "RouteVisibilityIndex": "visibility_index",
+    "HorizonProfile": "horizon",
+    "horizon_profile": "horizon",
+}
+
+__all__ = ["Dem", "LosResult", "Viewshed", "line_of_sight", "viewshed", *_LAZY]
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f".{_LAZY[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
@@ -0,0 +1,53 @@
+"""Batch entry point: ``python -m los_module <command> [args]``.
+
+Each command is the ``main`` of one module, imported only when it runs, so
+``python -m los_module los ...`` never loads the tile server, GeoPandas or any
+notebook dependency.
+"""
+
+from __future__ import annotations
+
+import importlib
+import sys
+
+# command -> (module, one-line help)
+COMMANDS = {
+    "los": ("los", "batch LOS from one observer to route / waypoint targets"),
+    "viewshed": ("viewshed", "viewshed of one observer to GeoTIFF / GeoJSON / FlatGeobuf"),
+    "cumulative": ("cumulative", "cumulative viewshed over many observers"),
+    "index": ("visibility_index", "route visibility intervals per waypoint"),
+    "horizon": ("horizon", "horizon profiles for fixed observers"),
+    "raw": ("rawdem", "raw memory-mapped DEM cache"),
+    "cog": ("cog", "prepare / validate COG DEMs"),
+    "smooth": ("smoothing", "Gaussian-smooth a DEM into a COG"),
+    "pyramid": ("pyramid", "terrain-RGB MBTiles pyramid"),
+    "tiles": ("tile_server", "terrain-RGB tile server"),
+    "los-service": ("los_service", "batch athlete visibility server"),
+    "bench": ("bench", "performance benchmarks"),
+}
+
+
+def _usage():
+    width = max(map(len, COMMANDS))
+    lines = ["usage: python -m los_module <command> [args]", "", "commands:"]
+    lines += [f"  {name.ljust(width)}  {text}" for name, (_, text) in COMMANDS.items()]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] in ("-h", "--help"):
+        print(_usage())
+        return 0 if argv else 2
+    command, rest = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(f"unknown command {command!r}\n\n{_usage()}", file=sys.stderr)
+        return 2
+    module = importlib.import_module(f".{COMMANDS[command][0]}", __package__)
+    sys.argv[0] = f"python -m los_module {command}"
+    module.main(rest)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
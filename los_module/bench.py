@@ -0,0 +1,434 @@
+"""Performance benchmarks for the LOS module.
+
+    python -m los_module.bench encoders DEM_4326_smooth.tif --zoom 12 --tiles 64 --json enc.json
+    python -m los_module.bench suite --dem DEM.tif --json bench.json --baseline main.json
+
+``suite`` times the live paths (batch LOS pairs/s, viewshed ms by radius,
+sampler points/s, tile-server p50/p99 and bytes, peak RSS) on a synthetic
+fractal DEM generated locally and, when ``--dem`` exists, on a crop of the
+TOR330 DEM. Results are one JSON document; ``--baseline`` prints the change
+of each headline metric against an earlier run.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from .tiles import ENCODERS, elevation_to_terrain_rgb, encode_tile
+
+SUITE_VERSION = 1
+DEFAULT_RADII = (1_000, 2_500, 5_000, 10_000)
+DEFAULT_LOS_DISTANCE = 5_000.0
+
+
+def bench_encoders(dem_path, zoom=12, max_tiles=64, tilesize=512, encoders=None, repeat=3):
+    """Time every tile encoder on the same terrain-RGB tiles from ``dem_path``.
+
+    Tiles are taken over the DEM extent at ``zoom`` and resampled once, so
+    only encoding is timed. Returns one dict per encoder with mean/p90 ms and
+    mean/total bytes.
+    """
+    from rio_tiler.errors import TileOutsideBounds
+
+    from .pyramid import dem_bounds_4326, pyramid_tiles
+    from .tiles import TerrainTileRenderer
+
+    renderer = TerrainTileRenderer(dem_path, tilesize)
+    tiles = pyramid_tiles(dem_bounds_4326(dem_path), zoom, zoom)
+    step = max(1, len(tiles) // max_tiles)
+    rgbs = []
+    for z, x, y in tiles[::step][:max_tiles]:
+        try:
+            rgbs.append(elevation_to_terrain_rgb(renderer.elevation(z, x, y)))
+        except TileOutsideBounds:
+            continue
+    renderer.close()
+
+    results = []
+    for name in encoders or ENCODERS:
+        times, sizes = [], []
+        for rgb in rgbs:
+            best = np.inf
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                body = encode_tile(rgb, name)
+                best = min(best, time.perf_counter() - t0)
+            times.append(best * 1000)
+            sizes.append(len(body))
+        results.append({
+            "encoder": name,
+            "tiles": len(rgbs),
+            "tilesize": tilesize,
+            "zoom": zoom,
+            "mean_ms": round(float(np.mean(times)), 2),
+            "p90_ms": round(float(np.percentile(times, 90)), 2),
+            "mean_bytes": int(np.mean(sizes)),
+            "total_bytes": int(np.sum(sizes)),
+        })
+    return results
+
+
+def fractal_dem(path, size=2048, res=30.0, hurst=0.8, relief=2500.0, seed=0,
+                crs="EPSG:32632", origin=(350_000.0, 5_080_000.0)):
+    """Write a ``size`` x ``size`` fractal (1/f spectral synthesis) DEM to ``path``.
+
+    ``hurst`` sets the roughness (higher is smoother); heights span ``relief``
+    metres above 400 m. The same arguments always give the same raster.
+    """
+    import rasterio
+    from affine import Affine
+
+    rng = np.random.default_rng(seed)
+    fy = np.fft.fftfreq(size)[:, None]
+    fx = np.fft.rfftfreq(size)[None, :]
+    f = np.hypot(fx, fy)
+    f[0, 0] = 1.0
+    spectrum = (rng.standard_normal(f.shape) + 1j * rng.standard_normal(f.shape)) * f ** -(hurst + 1)
+    spectrum[0, 0] = 0.0
+    z = np.fft.irfft2(spectrum, s=(size, size))
+    z = ((z - z.min()) / np.ptp(z) * relief + 400.0).astype(np.float32)
+
+    profile = {
+        "driver": "GTiff", "width": size, "height": size, "count": 1, "dtype": "float32",
+        "crs": crs, "transform": Affine(res, 0.0, origin[0], 0.0, -res, origin[1]),
+        "nodata": -9999.0, "tiled": True, "blockxsize": 512, "blockysize": 512,
+    }
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(z, 1)
+    return path
+
+
+def crop_dem(src_path, dst_path, center=None, size=20_000.0):
+    """Write a ``size`` metre square of a projected DEM around lng/lat ``center`` (default: middle)."""
+    import rasterio
+
+    from .dem import Dem
+
+    with rasterio.open(src_path) as src:
+        if src.crs.is_geographic:
+            raise ValueError(f"{src_path} is geographic; crop a projected (metre) DEM")
+        if center is None:
+            b = src.bounds
+            cx, cy = (b.left + b.right) / 2, (b.bottom + b.top) / 2
+        else:
+            from pyproj import Transformer
+
+            cx, cy = Transformer.from_crs("EPSG:4326", src.crs, always_xy=True).transform(*center)
+        profile = src.profile
+    half = size / 2
+    dem = Dem.open(src_path, bounds=(cx - half, cy - half, cx + half, cy + half))
+    h, w = dem.shape
+    profile.update(width=w, height=h, transform=dem.transform, dtype="float32", nodata=-9999.0,
+                   driver="GTiff", tiled=True, blockxsize=512, blockysize=512, compress=None)
+    with rasterio.open(dst_path, "w", **profile) as dst:
+        dst.write(np.where(np.isnan(dem.data), np.float32(-9999.0), dem.data), 1)
+    return dst_path
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process so far, or None where unsupported."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KiB on Linux, bytes on macOS.
+    return round(peak / (2**20 if platform.system() == "Darwin" else 2**10), 1)
+
+
+def _best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t0)
+    return out, times
+
+
+def _inner_points(dem, n, margin, rng):
+    """``n`` random x/y points at least ``margin`` metres inside the DEM."""
+    left, bottom, right, top = dem.bounds
+    if right - left <= 2 * margin or top - bottom <= 2 * margin:
+        raise ValueError(f"DEM is too small for a {margin:g} m margin")
+    x = rng.uniform(left + margin, right - margin, n)
+    y = rng.uniform(bottom + margin, top - margin, n)
+    return np.column_stack([x, y])
+
+
+def bench_los(dem, pairs=20_000, max_distance=DEFAULT_LOS_DISTANCE, repeat=3, seed=0):
+    """Batch LOS throughput: ``pairs`` random observer -> target pairs up to ``max_distance`` apart."""
+    from .los import line_of_sight
+
+    rng = np.random.default_rng(seed)
+    obs = _inner_points(dem, pairs, max_distance, rng)
+    az = rng.uniform(0, 2 * np.pi, pairs)
+    dist = rng.uniform(100.0, max_distance, pairs)
+    tgt = obs + np.column_stack([np.sin(az), np.cos(az)]) * dist[:, None]
+
+    res, times = _best_of(lambda: line_of_sight(dem, obs, tgt, observer_height=1.7, target_height=1.7), repeat)
+    best = min(times)
+    return {
+        "pairs": pairs,
+        "max_distance": max_distance,
+        "best_s": round(best, 3),
+        "pairs_per_s": int(pairs / best),
+        "visible_frac": round(float(res.visible.mean()), 3),
+    }
+
+
+def bench_viewshed(dem, radii=DEFAULT_RADII, repeat=3):
+    """Viewshed ms for one observer at the DEM centre, per radius that fits in the DEM."""
+    from .viewshed import viewshed
+
+    left, bottom, right, top = dem.bounds
+    observer = ((left + right) / 2, (bottom + top) / 2)
+    rows = []
+    for radius in radii:
+        if 2 * radius > min(right - left, top - bottom):
+            continue
+        vs, times = _best_of(lambda: viewshed(dem, observer, radius), repeat)
+        ms = np.array(times) * 1000
+        rows.append({
+            "radius": radius,
+            "cells": int(vs.mask.size),
+            "visible": int(vs.mask.sum()),
+            "min_ms": round(float(ms.min()), 1),
+            "median_ms": round(float(np.median(ms)), 1),
+        })
+    return rows
+
+
+def bench_sampler(dem, points=1_000_000, methods=("nearest", "bilinear", "bicubic"), repeat=3, seed=0):
+    """Sampler throughput at random WGS84 points inside the DEM, per interpolation method."""
+    from pyproj import Transformer
+
+    from .sampler import DemSampler
+
+    xy = _inner_points(dem, points, 2 * max(dem.res), np.random.default_rng(seed))
+    lng, lat = Transformer.from_crs(dem.crs, "EPSG:4326", always_xy=True).transform(xy[:, 0], xy[:, 1])
+    sampler = DemSampler(dem)
+    rows = []
+    for method in methods:
+        _, times = _best_of(lambda: sampler.sample(lng, lat, method), repeat)
+        rows.append({"method": method, "points": points, "points_per_s": int(points / min(times))})
+    return rows
+
+
+def bench_tile_server(dem_path, zoom=12, max_tiles=64, tilesize=512, encoder="png"):
+    """Client-side latency and bytes of the tile server, cold (rendering) then warm (cached).
+
+    The app from ``tile_server.create_app`` runs under uvicorn on a free local
+    port and is stopped afterwards; requests reuse one keep-alive connection.
+    """
+    import http.client
+    import socket
+
+    import uvicorn
+
+    from .pyramid import dem_bounds_4326, pyramid_tiles
+    from .tile_server import TerrainTileService, create_app
+
+    tiles = pyramid_tiles(dem_bounds_4326(dem_path), zoom, zoom)
+    tiles = tiles[::max(1, len(tiles) // max_tiles)][:max_tiles]
+    _, _, _, ext = ENCODERS[encoder]
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    service = TerrainTileService(dem_path, tilesize=tilesize, encoder=encoder)
+    server = uvicorn.Server(uvicorn.Config(create_app(service), host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    rows = []
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    try:
+        for name in ("cold", "warm"):
+            times, sizes = [], []
+            for z, x, y in tiles:
+                t0 = time.perf_counter()
+                conn.request("GET", f"/tiles/{z}/{x}/{y}.{ext}")
+                resp = conn.getresponse()
+                body = resp.read()
+                times.append((time.perf_counter() - t0) * 1000)
+                sizes.append(len(body))
+            p50, p99 = np.percentile(times, [50, 99])
+            rows.append({
+                "pass": name,
+                "tiles": len(tiles),
+                "zoom": zoom,
+                "p50_ms": round(float(p50), 2),
+                "p99_ms": round(float(p99), 2),
+                "mean_bytes": int(np.mean(sizes)),
+                "total_bytes": int(np.sum(sizes)),
+            })
+    finally:
+        conn.close()
+        server.should_exit = True
+        thread.join()
+    return rows
+
+
+def run_suite(dem_path, label, radii=DEFAULT_RADII, los_pairs=20_000, los_distance=DEFAULT_LOS_DISTANCE,
+              sampler_points=1_000_000, tile_zoom=12, tiles=64, repeat=3):
+    """Every benchmark on one DEM -> one result dict (``peak_rss_mb`` after each stage)."""
+    from .dem import Dem
+
+    dem = Dem.open(dem_path)
+    run = {"dem": label, "path": os.path.abspath(dem_path), "shape": list(dem.shape),
+           "res": [round(float(r), 3) for r in dem.res], "peak_rss_mb": {}}
+    stages = (
+        ("los", lambda: bench_los(dem, los_pairs, los_distance, repeat)),
+        ("viewshed", lambda: bench_viewshed(dem, radii, repeat)),
+        ("sampler", lambda: bench_sampler(dem, sampler_points, repeat=repeat)),
+        ("tiles", lambda: bench_tile_server(dem_path, tile_zoom, tiles)),
+    )
+    for name, fn in stages:
+        run[name] = fn()
+        run["peak_rss_mb"][name] = _peak_rss_mb()
+    return run
+
+
+def suite_document(runs):
+    """Versioned, machine-readable suite output with the host it ran on."""
+    return {
+        "version": SUITE_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "host": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "cpus": os.cpu_count(),
+        },
+        "runs": runs,
+    }
+
+
+def headline_metrics(doc):
+    """Flat {name: value} of the numbers worth comparing between suite runs."""
+    out = {}
+    for run in doc["runs"]:
+        d = run["dem"]
+        if "los" in run:
+            out[f"{d}.los.pairs_per_s"] = run["los"]["pairs_per_s"]
+        for r in run.get("viewshed", []):
+            out[f"{d}.viewshed.r{r['radius']}.median_ms"] = r["median_ms"]
+        for r in run.get("sampler", []):
+            out[f"{d}.sampler.{r['method']}.points_per_s"] = r["points_per_s"]
+        for r in run.get("tiles", []):
+            for k in ("p50_ms", "p99_ms", "mean_bytes"):
+                out[f"{d}.tiles.{r['pass']}.{k}"] = r[k]
+        for stage, mb in run.get("peak_rss_mb", {}).items():
+            if mb is not None:
+                out[f"{d}.peak_rss_mb.{stage}"] = mb
+    return out
+
+
+def compare(doc, baseline):
+    """Rows of baseline vs current for every headline metric present in both."""
+    cur, base = headline_metrics(doc), headline_metrics(baseline)
+    rows = []
+    for name in cur:
+        if name not in base:
+            continue
+        b, c = base[name], cur[name]
+        rows.append({"metric": name, "baseline": b, "current": c,
+                     "change": f"{(c - b) / b:+.1%}" if b else "n/a"})
+    return rows
+
+
+def _print_table(rows):
+    if not rows:
+        return
+    cols = list(rows[0])
+    widths = [max(len(c), *(len(str(r[c])) for r in rows)) for c in cols]
+    print("  ".join(c.ljust(w) for c, w in zip(cols, widths)))
+    for r in rows:
+        print("  ".join(str(r[c]).ljust(w) for c, w in zip(cols, widths)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LOS module benchmarks.")
+    sub = parser.add_subparsers(dest="suite", required=True)
+
+    enc = sub.add_parser("encoders", help="terrain-RGB tile encoder size/latency")
+    enc.add_argument("dem")
+    enc.add_argument("--zoom", type=int, default=12)
+    enc.add_argument("--tiles", type=int, default=64)
+    enc.add_argument("--tilesize", type=int, default=512)
+    enc.add_argument("--json", help="write results to this file")
+
+    run = sub.add_parser("suite", help="LOS / viewshed / sampler / tile-server benchmarks")
+    run.add_argument("--dem", default="DEM.tif", help="TOR330 DEM (projected) to crop, if present")
+    run.add_argument("--center", type=float, nargs=2, metavar=("LNG", "LAT"),
+                     help="crop centre (default: middle of --dem)")
+    run.add_argument("--crop", type=float, default=24_000.0, help="crop side in metres")
+    run.add_argument("--size", type=int, default=2048, help="fractal DEM side in cells")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--radii", type=int, nargs="+", default=list(DEFAULT_RADII))
+    run.add_argument("--pairs", type=int, default=20_000)
+    run.add_argument("--los-distance", type=float, default=DEFAULT_LOS_DISTANCE)
+    run.add_argument("--points", type=int, default=1_000_000)
+    run.add_argument("--zoom", type=int, default=12)
+    run.add_argument("--tiles", type=int, default=64)
+    run.add_argument("--repeat", type=int, default=3)
+    run.add_argument("--workdir", help="where the generated DEMs are kept (default: temp dir)")
+    run.add_argument("--json", help="write results to this file")
+    run.add_argument("--baseline", help="earlier --json output to compare against")
+
+    args = parser.parse_args(argv)
+    if args.suite == "encoders":
+        rows = bench_encoders(args.dem, args.zoom, args.tiles, args.tilesize)
+        _print_table(rows)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(rows, f, indent=2)
+        return
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="los_bench_")
+    os.makedirs(workdir, exist_ok=True)
+    dems = []
+    fractal = os.path.join(workdir, f"fractal_{args.size}_{args.seed}.tif")
+    if not os.path.exists(fractal):
+        fractal_dem(fractal, args.size, seed=args.seed)
+    dems.append((fractal, "fractal"))
+    if os.path.exists(args.dem):
+        crop = os.path.join(workdir, "tor330_crop.tif")
+        crop_dem(args.dem, crop, args.center, args.crop)
+        dems.append((crop, "tor330"))
+    else:
+        print(f"{args.dem} not found; running on the fractal DEM only")
+
+    runs = []
+    for path, label in dems:
+        r = run_suite(path, label, args.radii, args.pairs, args.los_distance, args.points,
+                      args.zoom, args.tiles, args.repeat)
+        print(f"\n== {label} {r['shape'][0]}x{r['shape'][1]} @ {r['res'][0]} m ==")
+        _print_table([r["los"]])
+        for section in ("viewshed", "sampler", "tiles"):
+            print()
+            _print_table(r[section])
+        print(f"peak RSS (MiB): {r['peak_rss_mb']}")
+        runs.append(r)
+    doc = suite_document(runs)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            print()
+            _print_table(compare(doc, json.load(f)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Viewshed result cache: in-memory LRU with a byte budget over an on-disk bitmask tier."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+from affine import Affine
+
+from .viewshed import Viewshed, viewshed
+
+
+def viewshed_key(dem, observer, radius, observer_height=1.7, **params):
+    """Cache key: observer snapped to its DEM cell, height, radius and DEM identity.
+
+    The snapped cell is keyed by its map x/y together with the DEM's
+    transform and shape, since windows of one file (``Dem.open(bounds=...)``,
+    ``Dem.window``) share its ``path`` but not their row/col origin. Any
+    further ``viewshed`` keyword arguments (refraction, target height, ...)
+    are part of the key. In-memory DEMs without a ``path`` are keyed by a
+    hash of their cells and never reach the disk tier.
+    """
+    _, _, x, y = dem.snap(*observer)
+    if dem.path is not None:
+        source = (dem.path, os.stat(dem.path).st_mtime_ns)
+    else:
+        source = ("<memory>", _content_digest(dem.data))
+    return (
+        *source,
+        tuple(round(float(v), 6) for v in dem.transform[:6]),
+        tuple(dem.shape),
+        round(float(x), 3),
+        round(float(y), 3),
+        round(float(observer_height), 2),
+        float(radius),
+        *sorted(params.items()),
+    )
+
+
+# id(array) -> (weakref to the array, digest). The weakref tells a live array
+# from a new one that reuses the id of a collected one.
+_digests = {}
+_digests_lock = threading.Lock()
+
+
+def _content_digest(data):
+    """blake2b of an in-memory DEM array, hashed once per live array."""
+    key = id(data)
+    with _digests_lock:
+        entry = _digests.get(key)
+        if entry is not None and entry[0]() is data:
+            return entry[1]
+    h = hashlib.blake2b(str(data.dtype).encode(), digest_size=16)
+    h.update(np.ascontiguousarray(data))
+    digest = h.hexdigest()
+    ref = weakref.ref(data, lambda _: _digests.pop(key, None))
+    with _digests_lock:
+        _digests[key] = (ref, digest)
+    return digest
+
+
+class ViewshedCache:
+    """Two-tier viewshed cache.
+
+    Hits are served from an in-memory LRU bounded by ``max_bytes`` of mask data;
+    misses fall back to ``cache_dir`` (bit-packed, zlib-compressed ``.npz``)
+    before computing. Observers are snapped to DEM cell centres so spectators
+    clustered at the same aid station share one entry.
+    """
+
+    def __init__(self, max_bytes=256 * 2**20, cache_dir=None):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.disk_hits = self.misses = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_or_compute(self, dem, observer, radius, observer_height=1.7, **kwargs):
+        """Return the cached viewshed for the snapped observer, computing it on a miss."""
+        key = viewshed_key(dem, observer, radius, observer_height, **kwargs)
+        result = self.get(key, dem)
+        if result is None:
+            _, _, x, y = dem.snap(*observer)
+            result = viewshed(dem, (float(x), float(y)), radius, observer_height, **kwargs)
+            with self._lock:
+                self.misses += 1
+            self.put(key, result)
+        return result
+
+    def get(self, key, dem=None):
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+        path = self._disk_path(key)
+        if path is None or not os.path.exists(path):
+            return None
+        result = _load(path, getattr(dem, "crs", None))
+        with self._lock:
+            self.disk_hits += 1
+        self._remember(key, result)
+        return result
+
+    def put(self, key, result):
+        self._remember(key, result)
+        path = self._disk_path(key)
+        if path is not None:
+            _save(path, result)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remember(self, key, result):
+        size = result.mask.nbytes
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.mask.nbytes
+            self._entries[key] = result
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.mask.nbytes
+
+    def _disk_path(self, key):
+        if not self.cache_dir or key[0] == "<memory>":
+            return None
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.npz")
+
+
+def _save(path, result):
+    """Write ``result`` to a unique temp file next to ``path`` and move it into place."""
+    fd, tmp = tempfile.mkstemp(prefix=f"{os.path.basename(path)}.", suffix=".tmp", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez_compressed(
+                f,
+                bits=np.packbits(result.mask),
+                shape=np.array(result.mask.shape),
+                transform=np.array(result.transform[:6]),
+                observer=np.array(result.observer),
+                params=np.array([result.observer_height, result.radius]),
+            )
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def _load(path, crs):
+    with np.load(path) as z:
+        h, w = z["shape"]
+        mask = np.unpackbits(z["bits"], count=int(h) * int(w)).astype(bool).reshape(h, w)
+        height, radius = z["params"]
+        return Viewshed(
+            mask,
+            Affine(*z["transform"]),
+            crs,
+            tuple(z["observer"].tolist()),
+            float(height),
+            float(radius),
+        )
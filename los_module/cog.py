@@ -0,0 +1,98 @@
+"""Cloud-Optimized GeoTIFF preparation for DEM inputs.
+
+    python -m los_module.cog prepare DEM.tif DEM_cog.tif
+    python -m los_module.cog validate DEM_cog.tif
+
+A COG is internally tiled and carries overviews, so coarse reads (low-zoom
+tiles, ``Dem.open(..., res=...)`` previews) are served from a small overview
+instead of decimating the full-resolution raster.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+
+
+def to_cog(
+    src_path,
+    dst_path,
+    compress="DEFLATE",
+    predictor=None,
+    blocksize=512,
+    overview_resampling="AVERAGE",
+    level=None,
+):
+    """Translate any GDAL-readable DEM into a tiled COG with overviews.
+
+    ``predictor`` defaults to floating-point for float rasters and horizontal
+    differencing otherwise. Returns ``dst_path``.
+    """
+    import rasterio
+    from rasterio.shutil import copy as rio_copy
+
+    with rasterio.open(src_path) as src:
+        is_float = src.dtypes[0].startswith("float")
+    if predictor is None:
+        predictor = "FLOATING_POINT" if is_float else "STANDARD"
+    options = {
+        "compress": compress,
+        "predictor": predictor,
+        "blocksize": blocksize,
+        "overviews": "AUTO",
+        "overview_resampling": overview_resampling,
+        "BIGTIFF": "IF_SAFER",
+        "num_threads": "ALL_CPUS",
+    }
+    if level is not None:
+        options["level"] = level
+    tmp = f"{dst_path}.tmp.tif"
+    rio_copy(src_path, tmp, driver="COG", **options)
+    os.replace(tmp, dst_path)
+    return dst_path
+
+
+def validate_cog(path):
+    """(is_valid, errors, warnings) as reported by rio-cogeo."""
+    from rio_cogeo.cogeo import cog_validate
+
+    return cog_validate(path, quiet=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prepare and validate COG DEMs.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    prep = sub.add_parser("prepare", help="convert a DEM into a validated COG")
+    prep.add_argument("src")
+    prep.add_argument("dst")
+    prep.add_argument("--compress", default="DEFLATE", help="DEFLATE, ZSTD, LZW, LERC_ZSTD, ...")
+    prep.add_argument("--predictor", default=None, help="FLOATING_POINT, STANDARD or NO")
+    prep.add_argument("--blocksize", type=int, default=512)
+    prep.add_argument("--level", type=int, default=None, help="compression level")
+    prep.add_argument("--overview-resampling", default="AVERAGE")
+
+    val = sub.add_parser("validate", help="check that a file is a valid COG")
+    val.add_argument("path")
+
+    args = parser.parse_args(argv)
+    if args.command == "prepare":
+        to_cog(
+            args.src, args.dst, args.compress, args.predictor, args.blocksize,
+            args.overview_resampling, args.level,
+        )
+        path = args.dst
+    else:
+        path = args.path
+
+    valid, errors, warnings = validate_cog(path)
+    for w in warnings:
+        print(f"warning: {w}")
+    for e in errors:
+        print(f"error: {e}")
+    print(f"{path}: {'valid' if valid else 'NOT a valid'} COG")
+    raise SystemExit(0 if valid else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Cumulative viewshed over many observers, computed across a process pool.
+
+    python -m los_module.cumulative DEM.tif TOR330-CERT-2025.gpx --every 500 -o cumulative.tif
+
+Workers memory-map the raw DEM cache (see ``rawdem``), so N processes share one
+copy of the raster through the page cache. Each task computes one observer's
+radius-window viewshed and ships it back bit-packed; the parent adds it into a
+per-cell observer count and, optionally, a per-cell bitset of observers.
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+from affine import Affine
+
+from .dem import Dem
+from .rawdem import SIDECAR_SUFFIX, ensure_raw_cache
+from .viewshed import viewshed
+
+_DEM = None
+
+
+def _init_worker(sidecar):
+    global _DEM
+    _DEM = Dem.open(sidecar)
+
+
+def _observer_viewshed(task):
+    i, observer, radius, observer_height, kwargs = task
+    try:
+        vs = viewshed(_DEM, observer, radius, observer_height, **kwargs)
+    except ValueError:
+        return i, None
+    col_off, row_off = ~_DEM.transform * (vs.transform.c, vs.transform.f)
+    return i, (round(row_off), round(col_off), vs.mask.shape, np.packbits(vs.mask))
+
+
+@dataclass
+class CumulativeViewshed:
+    """Per-cell observer counts over the union of the observers' radius windows.
+
+    ``bits`` (when requested) is ``(h, w, ceil(n / 8))`` uint8 in ``np.packbits``
+    order: observer ``i`` is bit ``7 - i % 8`` of byte ``i // 8``. ``valid`` is
+    False for observers that fell off the DEM or on nodata.
+    """
+
+    counts: np.ndarray
+    transform: Affine
+    crs: object
+    observers: np.ndarray
+    valid: np.ndarray
+    radius: float
+    bits: np.ndarray | None = None
+
+    def seen_by(self, i):
+        """Boolean mask of cells visible from observer ``i`` (needs ``bits``)."""
+        if self.bits is None:
+            raise ValueError("cumulative viewshed was computed without bitset=True")
+        return (self.bits[..., i // 8] >> (7 - i % 8)) & 1 == 1
+
+    def to_geotiff(self, path):
+        """Write the counts (0 = not visible from any observer = nodata)."""
+        import rasterio
+
+        h, w = self.counts.shape
+        with rasterio.open(
+            path, "w", driver="GTiff", height=h, width=w, count=1, dtype=self.counts.dtype.name,
+            crs=self.crs, transform=self.transform, nodata=0, compress="deflate",
+        ) as dst:
+            dst.write(self.counts, 1)
+
+
+def cumulative_viewshed(
+    dem_path,
+    observers,
+    radius,
+    observer_height=1.7,
+    bitset=False,
+    workers=None,
+    chunksize=4,
+    cache_dir=None,
+    **kwargs,
+):
+    """Count, for every cell, how many of ``observers`` see it.
+
+    ``dem_path`` is a GeoTIFF (its raw cache is built or reused) or a raw cache
+    sidecar; ``observers`` is an (N, 2) array of x/y in the DEM CRS. Remaining
+    keyword arguments go to ``viewshed``. With ``bitset=True`` the result also
+    records which observers see each cell, at ``ceil(N / 8)`` bytes per cell.
+    """
+    sidecar = dem_path if str(dem_path).endswith(SIDECAR_SUFFIX) else ensure_raw_cache(dem_path, cache_dir)
+    dem = Dem.open(sidecar)
+    obs = np.atleast_2d(np.asarray(observers, dtype=np.float64))
+    n = len(obs)
+
+    # Union of the observers' radius windows, in DEM cells.
+    rows, cols = dem.rowcol(obs[:, 0], obs[:, 1])
+    half_r, half_c = math.ceil(radius / dem.res[1]) + 1, math.ceil(radius / dem.res[0]) + 1
+    h, w = dem.shape
+    r0 = int(np.clip(np.floor(rows.min()) - half_r, 0, h)) if n else 0
+    c0 = int(np.clip(np.floor(cols.min()) - half_c, 0, w)) if n else 0
+    r1 = int(np.clip(np.floor(rows.max()) + half_r + 2, r0, h)) if n else 0
+    c1 = int(np.clip(np.floor(cols.max()) + half_c + 2, c0, w)) if n else 0
+
+    counts = np.zeros((r1 - r0, c1 - c0), dtype=np.uint16 if n < 2**16 else np.uint32)
+    bits = np.zeros((*counts.shape, (n + 7) // 8), dtype=np.uint8) if bitset else None
+    valid = np.zeros(n, dtype=bool)
+
+    tasks = [(i, (float(x), float(y)), radius, observer_height, kwargs) for i, (x, y) in enumerate(obs)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(sidecar,)) as pool:
+        for i, part in pool.map(_observer_viewshed, tasks, chunksize=chunksize):
+            if part is None:
+                continue
+            row_off, col_off, shape, packed = part
+            mask = np.unpackbits(packed, count=shape[0] * shape[1]).reshape(shape).view(bool)
+            sl = np.s_[row_off - r0:row_off - r0 + shape[0], col_off - c0:col_off - c0 + shape[1]]
+            counts[sl] += mask
+            if bits is not None:
+                bits[sl + (i // 8,)] |= mask.astype(np.uint8) << (7 - i % 8)
+            valid[i] = True
+
+    transform = dem.transform * Affine.translation(c0, r0)
+    return CumulativeViewshed(counts, transform, dem.crs, obs, valid, float(radius), bits)
+
+
+def main(argv=None):
+    from .route import read_track, read_waypoints, resample
+
+    parser = argparse.ArgumentParser(description="Cumulative viewshed over many observers.")
+    parser.add_argument("dem")
+    parser.add_argument("observers", help="GPX track (with --every) or waypoint GeoJSON")
+    parser.add_argument("-o", "--output", default="cumulative_viewshed.tif")
+    parser.add_argument("--every", type=float, default=None, help="observer spacing along a track (m)")
+    parser.add_argument("--radius", type=float, default=20_000)
+    parser.add_argument("--observer-height", type=float, default=1.7)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    dem = Dem.open(ensure_raw_cache(args.dem))
+    if args.every:
+        x, y = dem.lnglat_to_xy(*read_track(args.observers))
+        x, y, _ = resample(np.asarray(x), np.asarray(y), args.every)
+    else:
+        _, lng, lat = read_waypoints(args.observers)
+        x, y = dem.lnglat_to_xy(lng, lat)
+    result = cumulative_viewshed(
+        dem.path, np.column_stack([x, y]), args.radius,
+        observer_height=args.observer_height, workers=args.workers,
+    )
+    result.to_geotiff(args.output)
+    print(
+        f"Wrote {args.output}: {result.valid.sum()} of {len(result.valid)} observers, "
+        f"{np.count_nonzero(result.counts):,} visible cells"
+    )
+
+
+if __name__ == "__main__":
+    main()
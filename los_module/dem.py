@@ -0,0 +1,255 @@
+"""In-memory DEM raster shared by the LOS and viewshed kernels."""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from functools import cached_property
+
+import numpy as np
+import rasterio
+from affine import Affine
+
+
+def bilinear(data, rows, cols):
+    """Bilinearly sample ``data`` at fractional (row, col) pixel-centre positions.
+
+    Positions outside the raster, or touching a NaN cell, come back as NaN.
+    """
+    rows = np.asarray(rows, dtype=np.float64)
+    cols = np.asarray(cols, dtype=np.float64)
+    h, w = data.shape
+    inside = (rows >= 0) & (rows <= h - 1) & (cols >= 0) & (cols <= w - 1)
+
+    r0 = np.floor(np.clip(rows, 0, h - 1)).astype(np.intp)
+    c0 = np.floor(np.clip(cols, 0, w - 1)).astype(np.intp)
+    r1 = np.minimum(r0 + 1, h - 1)
+    c1 = np.minimum(c0 + 1, w - 1)
+    fr = np.clip(rows, 0, h - 1) - r0
+    fc = np.clip(cols, 0, w - 1) - c0
+
+    top = data[r0, c0] * (1.0 - fc) + data[r0, c1] * fc
+    bottom = data[r1, c0] * (1.0 - fc) + data[r1, c1] * fc
+    out = top * (1.0 - fr) + bottom * fr
+    return np.where(inside, out, np.nan)
+
+
+def _bounds_window(bounds, transform, shape):
+    """Integer window covering map ``bounds``, clipped to a raster of ``shape``."""
+    from rasterio.windows import Window, from_bounds
+
+    return (
+        from_bounds(*bounds, transform=transform)
+        .round_offsets()
+        .round_lengths()
+        .intersection(Window(0, 0, shape[1], shape[0]))
+    )
+
+
+def _check_crs(dem, crs):
+    """``Dem.open`` reprojects only tile pyramids; elsewhere ``crs`` must already match."""
+    from rasterio.crs import CRS
+
+    if crs is not None and dem.crs is not None and CRS.from_user_input(crs) != CRS.from_user_input(dem.crs):
+        raise ValueError(f"{dem.path} is in {dem.crs}, not {crs}; only tile pyramids are reprojected on open")
+
+
+@dataclass
+class Dem:
+    """Single-band elevation raster held as float32, with nodata cells as NaN.
+
+    Coordinates are in the raster's own CRS (EPSG:25832 metres for ``DEM.tif``);
+    the LOS and viewshed kernels refuse CRSs not in ground metres (``require_metric``).
+    """
+
+    data: np.ndarray
+    transform: Affine
+    crs: object = None
+    nodata: float | None = None
+    path: str | None = None
+
+    @classmethod
+    def open(cls, path, band=1, bounds=None, res=None, crs=None):
+        """Read one band of a raster into memory.
+
+        ``bounds`` (left, bottom, right, top, in the raster CRS) limits the read
+        to a window. ``res`` asks for a coarser cell size; on a COG, GDAL then
+        serves the read from the nearest overview instead of the full raster.
+        A ``*.dem.json`` sidecar from ``rawdem`` is memory-mapped instead, and a
+        terrain-RGB tile pyramid (``.mbtiles`` or z/x/y directory) is decoded
+        over ``bounds`` in EPSG:3857 (see ``tile_dem``). ``crs`` reprojects a
+        pyramid's tiles into that metric CRS, with ``bounds`` and ``res`` in it;
+        other sources are never reprojected, so it must match their CRS.
+        """
+        from rasterio.enums import Resampling
+        from rasterio.windows import Window
+
+        from .tile_dem import is_pyramid
+
+        if str(path).endswith(".dem.json"):
+            dem = cls._open_raw(path, bounds, res)
+            _check_crs(dem, crs)
+            return dem
+        if is_pyramid(path):
+            return cls._open_pyramid(path, bounds, res, crs)
+
+        with rasterio.open(path) as src:
+            window = Window(0, 0, src.width, src.height)
+            if bounds is not None:
+                window = _bounds_window(bounds, src.transform, src.shape)
+            transform = src.window_transform(window)
+            out_shape = (int(window.height), int(window.width))
+            if res is not None:
+                factor = max(res / abs(src.res[0]), res / abs(src.res[1]), 1.0)
+                out_shape = (
+                    max(1, round(window.height / factor)),
+                    max(1, round(window.width / factor)),
+                )
+                transform = transform * Affine.scale(
+                    window.width / out_shape[1], window.height / out_shape[0]
+                )
+            data = src.read(
+                band, window=window, out_shape=out_shape, out_dtype="float32",
+                resampling=Resampling.average, masked=True,
+            )
+            src_crs, nodata = src.crs, src.nodata
+        dem = cls(data.filled(np.nan), transform, src_crs, nodata, os.path.abspath(path))
+        _check_crs(dem, crs)
+        return dem
+
+    @classmethod
+    def _open_raw(cls, sidecar, bounds, res):
+        """Memory-map a raw cache built by ``rawdem`` (zero-copy, read-only)."""
+        from .rawdem import open_raw
+
+        if res is not None:
+            raise ValueError("res is not supported for raw DEM caches; build a coarser cache instead")
+        data, transform, crs, nodata = open_raw(sidecar)
+        dem = cls(data, transform, crs, nodata, os.path.abspath(sidecar))
+        if bounds is None:
+            return dem
+        win = _bounds_window(bounds, transform, data.shape)
+        return dem.window(int(win.row_off), int(win.col_off), int(win.height), int(win.width))
+
+    @classmethod
+    def _open_pyramid(cls, path, bounds, res, crs):
+        """Decode the tiles of a terrain-RGB pyramid covering ``bounds`` (EPSG:3857, or ``crs``)."""
+        from rasterio.warp import transform_bounds
+
+        from .tile_dem import ORIGIN_SHIFT, shared_pyramid
+
+        if bounds is None:
+            raise ValueError("tile pyramids need bounds; the whole pyramid is never decoded")
+        pyramid = shared_pyramid(path)
+        if res is not None:
+            # Deepest zoom whose pixels are at least ``res`` (3857 units, which
+            # are never smaller than ground metres).
+            zoom = int(np.floor(np.log2(2 * ORIGIN_SHIFT / (pyramid.tilesize * res))))
+            zoom = min(max(zoom, 0), pyramid.zoom)
+            if zoom != pyramid.zoom:
+                pyramid = shared_pyramid(path, zoom)
+        if crs is None:
+            return pyramid.mosaic(bounds)
+        dem = pyramid.mosaic(transform_bounds(crs, "EPSG:3857", *bounds, densify_pts=21)).to_crs(crs, res)
+        win = _bounds_window(bounds, dem.transform, dem.shape)
+        return dem.window(int(win.row_off), int(win.col_off), int(win.height), int(win.width))
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def res(self):
+        """Cell size as (x, y) in CRS units."""
+        return abs(self.transform.a), abs(self.transform.e)
+
+    @property
+    def bounds(self):
+        """(left, bottom, right, top) in the DEM CRS."""
+        h, w = self.shape
+        left, top = self.transform * (0, 0)
+        right, bottom = self.transform * (w, h)
+        return min(left, right), min(bottom, top), max(left, right), max(bottom, top)
+
+    @cached_property
+    def is_metric(self):
+        """Whether CRS units are ground metres: projected, in metres, and not Mercator.
+
+        Mercator units stretch by 1/cos(lat) (x1.43 at 45.8 N). A DEM without a
+        CRS is taken at its word.
+        """
+        if self.crs is None:
+            return True
+        from rasterio.crs import CRS
+
+        crs = CRS.from_user_input(self.crs)
+        return not crs.is_geographic and crs.linear_units == "metre" and crs.to_dict().get("proj") != "merc"
+
+    def require_metric(self):
+        """Raise ``ValueError`` unless ``is_metric``; the LOS and viewshed kernels call this first."""
+        if not self.is_metric:
+            raise ValueError(
+                f"DEM CRS {self.crs} is not in ground metres; reproject it first "
+                "(Dem.to_crs, or crs= for tile pyramids)"
+            )
+
+    def rowcol(self, x, y):
+        """Map coordinates -> fractional (row, col) of pixel centres."""
+        cols, rows = ~self.transform * (np.asarray(x, np.float64), np.asarray(y, np.float64))
+        return rows - 0.5, cols - 0.5
+
+    def xy(self, row, col):
+        """Fractional (row, col) -> map coordinates of the pixel centre."""
+        return self.transform * (np.asarray(col, np.float64) + 0.5, np.asarray(row, np.float64) + 0.5)
+
+    def snap(self, x, y):
+        """Snap map coordinates to the centre of the containing cell -> (row, col, x, y)."""
+        row, col = self.rowcol(x, y)
+        row, col = np.rint(row).astype(np.intp), np.rint(col).astype(np.intp)
+        cx, cy = self.xy(row, col)
+        return row, col, cx, cy
+
+    def sample(self, x, y):
+        """Bilinear elevation at map coordinates; NaN off the raster or on nodata."""
+        return bilinear(self.data, *self.rowcol(x, y))
+
+    def window(self, row_off, col_off, height, width):
+        """View of a sub-window clipped to the raster (no copy)."""
+        h, w = self.shape
+        r0, c0 = max(row_off, 0), max(col_off, 0)
+        r1, c1 = min(row_off + height, h), min(col_off + width, w)
+        return Dem(
+            self.data[r0:r1, c0:c1],
+            self.transform * Affine.translation(c0, r0),
+            self.crs,
+            self.nodata,
+            self.path,
+        )
+
+    def to_crs(self, crs, res=None):
+        """Bilinear reprojection into ``crs`` (NaN outside / on nodata), at ``res`` or about the same cell size."""
+        from rasterio.enums import Resampling
+        from rasterio.warp import calculate_default_transform, reproject
+
+        h, w = self.shape
+        transform, width, height = calculate_default_transform(
+            self.crs, crs, w, h, *self.bounds, resolution=res
+        )
+        data = np.full((height, width), np.nan, dtype=np.float32)
+        reproject(
+            np.asarray(self.data, dtype=np.float32), data,
+            src_transform=self.transform, src_crs=self.crs, src_nodata=np.nan,
+            dst_transform=transform, dst_crs=crs, dst_nodata=np.nan,
+            resampling=Resampling.bilinear,
+        )
+        return Dem(data, transform, crs, float("nan"), None)
+
+    @cached_property
+    def _from_lnglat(self):
+        from pyproj import Transformer
+
+        return Transformer.from_crs("EPSG:4326", self.crs, always_xy=True)
+
+    def lnglat_to_xy(self, lng, lat):
+        """WGS84 lng/lat -> raster CRS coordinates (vectorized)."""
+        return self._from_lnglat.transform(np.asarray(lng, np.float64), np.asarray(lat, np.float64))
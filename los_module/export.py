@@ -0,0 +1,221 @@
+"""Compact visibility exports for the spectator app's ARView.
+
+Viewsheds are exported as simplified polygons (GeoJSON or FlatGeobuf) or as a
+run-length row format on a lng/lat grid; both are in WGS84 so the client can
+answer "is this point visible" without a projection library:
+
+    run-length: row = floor((north - lat) / (north - south) * height)
+                col = floor((lng - west) / (east - west) * width)
+                visible = col falls in one of rows[row]'s [start, end) runs
+
+``max_bytes`` is a size budget: simplification (polygons) or the grid cell
+(run-length) is coarsened by factors of two until the encoded output fits.
+LOS batches are exported as GeoJSON points with the first blocking point.
+"""
+
+from __future__ import annotations
+
+import json
+
+import numpy as np
+
+from .overlay import Overlay
+
+EXPORT_VERSION = 1
+# Coarsening rounds tried before giving up on a size budget.
+MAX_ROUNDS = 8
+
+
+def _dumps(doc):
+    return json.dumps(doc, separators=(",", ":"))
+
+
+def _lnglat(crs, x, y):
+    from pyproj import Transformer
+
+    t = Transformer.from_crs(crs, "EPSG:4326", always_xy=True)
+    return t.transform(np.asarray(x, np.float64), np.asarray(y, np.float64))
+
+
+def _viewshed_props(vs):
+    lng, lat = _lnglat(vs.crs, *vs.observer)
+    return {
+        "observer": [round(float(lng), 6), round(float(lat), 6)],
+        "observer_height": vs.observer_height,
+        "radius": vs.radius,
+    }
+
+
+def viewshed_polygons(vs, tolerance=None, min_area=0.0):
+    """Visible area of ``vs`` as a shapely MultiPolygon in the DEM CRS.
+
+    Polygons are traced cell-exact, holes and all, then simplified with
+    ``tolerance`` metres (default: one cell); parts smaller than ``min_area``
+    square metres are dropped.
+    """
+    import shapely
+    from rasterio.features import shapes
+    from shapely.geometry import shape
+
+    crop = vs.crop()
+    mask = crop.mask.astype(np.uint8)
+    if tolerance is None:
+        tolerance = max(abs(crop.transform.a), abs(crop.transform.e))
+    parts = [shape(g) for g, _ in shapes(mask, mask=mask.view(bool), transform=crop.transform)]
+    geom = shapely.simplify(shapely.MultiPolygon(parts), tolerance, preserve_topology=True)
+    polys = [p for p in shapely.get_parts(geom) if p.area >= min_area]
+    return shapely.MultiPolygon(polys)
+
+
+def viewshed_to_geojson(vs, tolerance=None, min_area=0.0, max_bytes=None, precision=6):
+    """GeoJSON FeatureCollection (WGS84) of the visible area, within ``max_bytes``."""
+    import shapely
+    from pyproj import Transformer
+    from shapely.geometry import mapping
+
+    to_lnglat = Transformer.from_crs(vs.crs, "EPSG:4326", always_xy=True)
+
+    def project(coords):
+        return np.round(np.column_stack(to_lnglat.transform(coords[:, 0], coords[:, 1])), precision)
+
+    cell = max(abs(vs.transform.a), abs(vs.transform.e))
+    tolerance = float(tolerance or cell)
+    for _ in range(MAX_ROUNDS):
+        geom = viewshed_polygons(vs, tolerance, min_area)
+        geom = shapely.transform(geom, project)
+        doc = {
+            "type": "FeatureCollection",
+            "features": [{
+                "type": "Feature",
+                "geometry": mapping(geom),
+                "properties": {"version": EXPORT_VERSION, **_viewshed_props(vs), "tolerance": tolerance},
+            }],
+        }
+        if max_bytes is None or len(_dumps(doc)) <= max_bytes:
+            return doc
+        tolerance *= 2
+        min_area = max(min_area, tolerance * tolerance)
+    raise ValueError(f"visibility polygons do not fit in {max_bytes} bytes")
+
+
+def viewshed_to_flatgeobuf(vs, path, tolerance=None, min_area=0.0):
+    """Write the simplified visible area (WGS84) as a single-feature FlatGeobuf."""
+    import geopandas as gpd
+    from shapely.geometry import shape
+
+    feature = viewshed_to_geojson(vs, tolerance, min_area)["features"][0]
+    props = feature["properties"]
+    lng, lat = props.pop("observer")
+    gdf = gpd.GeoDataFrame(
+        [{**props, "observer_lng": lng, "observer_lat": lat}],
+        geometry=[shape(feature["geometry"])],
+        crs="EPSG:4326",
+    )
+    gdf.to_file(path, driver="FlatGeobuf")
+    return path
+
+
+def viewshed_to_rle(vs, max_bytes=None):
+    """Run-length row format (see module docstring) on a lng/lat grid, within ``max_bytes``."""
+    mask, transform = Overlay.from_viewshed(vs).image()
+    factor = 1
+    for _ in range(MAX_ROUNDS):
+        grid = _coarsen(mask, factor)
+        h, w = grid.shape
+        west, north = transform.c, transform.f
+        east, south = west + transform.a * w * factor, north + transform.e * h * factor
+        doc = {
+            "version": EXPORT_VERSION,
+            "type": "visibility-rle",
+            **_viewshed_props(vs),
+            "bounds": [round(west, 7), round(south, 7), round(east, 7), round(north, 7)],
+            "shape": [h, w],
+            "rows": _row_runs(grid),
+        }
+        if max_bytes is None or len(_dumps(doc)) <= max_bytes:
+            return doc
+        factor *= 2
+    raise ValueError(f"run-length visibility does not fit in {max_bytes} bytes")
+
+
+def _coarsen(mask, factor):
+    """Block-majority downsample by ``factor`` (edges padded with False)."""
+    if factor == 1:
+        return mask
+    h, w = mask.shape
+    ph, pw = -h % factor, -w % factor
+    m = np.pad(mask, ((0, ph), (0, pw)))
+    blocks = m.reshape(m.shape[0] // factor, factor, m.shape[1] // factor, factor)
+    return blocks.sum(axis=(1, 3)) * 2 >= factor * factor
+
+
+def _row_runs(grid):
+    """Per row, a flat [start0, end0, start1, end1, ...] list of half-open visible runs."""
+    edges = np.diff(np.pad(grid.astype(np.int8), ((0, 0), (1, 1))), axis=1)
+    rows, cols = np.nonzero(edges)
+    # Starts (+1) and ends (-1) alternate within each row, in column order.
+    splits = np.searchsorted(rows, np.arange(1, grid.shape[0]))
+    return [c.tolist() for c in np.split(cols, splits)]
+
+
+def rle_visible(doc, lng, lat):
+    """Point test against a ``viewshed_to_rle`` document (what the client does)."""
+    west, south, east, north = doc["bounds"]
+    h, w = doc["shape"]
+    lng = np.atleast_1d(np.asarray(lng, np.float64))
+    lat = np.atleast_1d(np.asarray(lat, np.float64))
+    row = np.floor((north - lat) / (north - south) * h).astype(np.intp)
+    col = np.floor((lng - west) / (east - west) * w).astype(np.intp)
+    out = np.zeros(lng.shape, dtype=bool)
+    inside = (row >= 0) & (row < h) & (col >= 0) & (col < w)
+    for i in np.flatnonzero(inside):
+        runs = doc["rows"][row[i]]
+        j = np.searchsorted(runs, col[i], side="right")
+        out[i] = j % 2 == 1
+    return out
+
+
+def los_to_geojson(dem, observer, targets, result, precision=6):
+    """GeoJSON of one observer's LOS batch: targets with visibility and first blocking point."""
+    obs = np.asarray(observer, dtype=np.float64)
+    tgt = np.atleast_2d(np.asarray(targets, dtype=np.float64))
+    dist = np.hypot(tgt[:, 0] - obs[0], tgt[:, 1] - obs[1])
+    block = result.block_distance
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = np.where(np.isfinite(block), block / dist, np.nan)
+    bx, by = obs[0] + (tgt[:, 0] - obs[0]) * t, obs[1] + (tgt[:, 1] - obs[1]) * t
+
+    o_lng, o_lat = _lnglat(dem.crs, obs[0], obs[1])
+    lng, lat = _lnglat(dem.crs, tgt[:, 0], tgt[:, 1])
+    b_lng, b_lat = _lnglat(dem.crs, bx, by)
+    def r(v):
+        return round(float(v), precision)
+
+    features = [{
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [r(o_lng), r(o_lat)]},
+        "properties": {"role": "observer"},
+    }]
+    for i in range(len(tgt)):
+        props = {
+            "role": "target",
+            "visible": bool(result.visible[i]),
+            "valid": bool(result.valid[i]),
+            "distance": round(float(dist[i]), 1),
+        }
+        if np.isfinite(block[i]):
+            props["blocked_at"] = [r(b_lng[i]), r(b_lat[i])]
+            props["block_distance"] = round(float(block[i]), 1)
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [r(lng[i]), r(lat[i])]},
+            "properties": props,
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def save_json(doc, path):
+    """Write an export document as compact UTF-8 JSON."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(_dumps(doc))
+    return path
@@ -0,0 +1,264 @@
+"""Precomputed 360° horizon profiles for fixed observers (huts, aid stations, cameras).
+
+    python -m los_module.horizon DEM.tif ../apps/spectator/public/TOR330_waypoints.geojson \\
+        -o horizons.npz --radius 20000
+
+One radial sweep per observer stores, for every azimuth bin and distance band,
+the steepest terrain slope seen from the observer nearer than the band's
+start. A later LOS query from that observer is then one array lookup and a
+comparison (target slope vs. stored horizon) instead of a DEM walk. The
+overall max per azimuth is the skyline the ARView draws.
+
+Bands are one sample step wide out to ``near`` and then grow geometrically by
+``band_ratio``; terrain inside a target's own band is not consulted, so far
+targets can read as visible behind a ridge less than ~1 % of their distance
+in front of them.
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+from dataclasses import dataclass
+
+import numpy as np
+
+from .dem import bilinear
+from .los import DEFAULT_MAX_SAMPLES, DEFAULT_REFRACTION, curvature_drop
+
+HORIZON_VERSION = 1
+DEFAULT_AZIMUTHS = 2048
+
+
+@dataclass
+class HorizonProfile:
+    """Horizon of one observer.
+
+    ``horizon[a, k]`` is the max slope (rise over run, drop included) of the
+    terrain in azimuth bin ``a`` strictly nearer than ``edges[k]``; ``-inf``
+    where there is none. ``skyline_slope`` / ``skyline_distance`` are the
+    overall max per azimuth and where it occurs.
+    """
+
+    observer: tuple
+    z_obs: float
+    observer_height: float
+    radius: float
+    edges: np.ndarray
+    horizon: np.ndarray
+    skyline_slope: np.ndarray
+    skyline_distance: np.ndarray
+    curvature: bool = True
+    refraction: float = DEFAULT_REFRACTION
+    crs: object = None
+
+    @property
+    def n_azimuths(self):
+        return self.horizon.shape[0]
+
+    def lookup(self, x, y):
+        """(azimuth bin, band, distance) of map points; band is -1 beyond ``radius``."""
+        dx = np.asarray(x, np.float64) - self.observer[0]
+        dy = np.asarray(y, np.float64) - self.observer[1]
+        dist = np.hypot(dx, dy)
+        n = self.n_azimuths
+        az = np.rint(np.arctan2(dx, dy) * (n / (2 * np.pi))).astype(np.intp) % n
+        band = np.where(dist > self.radius, -1, np.searchsorted(self.edges, dist, side="right") - 1)
+        return az, band, dist
+
+    def visible_z(self, x, y, z):
+        """Visibility of points at absolute elevation ``z`` (e.g. GPS altitude); False beyond ``radius``."""
+        az, band, dist = self.lookup(x, y)
+        inside = band >= 0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            slope = (np.asarray(z, np.float64) - self.z_obs
+                     - curvature_drop(dist, self.curvature, self.refraction)) / dist
+        out = np.zeros(dist.shape, dtype=bool)
+        out[inside] = slope[inside] >= self.horizon[az[inside], band[inside]]
+        return out
+
+    def visible(self, dem, x, y, target_height=0.0):
+        """Visibility of targets ``target_height`` metres above the ground of ``dem``."""
+        z = dem.sample(x, y) + np.asarray(target_height, np.float64)
+        return self.visible_z(x, y, z) & np.isfinite(z)
+
+    def skyline(self, precision=2):
+        """Skyline for the ARView: elevation angle (degrees) and distance per azimuth bin."""
+        n = self.n_azimuths
+        return {
+            "azimuth_step": 360.0 / n,
+            "elevation_deg": np.round(np.degrees(np.arctan(self.skyline_slope)), precision).tolist(),
+            "distance": np.round(self.skyline_distance).astype(int).tolist(),
+        }
+
+
+def horizon_profile(
+    dem,
+    observer,
+    radius,
+    observer_height=1.7,
+    n_azimuths=DEFAULT_AZIMUTHS,
+    step=None,
+    near=None,
+    band_ratio=1.01,
+    max_samples=DEFAULT_MAX_SAMPLES,
+    curvature=True,
+    refraction=DEFAULT_REFRACTION,
+):
+    """Sweep ``n_azimuths`` rays out to ``radius`` and fold them into a ``HorizonProfile``.
+
+    Rays are sampled every ``step`` metres (default: one cell) as in
+    ``viewshed``; ``near`` (default: 100 steps) is where bands stop being one
+    step wide. Queries between rays use the nearest ray.
+    """
+    dem.require_metric()
+    x, y = map(float, observer)
+    step = float(step or min(dem.res))
+    near = float(near or 100 * step)
+    res_x, res_y = dem.res
+    o_row, o_col = dem.rowcol(x, y)
+    z_obs = float(bilinear(dem.data, o_row, o_col)) + observer_height
+    if not math.isfinite(z_obs):
+        raise ValueError("observer is outside the DEM or on a nodata cell")
+
+    edges = band_edges(radius, step, near, band_ratio)
+    sample_dist = np.arange(1, int(radius // step) + 1, dtype=np.float64) * step
+    # Last sample strictly nearer than each band start (-1: none).
+    last = np.searchsorted(sample_dist, edges, side="left") - 1
+    z_ref = z_obs + curvature_drop(sample_dist, curvature, refraction)
+    az = np.arange(n_azimuths) * (2 * np.pi / n_azimuths)
+
+    horizon = np.full((n_azimuths, len(edges)), -np.inf, dtype=np.float32)
+    sky_slope = np.full(n_azimuths, -np.inf)
+    sky_dist = np.zeros(n_azimuths)
+    chunk = max(1, max_samples // max(len(sample_dist), 1))
+    for lo in range(0, n_azimuths, chunk):
+        a = az[lo:lo + chunk]
+        rows = o_row - np.cos(a)[:, None] * (sample_dist / res_y)[None, :]
+        cols = o_col + np.sin(a)[:, None] * (sample_dist / res_x)[None, :]
+        slope = np.nan_to_num((bilinear(dem.data, rows, cols) - z_ref) / sample_dist, nan=-np.inf)
+        running = np.maximum.accumulate(slope, axis=1)
+        has = last >= 0
+        horizon[lo:lo + chunk, has] = running[:, last[has]]
+        top = slope.argmax(axis=1)
+        sky_slope[lo:lo + chunk] = running[:, -1]
+        sky_dist[lo:lo + chunk] = sample_dist[top]
+    return HorizonProfile(
+        (x, y), z_obs, observer_height, float(radius), edges, horizon,
+        sky_slope, sky_dist, curvature, refraction, dem.crs,
+    )
+
+
+def band_edges(radius, step, near, band_ratio):
+    """Band start distances: every ``step`` up to ``near``, then growing by ``band_ratio``."""
+    linear = np.arange(0.0, min(near, radius), step)
+    grow = []
+    d = max(near, step)
+    while d < radius:
+        grow.append(d)
+        d = max(d * band_ratio, d + step)
+    return np.concatenate([linear, grow])
+
+
+def build_horizons(dem, names, lng, lat, radius, **kwargs):
+    """``{name: HorizonProfile}`` for stations at WGS84 ``lng``/``lat``; stations off the DEM are skipped."""
+    xs, ys = dem.lnglat_to_xy(lng, lat)
+    out = {}
+    for name, x, y in zip(names, np.atleast_1d(xs), np.atleast_1d(ys)):
+        try:
+            out[name] = horizon_profile(dem, (x, y), radius, **kwargs)
+        except ValueError:
+            continue
+    return out
+
+
+def save_horizons(path, profiles):
+    """Write profiles sharing one band layout and azimuth count to a single ``.npz``.
+
+    Radius, band edges, azimuth count, curvature, refraction and CRS are stored
+    once, so every profile must match the first; ``ValueError`` otherwise.
+    """
+    if not profiles:
+        raise ValueError("no horizon profiles to save")
+    names = list(profiles)
+    ps = [profiles[n] for n in names]
+    first = ps[0]
+    for name, p in zip(names[1:], ps[1:]):
+        if p.horizon.shape != first.horizon.shape or not np.array_equal(p.edges, first.edges):
+            raise ValueError(f"profile {name!r} has a different band layout or azimuth count than {names[0]!r}")
+        if (p.radius, p.curvature, p.refraction, _crs_text(p.crs)) != (
+            first.radius, first.curvature, first.refraction, _crs_text(first.crs)
+        ):
+            raise ValueError(f"profile {name!r} differs from {names[0]!r} in radius, curvature, refraction or CRS")
+    np.savez(
+        path,
+        version=HORIZON_VERSION,
+        names=np.array(names, dtype=str),
+        observers=np.array([p.observer for p in ps], dtype=np.float64),
+        z_obs=np.array([p.z_obs for p in ps]),
+        observer_height=np.array([p.observer_height for p in ps]),
+        radius=first.radius,
+        edges=first.edges,
+        horizon=np.stack([p.horizon for p in ps]),
+        skyline_slope=np.stack([p.skyline_slope for p in ps]),
+        skyline_distance=np.stack([p.skyline_distance for p in ps]),
+        curvature=first.curvature,
+        refraction=first.refraction,
+        crs=_crs_text(first.crs),
+    )
+    return path
+
+
+def _crs_text(crs):
+    return str(crs.to_wkt() if hasattr(crs, "to_wkt") else crs or "")
+
+
+def load_horizons(path):
+    """``{name: HorizonProfile}`` from ``save_horizons`` output."""
+    with np.load(path, allow_pickle=False) as z:
+        if int(z["version"]) != HORIZON_VERSION:
+            raise ValueError(f"unsupported horizon file version: {int(z['version'])}")
+        crs = str(z["crs"]) or None
+        return {
+            str(name): HorizonProfile(
+                tuple(map(float, z["observers"][i])), float(z["z_obs"][i]), float(z["observer_height"][i]),
+                float(z["radius"]), z["edges"], z["horizon"][i],
+                z["skyline_slope"][i], z["skyline_distance"][i],
+                bool(z["curvature"]), float(z["refraction"]), crs,
+            )
+            for i, name in enumerate(z["names"])
+        }
+
+
+def main(argv=None):
+    from .dem import Dem
+    from .rawdem import ensure_raw_cache
+    from .route import read_waypoints
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("dem")
+    parser.add_argument("waypoints", help="waypoint GeoJSON of fixed observers")
+    parser.add_argument("-o", "--output", default="horizons.npz")
+    parser.add_argument("--radius", type=float, default=20_000)
+    parser.add_argument("--azimuths", type=int, default=DEFAULT_AZIMUTHS)
+    parser.add_argument("--observer-height", type=float, default=1.7)
+    parser.add_argument("--refraction", type=float, default=DEFAULT_REFRACTION)
+    parser.add_argument("--no-curvature", action="store_true")
+    args = parser.parse_args(argv)
+
+    dem = Dem.open(ensure_raw_cache(args.dem))
+    profiles = build_horizons(
+        dem, *read_waypoints(args.waypoints), args.radius,
+        observer_height=args.observer_height,
+        n_azimuths=args.azimuths,
+        curvature=not args.no_curvature,
+        refraction=args.refraction,
+    )
+    if not profiles:
+        parser.error(f"no waypoint in {args.waypoints} lies on the DEM")
+    save_horizons(args.output, profiles)
+    print(f"Wrote {len(profiles)} horizon profiles to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""Incremental viewshed for an observer that moves a few cells at a time.
+
+A full sweep from an *anchor* position keeps its per-ray horizon at the edge
+of a near field, the mask, and an azimuth-sector id per cell. When the observer
+moves less than ``max_move`` from the anchor, an update:
+
+1. sweeps only the near field (``near`` metres) exactly from the new position;
+2. compares each ray's near-field horizon with the anchor's and marks the
+   azimuth sectors where a change could flip a far cell: the old and new
+   horizons differ by more than ``slope_tolerance`` and are not both below
+   the ray's first far slope or both above every far target slope;
+3. continues the sweep past ``near`` for rays in changed sectors only, and
+   reuses the anchor's far-field cells everywhere else.
+
+Past ``max_move`` it falls back to a full sweep and re-anchors; a full sweep
+casts the same rays as ``viewshed()`` and returns the same mask. Reused far
+cells are approximate: beyond ``near`` the observer shift changes sightline
+slopes by roughly ``move / near``, which is what the defaults bound.
+
+With the defaults, on 30 m cells at a 20 km radius, a partial update differs
+from ``viewshed()`` on up to about 0.4 % of the visible cells and runs about
+1.3-1.8x faster. Small radii fare worse: 1-2 % at 1.8 km with ``near=600``.
+``update(..., exact=True)`` always sweeps in full.
+"""
+
+from __future__ import annotations
+
+import math
+
+import numpy as np
+
+from .dem import bilinear
+from .los import DEFAULT_MAX_SAMPLES, DEFAULT_REFRACTION, curvature_drop
+from .viewshed import Viewshed, _cell, _ray_azimuths, _sweep
+
+
+class ViewshedTracker:
+    """Viewshed of a moving observer (a walking spectator, a drone camera).
+
+    ``update(observer)`` returns a ``Viewshed`` like ``viewshed()`` would, over
+    a window padded by ``max_move`` so consecutive results share one grid.
+    ``full_updates``, ``partial_updates`` and ``sectors_recomputed`` count what
+    each update cost. Partial updates are approximate (see the module docs).
+    """
+
+    def __init__(
+        self,
+        dem,
+        radius,
+        observer_height=1.7,
+        target_height=0.0,
+        max_move=None,
+        near=2_000.0,
+        sectors=64,
+        slope_tolerance=0.002,
+        step=None,
+        max_samples=DEFAULT_MAX_SAMPLES,
+        curvature=True,
+        refraction=DEFAULT_REFRACTION,
+    ):
+        if not 1 <= sectors <= 256:
+            raise ValueError("sectors must be between 1 and 256")
+        dem.require_metric()
+        self.dem = dem
+        self.radius = float(radius)
+        self.observer_height = observer_height
+        self.target_height = target_height
+        self.step = float(step or min(dem.res))
+        self.max_move = float(max_move if max_move is not None else 3 * max(dem.res))
+        self.near = min(float(near), self.radius)
+        self.sectors = sectors
+        self.slope_tolerance = slope_tolerance
+        self.max_samples = max_samples
+        self.curvature = curvature
+        self.refraction = refraction
+        self.full_updates = self.partial_updates = self.sectors_recomputed = 0
+        self._anchor = None
+
+    def reset(self):
+        """Forget the anchor; the next update is a full sweep."""
+        self._anchor = None
+
+    def within_reach(self, x, y):
+        """Whether moving to (x, y) can be served incrementally."""
+        a = self._anchor
+        return a is not None and math.hypot(x - a["x"], y - a["y"]) <= self.max_move
+
+    def update(self, observer, exact=False):
+        """Viewshed at ``observer`` (x, y in the DEM CRS), reusing the anchor when close.
+
+        ``exact=True`` forces a full sweep, identical to ``viewshed()``, and
+        re-anchors there.
+        """
+        x, y = map(float, observer)
+        if not exact and self.within_reach(x, y):
+            return self._partial(x, y)
+        return self._full(x, y)
+
+    def _full(self, x, y):
+        dem = self.dem
+        res_x, res_y = dem.res
+        # Pad the window by max_move so every later observer's radius fits in it.
+        reach = self.radius + self.max_move
+        row, col = dem.rowcol(x, y)
+        half_r, half_c = math.ceil(reach / res_y), math.ceil(reach / res_x)
+        r0, c0 = int(math.floor(row)) - half_r, int(math.floor(col)) - half_c
+        win = dem.window(r0, c0, 2 * half_r + 2, 2 * half_c + 2)
+        o_row, o_col = float(row) - max(r0, 0), float(col) - max(c0, 0)
+        z_obs = self._z_obs(win.data, o_row, o_col)
+
+        # Same rays and samples as ``viewshed()`` out to radius, so a full
+        # update reproduces it; the rays then run on to ``reach`` for the
+        # anchor's far cells only.
+        az = _ray_azimuths(math.ceil(self.radius / res_y), math.ceil(self.radius / res_x), res_x, res_y)
+        dist = np.arange(1, int(reach // self.step) + 1, dtype=np.float64) * self.step
+        n_near = int(np.searchsorted(dist, self.near, side="right"))
+        n_radius = int(self.radius // self.step)
+        mask = np.zeros(win.data.shape, dtype=bool)
+        mask[_cell(o_row, mask.shape[0]), _cell(o_col, mask.shape[1])] = True
+        near_h, _ = self._sweep(win.data, mask, o_row, o_col, z_obs, az, dist[:n_near])
+        far_h, far_top = self._sweep(win.data, mask, o_row, o_col, z_obs, az, dist[n_near:n_radius], near_h)
+        anchor_mask = mask.copy()
+        _, outer_top = self._sweep(win.data, anchor_mask, o_row, o_col, z_obs, az, dist[n_radius:], far_h)
+        far_first = self._first_far_slope(win.data, o_row, o_col, z_obs, az, dist[n_near:])
+
+        dy, dx = self._offsets(mask.shape, o_row, o_col)
+        cell_az = np.arctan2(dx[None, :], -dy[:, None])
+        self._anchor = {
+            "x": x,
+            "y": y,
+            "win": win,
+            "az": az,
+            "ray_sector": self._sector(az),
+            "cell_sector": self._sector(cell_az).astype(np.uint8),
+            "z_obs": z_obs,
+            "near_horizon": near_h,
+            "far_first": far_first,
+            "far_top": np.maximum(far_top, outer_top),
+            "mask": anchor_mask,
+        }
+        self.full_updates += 1
+        return Viewshed(mask, win.transform, dem.crs, (x, y), self.observer_height, self.radius)
+
+    def _partial(self, x, y):
+        a = self._anchor
+        win, az = a["win"], a["az"]
+        o_row, o_col = win.rowcol(x, y)
+        o_row, o_col = float(o_row), float(o_col)
+        z_obs = self._z_obs(win.data, o_row, o_col)
+
+        dist = np.arange(1, int(self.radius // self.step) + 1, dtype=np.float64) * self.step
+        n_near = int(np.searchsorted(dist, self.near, side="right"))
+        mask = np.zeros(win.data.shape, dtype=bool)
+        near_h, _ = self._sweep(win.data, mask, o_row, o_col, z_obs, az, dist[:n_near])
+
+        # Far cells only flip if the near horizon crosses one of the ray's far
+        # target slopes; the observer's height change shifts those by up to dz / near.
+        old_h = a["near_horizon"]
+        tol = self.slope_tolerance + abs(z_obs - a["z_obs"]) / max(self.near, self.step)
+        lo, hi = np.minimum(near_h, old_h), np.maximum(near_h, old_h)
+        with np.errstate(invalid="ignore"):
+            moved = np.where(near_h == old_h, False, hi - lo > self.slope_tolerance)
+        relevant = (hi >= a["far_first"] - tol) & (lo <= a["far_top"] + tol)
+        changed = np.zeros(self.sectors, dtype=bool)
+        np.logical_or.at(changed, a["ray_sector"], moved & relevant)
+
+        if changed.any():
+            # Sector edges seen from the new position shift by up to move / near
+            # radians; widen the recomputed fan so no far cell falls between.
+            pos = (az + np.pi) / (2 * np.pi) * self.sectors
+            margin = min(self.max_move / max(self.near, self.step) / (2 * np.pi) * self.sectors, 1.0)
+            rays = (
+                changed[a["ray_sector"]]
+                | changed[np.floor(pos - margin).astype(np.intp) % self.sectors]
+                | changed[np.floor(pos + margin).astype(np.intp) % self.sectors]
+            )
+            self._sweep(win.data, mask, o_row, o_col, z_obs, az[rays], dist[n_near:], near_h[rays])
+
+        dy, dx = self._offsets(mask.shape, o_row, o_col)
+        far = (dy * dy)[:, None] + (dx * dx)[None, :] > self.near * self.near
+        mask |= a["mask"] & far & ~changed[a["cell_sector"]]
+        self.partial_updates += 1
+        self.sectors_recomputed += int(changed.sum())
+        return self._result(mask, o_row, o_col, x, y)
+
+    def _sweep(self, data, mask, o_row, o_col, z_obs, az, dist, horizon0=None):
+        """Chunked sweep of ``az`` over ``dist``; returns (end horizon, top target slope) per ray."""
+        end = np.full(len(az), -np.inf) if horizon0 is None else np.array(horizon0, dtype=np.float64)
+        top = np.full(len(az), -np.inf)
+        if len(dist) == 0 or len(az) == 0:
+            return end, top
+        res_x, res_y = self.dem.res
+        z_ref = z_obs + curvature_drop(dist, self.curvature, self.refraction)
+        chunk = max(1, self.max_samples // len(dist))
+        for lo in range(0, len(az), chunk):
+            sl = slice(lo, lo + chunk)
+            end[sl], top[sl] = _sweep(
+                data, mask, o_row, o_col, z_ref, az[sl], dist, res_x, res_y,
+                self.target_height, None if horizon0 is None else horizon0[sl],
+            )
+        return end, top
+
+    def _first_far_slope(self, data, o_row, o_col, z_obs, az, dist):
+        """Terrain slope of each ray's first sample past the near field (-inf if none)."""
+        if len(dist) == 0:
+            return np.full(len(az), -np.inf)
+        res_x, res_y = self.dem.res
+        d = dist[0]
+        ground = bilinear(data, o_row - np.cos(az) * (d / res_y), o_col + np.sin(az) * (d / res_x))
+        slope = (ground - z_obs - curvature_drop(d, self.curvature, self.refraction)) / d
+        return np.nan_to_num(slope, nan=-np.inf)
+
+    def _z_obs(self, data, o_row, o_col):
+        # An observer more than the radius off the raster leaves an empty window.
+        z_obs = float(bilinear(data, o_row, o_col)) + self.observer_height if data.size else math.nan
+        if not math.isfinite(z_obs):
+            raise ValueError("observer is outside the DEM or on a nodata cell")
+        return z_obs
+
+    def _offsets(self, shape, o_row, o_col):
+        """Per-row and per-column map offsets (metres) from the observer."""
+        res_x, res_y = self.dem.res
+        return (np.arange(shape[0]) - o_row) * res_y, (np.arange(shape[1]) - o_col) * res_x
+
+    def _sector(self, az):
+        return np.floor((az + np.pi) / (2 * np.pi) * self.sectors).astype(np.intp) % self.sectors
+
+    def _result(self, mask, o_row, o_col, x, y):
+        dy, dx = self._offsets(mask.shape, o_row, o_col)
+        mask &= (dy * dy)[:, None] + (dx * dx)[None, :] <= self.radius * self.radius
+        mask[_cell(o_row, mask.shape[0]), _cell(o_col, mask.shape[1])] = True
+        win = self._anchor["win"]
+        return Viewshed(mask, win.transform, self.dem.crs, (x, y), self.observer_height, self.radius)
@@ -0,0 +1,177 @@
+"""Vectorized batch line-of-sight over an in-memory DEM.
+
+    python -m los_module los DEM.tif 7.0517 45.7876 TOR330-CERT-2025.gpx --every 100 -o los.json
+"""
+
+from __future__ import annotations
+
+import argparse
+from dataclasses import dataclass
+
+import numpy as np
+
+from .dem import bilinear
+
+# Upper bound on (pairs x samples) evaluated at once; ~16 MB per float64 temporary.
+DEFAULT_MAX_SAMPLES = 2_000_000
+
+EARTH_RADIUS = 6_371_000.0
+# Standard terrestrial refraction coefficient (light curves with ~1/7.7 of Earth's radius).
+DEFAULT_REFRACTION = 0.13
+
+
+def curvature_drop(distance, curvature=True, refraction=DEFAULT_REFRACTION):
+    """Apparent terrain drop (m) at ``distance`` from the observer.
+
+    ``(1 - k) * d**2 / (2 * R)``: Earth curvature, reduced by refraction ``k``.
+    """
+    distance = np.asarray(distance, dtype=np.float64)
+    if not curvature:
+        return np.zeros_like(distance)
+    return (1.0 - refraction) * distance * distance / (2.0 * EARTH_RADIUS)
+
+
+@dataclass
+class LosResult:
+    """Per-pair LOS outcome.
+
+    ``first_block`` is the index of the first terrain sample above the sightline
+    (sample ``k`` lies ``(k + 1) * step`` metres from the observer), or -1.
+    ``valid`` is False where the observer or target falls off the DEM / on nodata.
+    """
+
+    visible: np.ndarray
+    first_block: np.ndarray
+    valid: np.ndarray
+    step: float
+
+    @property
+    def block_distance(self):
+        """Distance from the observer to the first blocking sample (NaN if none)."""
+        return np.where(self.first_block >= 0, (self.first_block + 1) * self.step, np.nan)
+
+
+def line_of_sight(
+    dem,
+    observers,
+    targets,
+    observer_height=1.7,
+    target_height=0.0,
+    step=None,
+    max_samples=DEFAULT_MAX_SAMPLES,
+    curvature=True,
+    refraction=DEFAULT_REFRACTION,
+):
+    """Answer many observer->target LOS queries in one vectorized pass.
+
+    ``observers`` and ``targets`` are (N, 2) arrays of x/y in the DEM CRS; either
+    may be a single (2,) point that is broadcast against the other. Heights are
+    metres above ground, scalar or (N,). Terrain is sampled bilinearly every
+    ``step`` metres (default: one cell) strictly between the two endpoints.
+
+    Earth curvature and refraction lower terrain by ``curvature_drop``; since
+    every pair samples the same distances, the drop is one table per call.
+    """
+    dem.require_metric()
+    obs = np.atleast_2d(np.asarray(observers, dtype=np.float64))
+    tgt = np.atleast_2d(np.asarray(targets, dtype=np.float64))
+    obs, tgt = np.broadcast_arrays(obs, tgt)
+    n = len(obs)
+    h_obs = np.broadcast_to(np.asarray(observer_height, dtype=np.float64), (n,))
+    h_tgt = np.broadcast_to(np.asarray(target_height, dtype=np.float64), (n,))
+    step = float(step or min(dem.res))
+
+    # Work in fractional pixel space so sampling needs no per-point affine.
+    r_obs, c_obs = dem.rowcol(obs[:, 0], obs[:, 1])
+    r_tgt, c_tgt = dem.rowcol(tgt[:, 0], tgt[:, 1])
+    z_obs = bilinear(dem.data, r_obs, c_obs) + h_obs
+    z_tgt = bilinear(dem.data, r_tgt, c_tgt) + h_tgt
+    valid = np.isfinite(z_obs) & np.isfinite(z_tgt)
+
+    dist = np.hypot(tgt[:, 0] - obs[:, 0], tgt[:, 1] - obs[:, 1])
+    z_tgt = z_tgt - curvature_drop(dist, curvature, refraction)
+    n_inner = np.maximum(np.ceil(dist / step).astype(np.intp) - 1, 0)
+    n_max = int(n_inner.max()) if n else 0
+
+    first_block = np.full(n, -1, dtype=np.intp)
+    if n_max > 0:
+        sample_dist = np.arange(1, n_max + 1, dtype=np.float64) * step
+        drop = curvature_drop(sample_dist, curvature, refraction)
+        chunk = max(1, max_samples // n_max)
+        for lo in range(0, n, chunk):
+            sl = slice(lo, lo + chunk)
+            first_block[sl] = _first_block(
+                dem.data,
+                sample_dist,
+                drop,
+                dist[sl],
+                n_inner[sl],
+                r_obs[sl], c_obs[sl], r_tgt[sl], c_tgt[sl],
+                z_obs[sl], z_tgt[sl],
+            )
+
+    visible = valid & (first_block < 0)
+    return LosResult(visible, first_block, valid, step)
+
+
+def _first_block(data, sample_dist, drop, dist, n_inner, r_obs, c_obs, r_tgt, c_tgt, z_obs, z_tgt):
+    """First blocking sample index per pair for one (pairs x samples) chunk."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = sample_dist[None, :] / dist[:, None]
+    inside = np.arange(len(sample_dist))[None, :] < n_inner[:, None]
+
+    rows = r_obs[:, None] + (r_tgt - r_obs)[:, None] * t
+    cols = c_obs[:, None] + (c_tgt - c_obs)[:, None] * t
+    ground = bilinear(data, rows, cols)
+    # Lifting the sightline by the drop is the same as lowering the terrain.
+    sight = z_obs[:, None] + (z_tgt - z_obs)[:, None] * t + drop[None, :]
+
+    # NaN terrain (nodata / off-raster) compares False and never blocks.
+    blocked = inside & (ground > sight)
+    hit = blocked.any(axis=1)
+    return np.where(hit, blocked.argmax(axis=1), -1)
+
+
+def main(argv=None):
+    from .dem import Dem
+    from .export import los_to_geojson, save_json
+    from .rawdem import ensure_raw_cache
+    from .route import load_track, read_waypoints, resample
+
+    parser = argparse.ArgumentParser(description="Batch LOS from one observer to route or waypoint targets.")
+    parser.add_argument("dem", help="projected DEM (metres)")
+    parser.add_argument("lng", type=float)
+    parser.add_argument("lat", type=float)
+    parser.add_argument("targets", help="GPX / GeoJSON track, or a waypoint GeoJSON")
+    parser.add_argument("-o", "--output", default="los_result.json")
+    parser.add_argument("--every", type=float, default=None, help="resample track targets every N metres")
+    parser.add_argument("--observer-height", type=float, default=1.7)
+    parser.add_argument("--target-height", type=float, default=1.7)
+    parser.add_argument("--refraction", type=float, default=DEFAULT_REFRACTION)
+    parser.add_argument("--no-curvature", action="store_true")
+    args = parser.parse_args(argv)
+
+    dem = Dem.open(ensure_raw_cache(args.dem))
+    try:
+        track = load_track(args.targets)
+        lng, lat = track.lng, track.lat
+    except ValueError:
+        _, lng, lat = read_waypoints(args.targets)
+    x, y = dem.lnglat_to_xy(lng, lat)
+    if args.every:
+        x, y, _ = resample(np.asarray(x), np.asarray(y), args.every)
+    targets = np.column_stack([x, y])
+    observer = dem.lnglat_to_xy(args.lng, args.lat)
+    result = line_of_sight(
+        dem, observer, targets,
+        observer_height=args.observer_height,
+        target_height=args.target_height,
+        curvature=not args.no_curvature,
+        refraction=args.refraction,
+    )
+    save_json(los_to_geojson(dem, observer, targets, result), args.output)
+    print(f"{int(result.visible.sum())} of {len(targets)} targets visible -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -78,8 +78,6 @@ def _(mo):
 def _():
     import os
     import sys
-    import fiona
-    #import rasterio
 
     # Fix PROJ database conflict: rasterio requires proj.db MINOR >= 5, but pyproj
     # and PostgreSQL/PostGIS ship older versions that get picked up first.
@@ -90,6 +88,12 @@ def _():
     if os.path.isdir(_proj_data):
         os.environ["PROJ_DATA"] = _proj_data
 
+    # The notebook runs from los_module/; put the repo root on the path so the
+    # headless kernels import as the `los_module` package.
+    _repo_root = os.path.dirname(os.path.abspath("."))
+    if _repo_root not in sys.path:
+        sys.path.insert(0, _repo_root)
+
     import leafmap.maplibregl as leafmap
     print("maplibregl")
     return leafmap, os
@@ -128,13 +132,16 @@ def _(mo):
 
 @app.cell
 def _(leafmap, set_observer):
-    import geopandas as gpd
+    from los_module.route import load_track
 
     dem = "DEM.tif"
     m = leafmap.Map(style="dark-matter")
     m.add_raster(dem, colormap="terrain", layer_name="DEM")
 
-    tracks = gpd.read_file("TOR330-CERT-2025.gpx", layer="tracks")
+    # Parsed once into arrays (lng/lat/ele/time/chainage) and cached as
+    # .TOR330-CERT-2025.gpx.<hash>.track.npz next to the GPX.
+    route_track = load_track("TOR330-CERT-2025.gpx")
+    tracks = route_track.to_geodataframe()
     m.add_gdf(tracks, name="TOR330 Route", layer_type="line", paint={"line-color": "red", "line-width": 3})
 
     # Observer marker as a GeoJSON source + circle layer so we can update
@@ -169,7 +176,7 @@ def _(leafmap, set_observer):
     m.observe(_on_click, names="clicked")
 
     m
-    return gpd, m, tracks
+    return m, route_track, tracks
 
 
 @app.cell(hide_code=True)
@@ -191,90 +198,44 @@ def _(mo):
 
 
 @app.cell
-def _(os):
+def _(os, tracks):
     """Pre-smooth the DEM and start a local terrain-RGB tile server."""
-    import threading
-    import numpy as np_server
-    from io import BytesIO
-    from PIL import Image as PILImage
-    from scipy.ndimage import gaussian_filter
-    import rasterio as _rio
-
-    from starlette.applications import Starlette
-    from starlette.responses import Response
-    from starlette.routing import Route
-    import uvicorn
-
-    from rio_tiler.io import Reader
+    from los_module.smoothing import smooth_dem
+    from los_module.tile_server import MBTilesService, TerrainTileService, create_app, serve_in_thread
 
     _DEM_RAW = os.path.abspath("DEM_4326.tif")
     _DEM_SMOOTH = os.path.abspath("DEM_4326_smooth.tif")
     _TERRAIN_PORT = 8765
     _TILE_SIZE = 512
+    _TILE_ENCODER = "png"  # "png-fast" / "webp": see `python -m los_module.bench encoders`
     _GAUSSIAN_SIGMA = 3  # sigma in pixels — at 30m DEM this smooths over ~90m radius
+    _SEED_ROUTE_ZOOMS = None  # e.g. (8, 12) to pre-render the route's bounding box
+    # Static pyramid from `python -m los_module.pyramid DEM_4326_smooth.tif terrain.mbtiles`
+    _MBTILES = os.path.abspath("terrain.mbtiles")
 
-    # --- Pre-smooth the entire DEM once (writes DEM_4326_smooth.tif) ---
+    # --- Pre-smooth the DEM once, block by block (writes DEM_4326_smooth.tif as a COG) ---
     if not os.path.exists(_DEM_SMOOTH) or os.path.getmtime(_DEM_RAW) > os.path.getmtime(_DEM_SMOOTH):
         print(f"Smoothing DEM (sigma={_GAUSSIAN_SIGMA})...")
-        with _rio.open(_DEM_RAW) as src:
-            elev = src.read(1).astype(np_server.float64)
-            profile = src.profile.copy()
-        elev_smooth = gaussian_filter(elev, sigma=_GAUSSIAN_SIGMA)
-        profile.update(dtype="float32")
-        with _rio.open(_DEM_SMOOTH, "w", **profile) as dst:
-            dst.write(elev_smooth.astype(np_server.float32), 1)
+        smooth_dem(_DEM_RAW, _DEM_SMOOTH, sigma=_GAUSSIAN_SIGMA)
         print(f"Saved smoothed DEM to {_DEM_SMOOTH}")
     else:
         print(f"Using existing smoothed DEM: {_DEM_SMOOTH}")
 
-    _DEM_PATH = _DEM_SMOOTH
-
-    def _elevation_to_terrain_rgb(elev):
-        """Encode elevation (metres) -> Mapbox terrain-RGB (3 x uint8)."""
-        v = ((elev + 10000.0) / 0.1).clip(0, 256**3 - 1).astype(np_server.uint32)
-        r = ((v >> 16) & 0xFF).astype(np_server.uint8)
-        g = ((v >> 8) & 0xFF).astype(np_server.uint8)
-        b = (v & 0xFF).astype(np_server.uint8)
-        return np_server.stack([r, g, b], axis=0)
-
-    def _tile_handler(request):
-        z = int(request.path_params["z"])
-        x = int(request.path_params["x"])
-        y = int(request.path_params["y"])
-        try:
-            with Reader(_DEM_PATH) as src:
-                img = src.tile(x, y, z, tilesize=_TILE_SIZE,
-                               resampling_method="cubic_spline")
-            rgb = _elevation_to_terrain_rgb(img.data[0].astype(np_server.float64))
-            pil = PILImage.fromarray(np_server.transpose(rgb, (1, 2, 0)))
-            buf = BytesIO()
-            pil.save(buf, format="PNG")
-            return Response(
-                buf.getvalue(),
-                media_type="image/png",
-                headers={
-                    "Access-Control-Allow-Origin": "*",
-                    "Cache-Control": "public, max-age=3600",
-                },
-            )
-        except Exception:
-            # Tile outside DEM extent — flat sea-level tile
-            buf = BytesIO()
-            PILImage.new("RGB", (_TILE_SIZE, _TILE_SIZE), (1, 134, 160)).save(buf, format="PNG")
-            return Response(buf.getvalue(), media_type="image/png",
-                            headers={"Access-Control-Allow-Origin": "*"})
-
-    _app = Starlette(routes=[Route("/tiles/{z}/{x}/{y}.png", _tile_handler)])
-
-    _thread = threading.Thread(
-        target=uvicorn.run,
-        args=(_app,),
-        kwargs={"host": "127.0.0.1", "port": _TERRAIN_PORT, "log_level": "warning"},
-        daemon=True,
-    )
-    _thread.start()
+    # One shared reader per server thread and an LRU of encoded tiles (with ETags),
+    # so repeated terrain + hillshade requests skip reprojection and PNG encoding.
+    if os.path.exists(_MBTILES):
+        print(f"Serving pre-rendered pyramid {_MBTILES}")
+        _service = MBTilesService(_MBTILES)
+    else:
+        _service = TerrainTileService(_DEM_SMOOTH, tilesize=_TILE_SIZE, encoder=_TILE_ENCODER)
+    if _SEED_ROUTE_ZOOMS and isinstance(_service, TerrainTileService):
+        _n = _service.seed(tuple(tracks.total_bounds), *_SEED_ROUTE_ZOOMS)
+        print(f"Pre-seeded {_n} tiles over the route bounding box")
+
+    serve_in_thread(create_app(_service), port=_TERRAIN_PORT)
 
-    terrain_tile_url = f"http://127.0.0.1:{_TERRAIN_PORT}/tiles/{{z}}/{{x}}/{{y}}.png"
+    _ext = "webp" if _service.encoder == "webp" else "png"
+    terrain_tile_url = f"http://127.0.0.1:{_TERRAIN_PORT}/tiles/{{z}}/{{x}}/{{y}}.{_ext}"
     print(f"Terrain-RGB tile server running at {terrain_tile_url}")
     return (terrain_tile_url,)
 
@@ -345,114 +306,127 @@ def _(get_observer, mo):
 
 
 @app.cell
-def _(gpd, m, observer, os):
-    from whitebox import WhiteboxTools
-    from shapely.geometry import Point
+def _():
+    # Viewshed cache shared across observer clicks: observers snap to a DEM cell,
+    # so repeat clicks at the same aid station are served from memory or disk.
+    from los_module.cache import ViewshedCache
+
+    vs_cache = ViewshedCache(max_bytes=256 * 2**20, cache_dir=".viewshed_cache")
+    return (vs_cache,)
+
+
+@app.cell
+def _(los_dem, m, observer, os, vs_cache):
     import rasterio
-    # 1. Get marker coordinates from the map
+
+    VIEWSHED_RADIUS = 20_000  # metres; terrain beyond this is never read
+    # 1. Get marker coordinates from the map and project them into the DEM CRS (EPSG:25832)
     marker_lng, marker_lat = observer["lng"], observer["lat"]
     print(f'Observer position (WGS84): lng={marker_lng:.6f}, lat={marker_lat:.6f}')
-    station_gdf = gpd.GeoDataFrame({'id': [1]}, geometry=[Point(marker_lng, marker_lat)], crs='EPSG:4326').to_crs('EPSG:25832')
-    print(f'Reprojected to EPSG:25832: x={station_gdf.geometry.iloc[0].x:.1f}, y={station_gdf.geometry.iloc[0].y:.1f}')
-    # 2. Create station point and reproject to match DEM CRS (EPSG:25832)
-    station_file = os.path.abspath('viewshed_station.shp')
-    station_gdf.to_file(station_file)
-    dem_path = os.path.abspath('DEM.tif')
+    _x, _y = los_dem.lnglat_to_xy(marker_lng, marker_lat)
+    print(f'Reprojected to {los_dem.crs}: x={_x:.1f}, y={_y:.1f}')
+    # 2. Run the in-process viewshed over the radius window only (cached)
+    vs_result = vs_cache.get_or_compute(los_dem, (_x, _y), VIEWSHED_RADIUS, observer_height=1.7)
+    print(f'Viewshed window {vs_result.mask.shape}, {vs_result.mask.sum():,} visible cells')
+    # 3. Write the window once (0 = nodata) for the map layers below
     output_path = os.path.abspath('viewshed_result.tif')
-    wbt = WhiteboxTools()
-    wbt.work_dir = os.path.abspath('.')
-    wbt.verbose = True
-    wbt.viewshed(dem=dem_path, stations=station_file, output=output_path, height=1.7)
-    assert os.path.exists(output_path), 'Viewshed output not created. Check WhiteboxTools output above.'
-    with rasterio.open(output_path) as _src:
-        _data = _src.read(1)
-    # 3. Run viewshed analysis
-        _profile = _src.profile.copy()
-    _profile.update(nodata=0)
-    with rasterio.open(output_path, 'w', **_profile) as _dst:
-        _dst.write(_data, 1)
+    vs_result.to_geotiff(output_path)
     m.add_raster(output_path, colormap='Greens', layer_name='Viewshed', opacity=0.5)
-    # 4. Post-process: set non-visible (0) as nodata for transparency
-    # 5. Overlay on map ù visible areas shown in green
     print('Viewshed computed and displayed (green = visible from marker).')
-    return marker_lat, marker_lng, rasterio
+    return marker_lat, marker_lng, rasterio, vs_result
 
 
 @app.cell
-def _(leafmap, marker_lat, marker_lng, tracks):
+def _(los_dem, observer):
+    # Moving observer (spectator walking, AR phone, drone camera): the tracker
+    # re-sweeps only the near field and the azimuth sectors whose horizon moved,
+    # and falls back to a full sweep once the observer leaves max_move (90 m).
+    import time
+
+    from los_module.incremental import ViewshedTracker
+
+    vs_tracker = ViewshedTracker(los_dem, 20_000, observer_height=1.7)
+    _x, _y = los_dem.lnglat_to_xy(observer["lng"], observer["lat"])
+    for _k in range(6):
+        _t = time.perf_counter()
+        _vs = vs_tracker.update((_x + 15.0 * _k, _y))
+        print(f"step {_k}: {(time.perf_counter() - _t) * 1000:6.0f} ms, {_vs.mask.sum():,} visible cells")
+    print(
+        f"{vs_tracker.full_updates} full / {vs_tracker.partial_updates} incremental updates, "
+        f"{vs_tracker.sectors_recomputed} sectors re-swept"
+    )
+    return (vs_tracker,)
+
+
+@app.cell
+def _():
+    # Viewshed overlays by URL instead of base64 data URLs: the overlay server
+    # crops each mask to its visible bbox, reprojects only that crop and serves
+    # a 1-bit palette PNG (or XYZ tiles), cached by viewshed key.
+    from los_module.overlay import OverlayService, create_overlay_app
+    from los_module.tile_server import serve_in_thread as _serve_in_thread
+
+    _OVERLAY_PORT = 8766
+    overlay_url = f"http://127.0.0.1:{_OVERLAY_PORT}"
+    overlay_service = OverlayService()
+    _serve_in_thread(create_overlay_app(overlay_service, overlay_url), port=_OVERLAY_PORT)
+    print(f"Viewshed overlays at {overlay_url}/overlay/<token>.png")
+    return overlay_service, overlay_url
+
+
+@app.cell
+def _(leafmap, los_dem, marker_lat, marker_lng, overlay_service, overlay_url, tracks, vs_result):
     # New map showing viewshed analysis results
-    from ipyleaflet import Marker, AwesomeIcon
+    from ipyleaflet import Marker, AwesomeIcon, ImageOverlay
     import matplotlib.pyplot as plt
-    import matplotlib.colors as mcolors
-    from PIL import Image
     import numpy as np
-    import rioxarray
-    # Read viewshed with rioxarray and reproject to EPSG:4326
-    vs = rioxarray.open_rasterio('viewshed_result.tif').squeeze()
-    vs = vs.rio.reproject('EPSG:4326')
-    _bounds = vs.rio.bounds()
-    _data = vs.values  # (left, bottom, right, top)
-    _h, _w = _data.shape
-    # Create a transparent PNG overlay: visible=green, non-visible=transparent
-    _rgba = np.zeros((_h, _w, 4), dtype=np.uint8)
-    visible = _data == 1
-    _rgba[visible] = [0, 200, 0, 180]
-    _img_path = 'viewshed_overlay.png'
-    Image.fromarray(_rgba).save(_img_path)  # green, semi-transparent
-    from ipyleaflet import ImageOverlay
-    import base64
-    with open(_img_path, 'rb') as _f:
-        _b64 = base64.b64encode(_f.read()).decode()
-    # Display on map using image overlay
-    _data_url = f'data:image/png;base64,{_b64}'
+    from los_module.cache import viewshed_key
+
+    _key = viewshed_key(los_dem, vs_result.observer, vs_result.radius, vs_result.observer_height)
+    _token = overlay_service.add(_key, vs_result)
+    _w, _s, _e, _n = overlay_service.bounds(_token)
+    # Display on map using image overlay (green = visible, transparent elsewhere)
     m2 = leafmap.Map()
     m2.add_raster('DEM.tif', colormap='terrain', layer_name='DEM', opacity=0.7)
-    _overlay = ImageOverlay(url=_data_url, bounds=((_bounds[1], _bounds[0]), (_bounds[3], _bounds[2])), name='Viewshed')
+    _overlay = ImageOverlay(url=f'{overlay_url}/overlay/{_token}.png', bounds=((_s, _w), (_n, _e)), name='Viewshed')
     m2.add(_overlay)
     m2.add_gdf(tracks, name='TOR330 Route', layer_type='line', paint={'line-color': 'red', 'line-width': 3})
     _icon = AwesomeIcon(name='eye', marker_color='red', icon_color='white')
     obs_marker = Marker(location=(marker_lat, marker_lng), icon=_icon, title='Observer')
     m2.add(obs_marker)
     m2  # ((south, west), (north, east))
-    return AwesomeIcon, Image, ImageOverlay, Marker, base64, np, plt, rioxarray
-
-
-@app.cell
-def _(np, rasterio):
-    from scipy.ndimage import median_filter, binary_closing, generate_binary_structure
-    import scipy
-    with rasterio.open('viewshed_result.tif') as _src:
-        raw = _src.read(1)
-        _profile = _src.profile.copy()
-    binary = (raw == 1).astype(np.uint8)
-    filtered = median_filter(binary, size=3)
-    struct = generate_binary_structure(2, 2)
-    closed = binary_closing(filtered, structure=struct, iterations=1).astype(np.uint8)
-    orig_count = binary.sum()
-    clean_count = closed.sum()
-    print(f'Visible pixels ù before: {orig_count:,}  after: {clean_count:,}  change: {clean_count - orig_count:+,} ({(clean_count / orig_count - 1) * 100:+.1f}%)')
-    _profile.update(nodata=0)
-    with rasterio.open('viewshed_destriped.tif', 'w', **_profile) as _dst:
-        _dst.write(closed, 1)
+    return AwesomeIcon, ImageOverlay, Marker, np, plt, viewshed_key
+
+
+@app.cell
+def _(vs_result):
+    # Fill the one-cell gaps between far rays: 3x3 majority (binary median) and
+    # 3x3 closing, computed on bit-packed rows over the visible bbox only.
+    # viewshed(..., destripe=True) does the same inside the pipeline.
+    import dataclasses
+
+    from los_module.destripe import destripe_mask, visible_bbox
+
+    binary = vs_result.mask
+    closed = destripe_mask(binary)
+    orig_count = int(binary.sum())
+    clean_count = int(closed.sum())
+    print(f'Visible pixels before: {orig_count:,}  after: {clean_count:,}  change: {clean_count - orig_count:+,} ({(clean_count / orig_count - 1) * 100:+.1f}%)')
+    vs_destriped = dataclasses.replace(vs_result, mask=closed)
+    vs_destriped.crop().to_geotiff('viewshed_destriped.tif')
     print('Saved viewshed_destriped.tif')
-    return binary, clean_count, closed, orig_count
+    return binary, clean_count, closed, orig_count, visible_bbox, vs_destriped
 
 
 @app.cell
-def _(binary, clean_count, closed, np, orig_count, plt):
+def _(binary, clean_count, closed, orig_count, plt, visible_bbox):
     # Side-by-side comparison: original vs destriped viewshed
     fig, axes = plt.subplots(1, 2, figsize=(16, 8))
-    rows = np.any(binary, axis=1)
-    cols = np.any(binary, axis=0)
-    rmin, rmax = np.where(rows)[0][[0, -1]]
     # Crop to the region with actual viewshed data for better comparison
-    cmin, cmax = np.where(cols)[0][[0, -1]]
-    pad = 20
-    rmin, rmax = (max(0, rmin - pad), min(binary.shape[0], rmax + pad))
-    cmin, cmax = (max(0, cmin - pad), min(binary.shape[1], cmax + pad))
-    axes[0].imshow(binary[rmin:rmax, cmin:cmax], cmap='Greens', interpolation='nearest')
+    _bbox = visible_bbox(binary, pad=20)
+    axes[0].imshow(binary[_bbox], cmap='Greens', interpolation='nearest')
     axes[0].set_title(f'Original ({orig_count:,} px)')
-    axes[1].imshow(closed[rmin:rmax, cmin:cmax], cmap='Greens', interpolation='nearest')
+    axes[1].imshow(closed[_bbox], cmap='Greens', interpolation='nearest')
     axes[1].set_title(f'Destriped ({clean_count:,} px)')
     for ax in axes:
         ax.axis('off')
@@ -474,32 +448,26 @@ def _(mo):
 @app.cell
 def _(
     AwesomeIcon,
-    Image,
     ImageOverlay,
     Marker,
-    base64,
     leafmap,
+    los_dem,
     marker_lat,
     marker_lng,
-    np,
-    rioxarray,
+    overlay_service,
+    overlay_url,
     tracks,
+    viewshed_key,
+    vs_destriped,
 ):
-    vs_clean = rioxarray.open_rasterio('viewshed_destriped.tif').squeeze()
-    vs_clean = vs_clean.rio.reproject('EPSG:4326')
-    _bounds = vs_clean.rio.bounds()
-    data_clean = vs_clean.values
-    _h, _w = data_clean.shape
-    _rgba = np.zeros((_h, _w, 4), dtype=np.uint8)
-    _rgba[data_clean == 1] = [0, 200, 0, 180]
-    _img_path = 'viewshed_overlay_destriped.png'
-    Image.fromarray(_rgba).save(_img_path)
-    with open(_img_path, 'rb') as _f:
-        _b64 = base64.b64encode(_f.read()).decode()
-    _data_url = f'data:image/png;base64,{_b64}'
+    _key = viewshed_key(
+        los_dem, vs_destriped.observer, vs_destriped.radius, vs_destriped.observer_height, destripe=True
+    )
+    _token = overlay_service.add(_key, vs_destriped)
+    _w, _s, _e, _n = overlay_service.bounds(_token)
     m3 = leafmap.Map()
     m3.add_raster('DEM.tif', colormap='terrain', layer_name='DEM', opacity=0.7)
-    _overlay = ImageOverlay(url=_data_url, bounds=((_bounds[1], _bounds[0]), (_bounds[3], _bounds[2])), name='Viewshed (destriped)')
+    _overlay = ImageOverlay(url=f'{overlay_url}/overlay/{_token}.png', bounds=((_s, _w), (_n, _e)), name='Viewshed (destriped)')
     m3.add(_overlay)
     m3.add_gdf(tracks, name='TOR330 Route', layer_type='line', paint={'line-color': 'red', 'line-width': 3})
     _icon = AwesomeIcon(name='eye', marker_color='red', icon_color='white')
@@ -509,18 +477,28 @@ def _(
 
 
 @app.cell
-def _():
-    # TODO: Create function to get elevation at a given (lat, lng) coordinate
-    # - Convert geographic coordinates to pixel indices
-    # - Handle edge cases (out of bounds, nodata values)
-    # - Consider interpolation for sub-pixel accuracy
-    return
+def _(los_dem):
+    # Elevation at (lng, lat): DemSampler precomputes the inverse affine and the
+    # WGS84 -> DEM CRS transformer, then samples whole arrays at once with
+    # nearest / bilinear / bicubic interpolation. Nodata and off-raster points
+    # come back as NaN, with `outside` flagging the latter.
+    from los_module.sampler import DemSampler
+
+    sampler = DemSampler(los_dem)
+    return (sampler,)
 
 
 @app.cell
-def _():
-    # TODO: Test elevation lookup with known points from the TOR330 route
-    # Compare with elevation values in the GeoJSON to validate
+def _(np, sampler, tracks):
+    # Validate against the elevations stored in the TOR330 GPX track
+    _pts = tracks.get_coordinates(include_z=True)
+    for _method in ("nearest", "bilinear", "bicubic"):
+        _res = sampler.sample(_pts["x"].to_numpy(), _pts["y"].to_numpy(), method=_method)
+        _diff = _res.values[_res.valid] - _pts["z"].to_numpy()[_res.valid]
+        print(
+            f"{_method:>8}: {_res.valid.sum():,}/{len(_pts):,} points on the DEM, "
+            f"DEM - GPX mean {np.mean(_diff):+.1f} m, RMSE {np.sqrt(np.mean(_diff**2)):.1f} m"
+        )
     return
 
 
@@ -548,21 +526,117 @@ def _(mo):
 
 @app.cell
 def _():
-    # TODO: Implement function to generate sample points along a line between two coordinates
-    # - Input: observer (lat, lng, height), target (lat, lng, height)
-    # - Output: list of (lat, lng) sample points
+    # Map DEM.tif once through the raw cache (built on first run, rebuilt when
+    # DEM.tif changes); every LOS query below reuses the memory-mapped array.
+    # Sampling along the sightline and the terrain-vs-sightline test are
+    # vectorized over all pairs in los_module.los.line_of_sight.
+    from los_module import Dem, line_of_sight
+    from los_module.rawdem import ensure_raw_cache
+
+    los_dem = Dem.open(ensure_raw_cache("DEM.tif"))
+    return line_of_sight, los_dem
+
+
+@app.cell
+def _(line_of_sight, los_dem, observer, tracks):
+    # Basic LOS: which route vertices can the observer see?
+    _route = tracks.to_crs(los_dem.crs).get_coordinates().to_numpy()
+    _obs = los_dem.lnglat_to_xy(observer["lng"], observer["lat"])
+    route_los = line_of_sight(los_dem, _obs, _route, observer_height=1.7, target_height=1.7)
+    print(f"{route_los.visible.sum():,} of {len(_route):,} route points visible from the observer")
+    return (route_los,)
+
+
+@app.cell
+def _(los_dem, np, observer, route_los, tracks):
+    # Horizon profile: one sweep per fixed observer, then every LOS query from
+    # it is a lookup + slope comparison. The skyline is what ARView draws.
+    import time as _time
+
+    from los_module.horizon import horizon_profile
+
+    _obs = los_dem.lnglat_to_xy(observer["lng"], observer["lat"])
+    horizon = horizon_profile(los_dem, _obs, 20_000)
+    _route = tracks.to_crs(los_dem.crs).get_coordinates().to_numpy()
+    _t0 = _time.perf_counter()
+    _seen = horizon.visible(los_dem, _route[:, 0], _route[:, 1], target_height=1.7)
+    _ms = (_time.perf_counter() - _t0) * 1000
+    _in_range = np.hypot(_route[:, 0] - _obs[0], _route[:, 1] - _obs[1]) <= 20_000
+    _agree = (_seen == (route_los.visible & _in_range)).mean()
+    print(f"Horizon LOS for {len(_route):,} route points in {_ms:.1f} ms, {_agree:.2%} agreement with line_of_sight")
+    print(f"Skyline: max {max(horizon.skyline()['elevation_deg']):.1f} deg over {horizon.n_azimuths} azimuths")
+    return (horizon,)
+
+
+@app.cell
+def _(route_track):
+    # STR-tree index over route segments and aid stations, built once; snaps
+    # clicks or athletes to the course in O(log n) instead of scanning points.
+    from los_module.route import read_waypoints
+    from los_module.route_index import RouteIndex
+
+    route_index = RouteIndex(route_track, read_waypoints("../apps/spectator/public/TOR330_waypoints.geojson"))
+    return (route_index,)
+
+
+@app.cell
+def _(observer, route_index):
+    # Where is the observer relative to the course?
+    _p = route_index.project(observer["lng"], observer["lat"])
+    _w, _d = route_index.nearest_waypoint(observer["lng"], observer["lat"])
+    _near = route_index.chainage_within(observer["lng"], observer["lat"], 2_000)[0]
+    print(f"Nearest route point: km {_p.chainage[0] / 1000:.2f}, {_p.distance[0]:.0f} m away")
+    print(f"Nearest aid station: {route_index.waypoint_names[_w[0]]} ({_d[0]:.0f} m)")
+    print("Course within 2 km: " + ", ".join(f"km {a / 1000:.1f}-{b / 1000:.1f}" for a, b in _near))
     return
 
 
 @app.cell
-def _():
-    # TODO: Implement basic LOS calculation
-    # - For each sample point, get terrain elevation
-    # - Calculate the expected sightline height at that point
-    # - Check if terrain is above sightline (blocked) or below (visible)
+def _(los_dem, route_track):
+    # Batch visibility feed for MultiAthleteSimulation: POST one tick (observer
+    # + every athlete's chainage) to /los for a bitmap, or stream ticks over
+    # the /los/stream WebSocket and get only seen/lost changes back.
+    from los_module.los_service import LosService, create_los_app
+    from los_module.tile_server import serve_in_thread as _serve_in_thread
+
+    _LOS_PORT = 8767
+    los_service = LosService(los_dem, route_track)
+    _serve_in_thread(create_los_app(los_service), port=_LOS_PORT)
+    print(f"LOS service at http://127.0.0.1:{_LOS_PORT}/los")
+    return (los_service,)
+
+
+@app.cell
+def _(los_service, np, observer):
+    # One tick: 300 simulated athletes spread over the first 150 km
+    _doc = los_service.bitmap({
+        "observer": observer,
+        "ids": list(range(300)),
+        "chainage": np.linspace(0, 150_000, 300).tolist(),
+    })
+    print(f"{_doc['count']} of 300 athletes in view")
     return
 
 
+@app.cell
+def _(los_dem, np, tracks):
+    # Cumulative viewshed for course planning: one observer every 500 m of the
+    # route, computed across a process pool that shares the memory-mapped DEM.
+    # `counts` is how many of those observers see each cell.
+    from los_module.cumulative import cumulative_viewshed
+    from los_module.route import resample
+
+    _route = tracks.to_crs(los_dem.crs).get_coordinates().to_numpy()
+    _x, _y, _ = resample(_route[:, 0], _route[:, 1], 500.0)
+    route_cumulative = cumulative_viewshed(los_dem.path, np.column_stack([_x, _y]), 5_000)
+    route_cumulative.to_geotiff("cumulative_viewshed.tif")
+    print(
+        f"{route_cumulative.valid.sum()} observers, "
+        f"{np.count_nonzero(route_cumulative.counts):,} cells seen by at least one"
+    )
+    return (route_cumulative,)
+
+
 @app.cell
 def _():
     # TODO: Test LOS with simple cases
@@ -614,14 +688,17 @@ def _(mo):
 
 @app.cell
 def _():
-    # TODO: Implement earth curvature correction
-    # Formula: curvature_drop = distance^2 / (2 * earth_radius)
-    return
-
-
-@app.cell
-def _():
-    # TODO: Add observer height parameter (e.g., 1.7m for eye level)
+    # Earth curvature and refraction are applied inside the LOS and viewshed
+    # kernels (curvature=True, refraction=0.13 by default) as a drop table over
+    # the sample distances: drop = (1 - k) * d^2 / (2 * R).
+    # Observer/target heights are the observer_height / target_height arguments.
+    from los_module.los import curvature_drop
+
+    for _d in (1_000, 5_000, 10_000, 20_000):
+        print(
+            f"{_d / 1000:>4.0f} km: curvature {curvature_drop(_d, refraction=0.0):6.2f} m, "
+            f"with refraction {curvature_drop(_d):6.2f} m"
+        )
     return
 
 
@@ -637,28 +714,44 @@ def _(mo):
 
 
 @app.cell
-def _():
-    # TODO: Define output format
-    # - JSON structure for LOS result
-    # - Include: observer, target, visibility (bool), blocked_points (if any)
-    return
+def _(line_of_sight, los_dem, observer, tracks):
+    # LOS output: GeoJSON (WGS84, as the ARView uses) with the observer and one
+    # point per target carrying `visible`, `distance` and, when blocked, the
+    # first blocking point `blocked_at` and its `block_distance`.
+    from los_module.export import los_to_geojson, save_json
+
+    _targets = tracks.to_crs(los_dem.crs).get_coordinates().to_numpy()[::50]
+    _obs = los_dem.lnglat_to_xy(observer["lng"], observer["lat"])
+    _res = line_of_sight(los_dem, _obs, _targets, observer_height=1.7, target_height=1.7)
+    los_geojson = los_to_geojson(los_dem, _obs, _targets, _res)
+    save_json(los_geojson, "los_result.json")
+    print(f"Saved los_result.json: {len(_targets)} targets, {int(_res.visible.sum())} visible")
+    return los_geojson, save_json
 
 
 @app.cell
-def _():
-    # TODO: Create function to export LOS results
-    # - Save to JSON file
-    # - Compatible with ARView coordinate system
-    return
+def _(os, save_json, vs_destriped):
+    # Viewshed output for phones: simplified polygons (GeoJSON / FlatGeobuf)
+    # or run-length rows on a lng/lat grid, each coarsened to fit a size budget.
+    from los_module.export import viewshed_to_flatgeobuf, viewshed_to_geojson, viewshed_to_rle
+
+    vs_geojson = viewshed_to_geojson(vs_destriped, max_bytes=100_000)
+    vs_rle = viewshed_to_rle(vs_destriped, max_bytes=100_000)
+    save_json(vs_geojson, "viewshed.geojson")
+    save_json(vs_rle, "viewshed_rle.json")
+    viewshed_to_flatgeobuf(vs_destriped, "viewshed.fgb")
+    for _path in ("viewshed.geojson", "viewshed_rle.json", "viewshed.fgb", "viewshed_destriped.tif"):
+        print(f"{_path:>24}: {os.path.getsize(_path) / 1024:8.1f} KiB")
+    return vs_geojson, vs_rle
 
 
 @app.cell(hide_code=True)
 def _(mo):
     mo.md(r"""
     ---
-    ## Phase 2: MapBox terrain-rgb Tiles (Future)
+    ## Phase 2: MapBox terrain-rgb Tiles
 
-    Once Phase 1 is complete, we can explore using MapBox terrain-rgb tiles to align with the main application.
+    `los_module.tile_dem` decodes the same terrain-RGB pyramid the main application renders, so LOS can run on identical data.
 
     ### Elevation Encoding
     MapBox terrain-rgb tiles encode elevation in RGB values:
@@ -672,11 +765,31 @@ def _(mo):
 
 
 @app.cell
-def _():
-    # TODO (Future): Implement MapBox terrain-rgb tile fetching
-    # TODO (Future): Decode elevation from RGB values
-    # TODO (Future): Compare results with Copernicus DEM
-    return
+def _(line_of_sight, los_dem, np, observer, os, tracks):
+    # LOS on the terrain-RGB pyramid the ARView renders: tiles decoded into a
+    # float32 mosaic (LRU of decoded tiles), reprojected to the DEM's metric
+    # CRS, then compared with the Copernicus DEM at the route vertices and in
+    # the same observer -> route LOS as above.
+    from los_module.tile_dem import TilePyramid
+
+    _MBTILES = os.path.abspath("terrain.mbtiles")
+    if os.path.exists(_MBTILES):
+        _pyramid = TilePyramid(_MBTILES)
+        _bounds = tracks.total_bounds + np.array([-0.02, -0.02, 0.02, 0.02])
+        tile_dem = _pyramid.read(tuple(_bounds), crs=los_dem.crs, res=abs(los_dem.transform.a))
+        _route = tracks.to_crs(los_dem.crs).get_coordinates().to_numpy()
+        _diff = tile_dem.sample(_route[:, 0], _route[:, 1]) - los_dem.sample(_route[:, 0], _route[:, 1])
+        print(f"Tiles z{_pyramid.zoom}: {_pyramid.misses} decoded, route |tiles - DEM| "
+              f"median {np.nanmedian(np.abs(_diff)):.1f} m, max {np.nanmax(np.abs(_diff)):.1f} m")
+        _obs = tile_dem.lnglat_to_xy(observer["lng"], observer["lat"])
+        _a = line_of_sight(los_dem, _obs, _route, observer_height=1.7, target_height=1.7)
+        _b = line_of_sight(tile_dem, _obs, _route, observer_height=1.7, target_height=1.7)
+        print(f"LOS agreement DEM vs tiles: {(_a.visible == _b.visible).mean():.1%}")
+        _pyramid.close()
+    else:
+        tile_dem = None
+        print(f"No {_MBTILES}; build it with `python -m los_module.pyramid`")
+    return (tile_dem,)
 
 
 @app.cell(hide_code=True)
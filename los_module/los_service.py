@@ -0,0 +1,216 @@
+"""Batch visibility feed: which athletes can one spectator see, per tick.
+
+    python -m los_module.los_service DEM.tif --route TOR330-CERT-2025.gpx --port 8767
+
+A tick carries the observer and every athlete, either as positions or as
+route chainage in metres (``distanceCovered * 1000`` in the spectator app's
+``MultiAthleteSimulation``)::
+
+    {"tick": 17,
+     "observer": {"lng": 7.05, "lat": 45.79, "height": 1.7},
+     "ids": ["a1", "a2", "a3"],
+     "chainage": [12034.5, 12410.0, 40210.7]}       # or "lng": [...], "lat": [...]
+
+``POST /los`` answers with the full visibility bitmap (all athletes in one
+vectorized ``line_of_sight`` pass)::
+
+    {"tick": 17, "ids": [...], "bitmap": "<base64 packbits, MSB first>",
+     "visible": ["a1"], "count": 1}
+
+``/los/stream`` is a WebSocket taking the same ticks; it replies only when
+something changed, with ``{"tick", "seen": [...], "lost": [...]}`` relative
+to the previous tick on that connection (athletes that drop out of the list
+count as lost).
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import time
+
+import numpy as np
+
+from .los import DEFAULT_REFRACTION, line_of_sight
+from .tile_server import CORS, TileMetrics
+
+# Preflight answer for JSON POSTs from the spectator app's origin.
+PREFLIGHT = {**CORS, "Access-Control-Allow-Methods": "POST, OPTIONS", "Access-Control-Allow-Headers": "Content-Type"}
+
+
+class LosService:
+    """Visibility of many athletes from one observer on a metric DEM.
+
+    ``route`` (a ``route.Track``) is needed only for chainage ticks; its
+    points are projected into the DEM CRS once. Athletes further than
+    ``max_range`` metres are not visible and skip the LOS pass.
+    """
+
+    def __init__(self, dem, route=None, observer_height=1.7, target_height=1.7, max_range=20_000.0,
+                 curvature=True, refraction=DEFAULT_REFRACTION):
+        self.dem = dem
+        self.max_range = max_range
+        self.observer_height = observer_height
+        self.target_height = target_height
+        self.curvature = curvature
+        self.refraction = refraction
+        self._route = None
+        if route is not None:
+            x, y = dem.lnglat_to_xy(route.lng, route.lat)
+            self._route = (np.asarray(route.chainage), np.asarray(x), np.asarray(y))
+
+    def positions(self, tick):
+        """(N, 2) athlete x/y in the DEM CRS from a tick's ``chainage`` or ``lng``/``lat``."""
+        if "chainage" in tick:
+            if self._route is None:
+                raise ValueError("chainage ticks need a route")
+            ch, x, y = self._route
+            at = np.asarray(tick["chainage"], dtype=np.float64)
+            return np.column_stack([np.interp(at, ch, x), np.interp(at, ch, y)])
+        if "lng" in tick and "lat" in tick:
+            x, y = self.dem.lnglat_to_xy(tick["lng"], tick["lat"])
+            return np.column_stack([np.atleast_1d(x), np.atleast_1d(y)])
+        raise ValueError("tick needs 'chainage' or 'lng'/'lat'")
+
+    def visible(self, tick):
+        """(ids, boolean visibility) for one tick; athletes off the DEM or out of range are not visible."""
+        if not isinstance(tick, dict):
+            raise TypeError("a tick must be a JSON object")
+        ids = list(tick.get("ids", []))
+        observer = tick["observer"]
+        targets = self.positions(tick)
+        if len(targets) != len(ids):
+            raise ValueError(f"{len(ids)} ids but {len(targets)} positions")
+        visible = np.zeros(len(ids), dtype=bool)
+        obs = np.array(self.dem.lnglat_to_xy(observer["lng"], observer["lat"]), dtype=np.float64)
+        near = np.flatnonzero(np.hypot(*(targets - obs).T) <= self.max_range)
+        if len(near):
+            res = line_of_sight(
+                self.dem, obs, targets[near],
+                observer_height=observer.get("height", self.observer_height),
+                target_height=self.target_height,
+                curvature=self.curvature,
+                refraction=self.refraction,
+            )
+            visible[near] = res.visible & res.valid
+        return ids, visible
+
+    def bitmap(self, tick):
+        """Full response document for ``POST /los``."""
+        ids, visible = self.visible(tick)
+        return {
+            "tick": tick.get("tick"),
+            "ids": ids,
+            "bitmap": base64.b64encode(np.packbits(visible).tobytes()).decode("ascii"),
+            "visible": [i for i, v in zip(ids, visible) if v],
+            "count": int(visible.sum()),
+        }
+
+
+class VisibilityDiff:
+    """Per-connection visibility state; ``update`` returns only what changed."""
+
+    def __init__(self):
+        self.seen = set()
+
+    def update(self, ids, visible):
+        now = {i for i, v in zip(ids, visible) if v}
+        seen, lost = now - self.seen, self.seen - now
+        self.seen = now
+        return sorted(seen, key=str), sorted(lost, key=str)
+
+
+def _tick_number(tick):
+    return tick.get("tick") if isinstance(tick, dict) else None
+
+
+def create_los_app(service):
+    """Starlette app serving ``service``; LOS passes run in worker threads."""
+    import anyio
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse, Response
+    from starlette.routing import Route, WebSocketRoute
+    from starlette.websockets import WebSocketDisconnect
+
+    metrics = TileMetrics()
+
+    async def los_handler(request):
+        if request.method == "OPTIONS":
+            return Response(status_code=204, headers=PREFLIGHT)
+        start = time.perf_counter()
+        try:
+            doc = await anyio.to_thread.run_sync(service.bitmap, await request.json())
+        except (ValueError, KeyError, TypeError) as e:
+            return JSONResponse({"error": str(e)}, status_code=400, headers=CORS)
+        ms = (time.perf_counter() - start) * 1000
+        metrics.record(ms, ms)
+        return JSONResponse(doc, headers=CORS)
+
+    async def stream_handler(websocket):
+        await websocket.accept()
+        state = VisibilityDiff()
+        try:
+            while True:
+                try:
+                    tick = await websocket.receive_json()
+                except (ValueError, KeyError, TypeError):
+                    # Bad JSON or a binary frame: report it and keep the connection.
+                    await websocket.send_json({"error": "expected a JSON text frame"})
+                    continue
+                start = time.perf_counter()
+                try:
+                    ids, visible = await anyio.to_thread.run_sync(service.visible, tick)
+                    seen, lost = state.update(ids, visible)
+                except (ValueError, KeyError, TypeError) as e:
+                    await websocket.send_json({"tick": _tick_number(tick), "error": str(e)})
+                    continue
+                ms = (time.perf_counter() - start) * 1000
+                metrics.record(ms, ms)
+                if seen or lost:
+                    await websocket.send_json({"tick": tick.get("tick"), "seen": seen, "lost": lost})
+        except WebSocketDisconnect:
+            pass
+
+    async def metrics_handler(request):
+        return JSONResponse(metrics.snapshot(), headers=CORS)
+
+    return Starlette(routes=[
+        Route("/los", los_handler, methods=["POST", "OPTIONS"]),
+        WebSocketRoute("/los/stream", stream_handler),
+        Route("/metrics", metrics_handler),
+    ])
+
+
+def main(argv=None):
+    import uvicorn
+
+    from .dem import Dem
+    from .rawdem import ensure_raw_cache
+    from .route import load_track
+
+    parser = argparse.ArgumentParser(description="Serve batch athlete visibility for spectators.")
+    parser.add_argument("dem", help="projected DEM (metres)")
+    parser.add_argument("--route", help="GPX / GeoJSON route for chainage ticks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--observer-height", type=float, default=1.7)
+    parser.add_argument("--target-height", type=float, default=1.7)
+    parser.add_argument("--max-range", type=float, default=20_000)
+    parser.add_argument("--refraction", type=float, default=DEFAULT_REFRACTION)
+    parser.add_argument("--no-curvature", action="store_true")
+    args = parser.parse_args(argv)
+
+    service = LosService(
+        Dem.open(ensure_raw_cache(args.dem)),
+        load_track(args.route) if args.route else None,
+        observer_height=args.observer_height,
+        target_height=args.target_height,
+        max_range=args.max_range,
+        curvature=not args.no_curvature,
+        refraction=args.refraction,
+    )
+    uvicorn.run(create_los_app(service), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
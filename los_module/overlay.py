@@ -0,0 +1,244 @@
+"""Viewshed map overlays served over HTTP instead of base64 data URLs.
+
+A registered viewshed is cropped to its visible bounding box once; only that
+crop is ever reprojected. It is served either as one palette PNG in EPSG:4326
+(for an ``ImageOverlay``) or as Web-Mercator XYZ tiles (for a raster layer)::
+
+    GET /overlay/{token}.json            bounds + URLs
+    GET /overlay/{token}.png             cropped 1-bit palette PNG, EPSG:4326
+    GET /overlay/{token}/{z}/{x}/{y}.png 1-bit palette tile, EPSG:3857
+
+Tokens are derived from the viewshed cache key, so the same observer maps to
+the same URLs and encoded bodies are cached like terrain tiles.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from io import BytesIO
+
+import numpy as np
+
+from .tile_server import CORS, TileMetrics
+from .tiles import TileCache
+
+OVERLAY_COLOR = (0, 200, 0)
+OVERLAY_ALPHA = 180
+OVERLAY_TILESIZE = 256
+
+
+def overlay_token(key):
+    """Short URL-safe token for a viewshed cache key (see ``cache.viewshed_key``)."""
+    return hashlib.blake2b(repr(key).encode(), digest_size=10).hexdigest()
+
+
+def encode_mask_png(mask, color=OVERLAY_COLOR, alpha=OVERLAY_ALPHA):
+    """Boolean mask -> 1-bit palette PNG (0 transparent, 1 ``color`` at ``alpha``)."""
+    from PIL import Image
+
+    img = Image.fromarray(np.ascontiguousarray(mask, dtype=np.uint8))
+    img.putpalette([0, 0, 0, *color])
+    buf = BytesIO()
+    img.save(buf, format="PNG", bits=1, transparency=bytes([0, alpha]), optimize=True)
+    return buf.getvalue()
+
+
+@lru_cache(maxsize=None)
+def empty_tile(tilesize=OVERLAY_TILESIZE):
+    """Encoded fully transparent overlay tile; built once per size."""
+    return encode_mask_png(np.zeros((tilesize, tilesize), dtype=bool))
+
+
+@dataclass
+class Overlay:
+    """Visible-bbox crop of one viewshed, ready to reproject."""
+
+    mask: np.ndarray
+    transform: object
+    crs: object
+    bounds_4326: tuple
+    bounds_3857: tuple
+
+    @classmethod
+    def from_viewshed(cls, vs):
+        from rasterio.warp import transform_bounds
+
+        crop = vs.crop(pad=1)
+        return cls(
+            np.ascontiguousarray(crop.mask, dtype=np.uint8),
+            crop.transform,
+            crop.crs,
+            transform_bounds(crop.crs, "EPSG:4326", *crop.bounds, densify_pts=21),
+            transform_bounds(crop.crs, "EPSG:3857", *crop.bounds, densify_pts=21),
+        )
+
+    def image(self):
+        """(mask, transform) reprojected to EPSG:4326 at about the native resolution."""
+        from rasterio.warp import calculate_default_transform
+
+        h, w = self.mask.shape
+        left, bottom, right, top = _bounds(self.transform, h, w)
+        dst_transform, dst_w, dst_h = calculate_default_transform(
+            self.crs, "EPSG:4326", w, h, left, bottom, right, top
+        )
+        return self._warp("EPSG:4326", dst_transform, (dst_h, dst_w)), dst_transform
+
+    def tile(self, z, x, y, tilesize=OVERLAY_TILESIZE):
+        """Mask over Web-Mercator tile z/x/y, or None when the tile misses the crop."""
+        import morecantile
+        from rasterio.transform import from_bounds
+
+        b = morecantile.tms.get("WebMercatorQuad").xy_bounds(x, y, z)
+        o = self.bounds_3857
+        if b.left >= o[2] or b.right <= o[0] or b.bottom >= o[3] or b.top <= o[1]:
+            return None
+        dst_transform = from_bounds(b.left, b.bottom, b.right, b.top, tilesize, tilesize)
+        return self._warp("EPSG:3857", dst_transform, (tilesize, tilesize))
+
+    def _warp(self, dst_crs, dst_transform, shape):
+        from rasterio.warp import Resampling, reproject
+
+        out = np.zeros(shape, dtype=np.uint8)
+        reproject(
+            self.mask, out,
+            src_transform=self.transform, src_crs=self.crs, src_nodata=0,
+            dst_transform=dst_transform, dst_crs=dst_crs, dst_nodata=0,
+            resampling=Resampling.nearest,
+        )
+        return out.astype(bool)
+
+
+def _bounds(transform, h, w):
+    left, top = transform * (0, 0)
+    right, bottom = transform * (w, h)
+    return min(left, right), min(bottom, top), max(left, right), max(bottom, top)
+
+
+class OverlayService:
+    """Registry of viewshed overlays with an encoded-body cache.
+
+    Keeps the ``max_overlays`` most recently added crops; encoded PNGs and
+    tiles share one byte-bounded ``TileCache``.
+    """
+
+    def __init__(self, max_overlays=64, cache_bytes=32 * 2**20, tilesize=OVERLAY_TILESIZE):
+        self.max_overlays = max_overlays
+        self.tilesize = tilesize
+        self.cache = TileCache(cache_bytes)
+        self._overlays = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._overlays)
+
+    def add(self, key, vs):
+        """Register viewshed ``vs`` under cache ``key``; returns its URL token."""
+        token = overlay_token(key)
+        with self._lock:
+            if token in self._overlays:
+                self._overlays.move_to_end(token)
+                return token
+        overlay = Overlay.from_viewshed(vs)
+        with self._lock:
+            self._overlays[token] = overlay
+            while len(self._overlays) > self.max_overlays:
+                self._overlays.popitem(last=False)
+        return token
+
+    def get(self, token):
+        with self._lock:
+            return self._overlays.get(token)
+
+    def bounds(self, token):
+        """(west, south, east, north) of the overlay in lng/lat."""
+        return self._overlays[token].bounds_4326
+
+    def lookup(self, token, tile=None):
+        """Cached (body, etag) for the image (``tile`` None) or tile (z, x, y); never renders."""
+        return self.cache.get((token, tile))
+
+    def fill(self, token, tile=None):
+        """Render and cache the image or tile -> (body, etag), or None for an unknown token."""
+        overlay = self.get(token)
+        if overlay is None:
+            return None
+        if tile is None:
+            body = encode_mask_png(overlay.image()[0])
+        else:
+            mask = overlay.tile(*tile, tilesize=self.tilesize)
+            body = empty_tile(self.tilesize) if mask is None or not mask.any() else encode_mask_png(mask)
+        return self.cache.put((token, tile), body)
+
+    def render(self, token, tile=None):
+        return self.lookup(token, tile) or self.fill(token, tile)
+
+    def close(self):
+        pass
+
+
+def create_overlay_app(service, base_url=""):
+    """Starlette app serving ``service`` overlays; renders run in worker threads."""
+    import anyio
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse, Response
+    from starlette.routing import Route
+
+    metrics = TileMetrics()
+
+    async def _serve(request, token, tile):
+        start = time.perf_counter()
+        entry = service.lookup(token, tile)
+        render_ms = None
+        if entry is None:
+            entry = await anyio.to_thread.run_sync(service.fill, token, tile)
+            render_ms = (time.perf_counter() - start) * 1000
+        if entry is None:
+            return Response(status_code=404, headers=CORS)
+        body, tag = entry
+        headers = {**CORS, "ETag": tag, "Cache-Control": "public, max-age=3600"}
+        metrics.record((time.perf_counter() - start) * 1000, render_ms)
+        if request.headers.get("if-none-match") == tag:
+            return Response(status_code=304, headers=headers)
+        return Response(body, media_type="image/png", headers=headers)
+
+    async def image_handler(request):
+        return await _serve(request, request.path_params["token"], None)
+
+    async def tile_handler(request):
+        p = request.path_params
+        return await _serve(request, p["token"], (int(p["z"]), int(p["x"]), int(p["y"])))
+
+    async def info_handler(request):
+        token = request.path_params["token"]
+        overlay = service.get(token)
+        if overlay is None:
+            return Response(status_code=404, headers=CORS)
+        return JSONResponse({
+            "bounds": [round(v, 7) for v in overlay.bounds_4326],
+            "image": f"{base_url}/overlay/{token}.png",
+            "tiles": f"{base_url}/overlay/{token}/{{z}}/{{x}}/{{y}}.png",
+            "tileSize": service.tilesize,
+        }, headers=CORS)
+
+    async def metrics_handler(request):
+        cache = service.cache
+        return JSONResponse({
+            "overlays": len(service),
+            "cache": {"entries": len(cache), "bytes": cache.nbytes, "hits": cache.hits, "misses": cache.misses},
+            **metrics.snapshot(),
+        }, headers=CORS)
+
+    return Starlette(
+        routes=[
+            Route("/overlay/{token}.json", info_handler),
+            Route("/overlay/{token}.png", image_handler),
+            Route("/overlay/{token}/{z:int}/{x:int}/{y:int}.png", tile_handler),
+            Route("/metrics", metrics_handler),
+        ],
+        on_shutdown=[service.close],
+    )
@@ -0,0 +1,169 @@
+"""Offline terrain-RGB tile pyramid export to a single MBTiles archive.
+
+    python -m los_module.pyramid DEM_4326_smooth.tif terrain.mbtiles --minzoom 8 --maxzoom 14
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from .tiles import ENCODERS, TerrainTileRenderer
+
+_RENDERER = None
+
+
+def _init_worker(dem_path, tilesize, resampling, encoder):
+    global _RENDERER
+    _RENDERER = TerrainTileRenderer(dem_path, tilesize, resampling, encoder)
+
+
+def _render(tile):
+    from rio_tiler.errors import TileOutsideBounds
+
+    z, x, y = tile
+    try:
+        return z, x, y, _RENDERER.render(z, x, y)
+    except TileOutsideBounds:
+        return z, x, y, None
+
+
+def dem_bounds_4326(dem_path):
+    """DEM extent as lng/lat (w, s, e, n)."""
+    import rasterio
+    from rasterio.warp import transform_bounds
+
+    with rasterio.open(dem_path) as src:
+        return transform_bounds(src.crs, "EPSG:4326", *src.bounds, densify_pts=21)
+
+
+def pyramid_tiles(bounds, minzoom, maxzoom):
+    """Web-Mercator (z, x, y) tiles covering lng/lat ``bounds``."""
+    import morecantile
+
+    tms = morecantile.tms.get("WebMercatorQuad")
+    return [(t.z, t.x, t.y) for t in tms.tiles(*bounds, zooms=list(range(minzoom, maxzoom + 1)))]
+
+
+def export_mbtiles(
+    dem_path,
+    output,
+    minzoom,
+    maxzoom,
+    tilesize=512,
+    resampling="cubic_spline",
+    encoder="png",
+    bounds=None,
+    workers=None,
+    chunksize=16,
+):
+    """Render every tile of the DEM extent for ``minzoom..maxzoom`` into ``output``.
+
+    Tiles are rendered across a process pool (one reader per worker) and
+    written by the parent; tiles entirely outside the DEM are left out.
+    Returns the number of tiles written.
+    """
+    bounds = tuple(bounds or dem_bounds_4326(dem_path))
+    tiles = pyramid_tiles(bounds, minzoom, maxzoom)
+
+    tmp = f"{output}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    db = sqlite3.connect(tmp)
+    db.executescript(
+        """
+        CREATE TABLE metadata (name TEXT, value TEXT);
+        CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB);
+        """
+    )
+    metadata = {
+        "name": os.path.splitext(os.path.basename(output))[0],
+        "format": ENCODERS[encoder][3],
+        "type": "baselayer",
+        "encoding": "mapbox",
+        "tileSize": str(tilesize),
+        "minzoom": str(minzoom),
+        "maxzoom": str(maxzoom),
+        "bounds": ",".join(f"{v:.6f}" for v in bounds),
+    }
+    db.executemany("INSERT INTO metadata VALUES (?, ?)", metadata.items())
+
+    written = 0
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(dem_path, tilesize, resampling, encoder)
+    ) as pool:
+        batch = []
+        for z, x, y, body in pool.map(_render, tiles, chunksize=chunksize):
+            if body is None:
+                continue
+            # MBTiles rows are TMS (y flipped)
+            batch.append((z, x, (1 << z) - 1 - y, body))
+            if len(batch) >= 256:
+                db.executemany("INSERT INTO tiles VALUES (?, ?, ?, ?)", batch)
+                written += len(batch)
+                batch.clear()
+        db.executemany("INSERT INTO tiles VALUES (?, ?, ?, ?)", batch)
+        written += len(batch)
+
+    db.execute("CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row)")
+    db.commit()
+    db.close()
+    os.replace(tmp, output)
+    return written
+
+
+class MBTilesReader:
+    """Read-only access to tiles in an MBTiles archive by XYZ address."""
+
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.metadata = dict(self._db.execute("SELECT name, value FROM metadata"))
+
+    def get(self, z, x, y):
+        """Tile bytes or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+                (z, x, (1 << z) - 1 - y),
+            ).fetchone()
+        return row[0] if row else None
+
+    def first(self, z):
+        """Bytes of any one tile at zoom ``z``, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT tile_data FROM tiles WHERE zoom_level=? LIMIT 1", (z,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        self._db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a terrain-RGB MBTiles pyramid from a DEM.")
+    parser.add_argument("dem")
+    parser.add_argument("output")
+    parser.add_argument("--minzoom", type=int, default=8)
+    parser.add_argument("--maxzoom", type=int, default=14)
+    parser.add_argument("--tilesize", type=int, default=512)
+    parser.add_argument("--resampling", default="cubic_spline")
+    parser.add_argument("--encoder", choices=sorted(ENCODERS), default="png")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    n = export_mbtiles(
+        args.dem, args.output, args.minzoom, args.maxzoom,
+        tilesize=args.tilesize, resampling=args.resampling, encoder=args.encoder,
+        workers=args.workers,
+    )
+    print(f"Wrote {n} tiles to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Raw memory-mapped DEM cache shared across processes through the page cache.
+
+    python -m los_module.rawdem DEM.tif            # -> DEM.dem.json + DEM.f32 + DEM.vrt
+
+A cache is a headerless little-endian float32 (or int16) raster plus a JSON
+sidecar holding shape, transform, CRS and nodata. ``Dem.open`` on the sidecar
+maps the raster with ``np.memmap`` instead of decoding the GeoTIFF, so every
+tile-server, LOS and batch process shares the same physical pages. A GDAL raw
+VRT is written next to it so rasterio/rio-tiler readers can use the same file.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+
+import numpy as np
+
+SIDECAR_SUFFIX = ".dem.json"
+CACHE_VERSION = 1
+_DTYPES = {"float32": ("<f4", ".f32", "Float32"), "int16": ("<i2", ".i16", "Int16")}
+
+
+def cache_paths(src_path, cache_dir=None):
+    """(sidecar, raw path without extension, vrt) for the cache of ``src_path``."""
+    base = os.path.splitext(os.path.basename(src_path))[0]
+    root = os.path.join(cache_dir or os.path.dirname(os.path.abspath(src_path)), base)
+    return root + SIDECAR_SUFFIX, root, root + ".vrt"
+
+
+def build_raw_cache(src_path, cache_dir=None, dtype="float32", band=1, block_rows=512):
+    """Write the raw cache for one band of ``src_path``; returns the sidecar path.
+
+    float32 keeps values exactly with nodata as NaN. int16 rounds to whole
+    metres and halves the footprint; it is refused for rasters with nodata
+    cells, since the LOS kernels treat every int16 value as terrain.
+    """
+    import rasterio
+    from rasterio.windows import Window
+
+    if dtype not in _DTYPES:
+        raise ValueError(f"unsupported cache dtype {dtype!r}; expected one of {sorted(_DTYPES)}")
+    np_dtype, ext, gdal_type = _DTYPES[dtype]
+    sidecar, root, vrt = cache_paths(src_path, cache_dir)
+    raw = root + ext
+    os.makedirs(os.path.dirname(sidecar), exist_ok=True)
+
+    # A unique temp file per build: concurrent builders never write the same
+    # file, and whichever finishes last replaces the cache atomically.
+    tmp = _mktemp(raw)
+    try:
+        with rasterio.open(src_path) as src:
+            h, w = src.height, src.width
+            # Headerless raw file (not .npy) so the GDAL VRT can address it directly.
+            mm = np.memmap(tmp, dtype=np_dtype, mode="w+", shape=(h, w))
+            try:
+                for row in range(0, h, block_rows):
+                    rows = min(block_rows, h - row)
+                    data = src.read(band, window=Window(0, row, w, rows), masked=True)
+                    if dtype == "float32":
+                        mm[row:row + rows] = data.astype(np.float32).filled(np.nan)
+                    elif np.ma.count_masked(data):
+                        raise ValueError(f"{src_path} has nodata cells; use a float32 cache")
+                    else:
+                        mm[row:row + rows] = np.rint(data.filled(0)).clip(-32767, 32767)
+                mm.flush()
+            finally:
+                del mm
+            meta = {
+                "version": CACHE_VERSION,
+                "data": os.path.basename(raw),
+                "dtype": np_dtype,
+                "shape": [h, w],
+                "transform": list(src.transform)[:6],
+                "crs": src.crs.to_wkt() if src.crs else None,
+                "nodata": "nan" if dtype == "float32" else None,
+                "source": os.path.abspath(src_path),
+                "source_mtime_ns": os.stat(src_path).st_mtime_ns,
+            }
+        os.replace(tmp, raw)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    _write_text(vrt, _vrt_xml(meta, gdal_type, np.dtype(np_dtype).itemsize))
+    _write_text(sidecar, json.dumps(meta, indent=2))
+    return sidecar
+
+
+def ensure_raw_cache(src_path, cache_dir=None, dtype="float32"):
+    """Sidecar path of an up-to-date cache for ``src_path``, building it if missing or stale."""
+    sidecar, _, _ = cache_paths(src_path, cache_dir)
+    if os.path.exists(sidecar):
+        with open(sidecar, encoding="utf-8") as f:
+            meta = json.load(f)
+        if (
+            meta.get("version") == CACHE_VERSION
+            and meta.get("dtype") == _DTYPES[dtype][0]
+            and meta.get("source_mtime_ns") == os.stat(src_path).st_mtime_ns
+        ):
+            return sidecar
+    return build_raw_cache(src_path, cache_dir, dtype)
+
+
+def open_raw(sidecar):
+    """(memmap, transform, crs, nodata) for a cache sidecar; the array is read-only."""
+    from affine import Affine
+    from rasterio.crs import CRS
+
+    with open(sidecar, encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("version") != CACHE_VERSION:
+        raise ValueError(f"unsupported raw DEM cache version in {sidecar}")
+    raw = os.path.join(os.path.dirname(os.path.abspath(sidecar)), meta["data"])
+    data = np.memmap(raw, dtype=meta["dtype"], mode="r", shape=tuple(meta["shape"]))
+    crs = CRS.from_wkt(meta["crs"]) if meta["crs"] else None
+    nodata = float("nan") if meta["nodata"] == "nan" else None
+    return data, Affine(*meta["transform"]), crs, nodata
+
+
+def _mktemp(path):
+    """Unique, world-readable temp file next to ``path``."""
+    fd, tmp = tempfile.mkstemp(prefix=f"{os.path.basename(path)}.", suffix=".tmp", dir=os.path.dirname(path))
+    os.close(fd)
+    os.chmod(tmp, 0o644)
+    return tmp
+
+
+def _write_text(path, text):
+    """Write ``text`` to a unique temp file and move it over ``path``."""
+    tmp = _mktemp(path)
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def _vrt_xml(meta, gdal_type, itemsize):
+    h, w = meta["shape"]
+    a, b, c, d, e, f = meta["transform"]
+    srs = f"<SRS>{_xml_escape(meta['crs'])}</SRS>" if meta["crs"] else ""
+    nodata = "<NoDataValue>nan</NoDataValue>" if meta["nodata"] == "nan" else ""
+    return (
+        f'<VRTDataset rasterXSize="{w}" rasterYSize="{h}">{srs}'
+        f"<GeoTransform>{c!r}, {a!r}, {b!r}, {f!r}, {d!r}, {e!r}</GeoTransform>"
+        f'<VRTRasterBand dataType="{gdal_type}" band="1" subClass="VRTRawRasterBand">'
+        f'{nodata}<SourceFilename relativeToVRT="1">{meta["data"]}</SourceFilename>'
+        f"<ImageOffset>0</ImageOffset><PixelOffset>{itemsize}</PixelOffset>"
+        f"<LineOffset>{itemsize * w}</LineOffset><ByteOrder>LSB</ByteOrder>"
+        f"</VRTRasterBand></VRTDataset>"
+    )
+
+
+def _xml_escape(s):
+    return s.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a raw memory-mapped DEM cache.")
+    parser.add_argument("src")
+    parser.add_argument("--cache-dir", default=None)
+    parser.add_argument("--dtype", choices=sorted(_DTYPES), default="float32")
+    args = parser.parse_args(argv)
+    sidecar = build_raw_cache(args.src, args.cache_dir, args.dtype)
+    print(f"Wrote {sidecar}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""Race route and waypoint loading.
+
+Tracks (GPX or GeoJSON lines) are parsed once into columnar arrays and cached
+as an ``.npz`` next to the source, keyed by a hash of its bytes (caches of
+earlier contents of the same file are removed when a new one is written)::
+
+    track = load_track("TOR330-CERT-2025.gpx")   # parse (~0.2 s) or cache hit (~10 ms)
+    track.lng, track.lat, track.ele, track.time, track.chainage
+
+GPX is streamed through expat, so only the output arrays are held in memory.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+import numpy as np
+
+TRACK_CACHE_VERSION = 1
+TRACK_CACHE_SUFFIX = ".track.npz"
+# Mean Earth radius, as in ``los.EARTH_RADIUS``.
+_EARTH_RADIUS = 6_371_000.0
+
+
+@dataclass
+class Track:
+    """Track points as float64 lng/lat/ele (NaN when missing), datetime64[ms]
+    times (NaT when missing) and great-circle chainage in metres.
+
+    ``segments`` holds the start index of every track segment; chainage runs
+    on across segment gaps.
+    """
+
+    lng: np.ndarray
+    lat: np.ndarray
+    ele: np.ndarray
+    time: np.ndarray
+    chainage: np.ndarray
+    segments: np.ndarray
+
+    def __len__(self):
+        return len(self.lng)
+
+    @property
+    def bounds(self):
+        """(west, south, east, north)."""
+        return float(self.lng.min()), float(self.lat.min()), float(self.lng.max()), float(self.lat.max())
+
+    def split(self, values):
+        """``values`` (one per point) split into per-segment arrays."""
+        return np.split(np.asarray(values), self.segments[1:])
+
+    def to_geodataframe(self):
+        """One-row GeoDataFrame (EPSG:4326) with the track as a MultiLineString."""
+        import geopandas as gpd
+        from shapely.geometry import MultiLineString
+
+        lines = [np.column_stack(c) for c in zip(self.split(self.lng), self.split(self.lat)) if len(c[0]) > 1]
+        return gpd.GeoDataFrame(geometry=[MultiLineString(lines)], crs="EPSG:4326")
+
+
+def parse_gpx(path):
+    """Stream every ``trkpt`` of a GPX file into a ``Track``."""
+    import xml.parsers.expat
+
+    lng, lat, ele, times, segments = [], [], [], [], []
+    text = []
+    field = in_point = None
+
+    def start(tag, attrs):
+        nonlocal field, in_point
+        if tag == "trkpt":
+            lng.append(float(attrs["lon"]))
+            lat.append(float(attrs["lat"]))
+            ele.append(np.nan)
+            times.append(None)
+            in_point = True
+        elif tag == "trkseg":
+            segments.append(len(lng))
+        elif in_point and tag in ("ele", "time"):
+            field = tag
+            text.clear()
+
+    def end(tag):
+        nonlocal field, in_point
+        if tag == field:
+            value = "".join(text).strip()
+            if value and field == "ele":
+                ele[-1] = float(value)
+            elif value:
+                times[-1] = value
+            field = None
+        elif tag == "trkpt":
+            in_point = False
+
+    def chars(data):
+        if field is not None:
+            text.append(data)
+
+    # No namespace processing: GPX elements are unprefixed in the default namespace.
+    parser = xml.parsers.expat.ParserCreate()
+    parser.buffer_text = True
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.CharacterDataHandler = chars
+    with open(path, "rb") as f:
+        parser.ParseFile(f)
+    if not lng:
+        raise ValueError(f"{path} has no track points")
+    return _track(lng, lat, ele, _parse_times(times), segments)
+
+
+def parse_geojson_track(path):
+    """Every (Multi)LineString in a GeoJSON file as one ``Track`` (z taken as elevation)."""
+    with open(path, encoding="utf-8") as f:
+        doc = json.load(f)
+    features = doc["features"] if doc.get("type") == "FeatureCollection" else [doc]
+    lines = []
+    for feature in features:
+        geom = feature.get("geometry") or feature
+        if geom["type"] == "LineString":
+            lines.append(geom["coordinates"])
+        elif geom["type"] == "MultiLineString":
+            lines.extend(geom["coordinates"])
+    if not lines:
+        raise ValueError(f"{path} has no line geometries")
+    lng, lat, ele, segments = [], [], [], []
+    for line in lines:
+        segments.append(len(lng))
+        for c in line:
+            lng.append(c[0])
+            lat.append(c[1])
+            ele.append(c[2] if len(c) > 2 else np.nan)
+    return _track(lng, lat, ele, np.full(len(lng), np.datetime64("NaT"), dtype="datetime64[ms]"), segments)
+
+
+def _parse_times(times):
+    """ISO 8601 strings (or None) -> naive-UTC datetime64[ms]."""
+    return np.array([_utc(t) for t in times], dtype="datetime64[ms]")
+
+
+def _utc(t):
+    if t is None:
+        return "NaT"
+    if t.endswith("Z"):
+        return t[:-1]
+    d = datetime.fromisoformat(t)
+    return d.astimezone(timezone.utc).replace(tzinfo=None) if d.tzinfo else d
+
+
+def _track(lng, lat, ele, time, segments):
+    lng = np.asarray(lng, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    return Track(
+        lng, lat, np.asarray(ele, dtype=np.float64), time,
+        geodesic_chainage(lng, lat), np.asarray(segments or [0], dtype=np.int64),
+    )
+
+
+def geodesic_chainage(lng, lat):
+    """Cumulative great-circle (haversine) distance in metres along lng/lat points."""
+    lng, lat = np.radians(lng), np.radians(lat)
+    a = np.sin(np.diff(lat) / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lng) / 2) ** 2
+    seg = 2 * _EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+    return np.concatenate([[0.0], np.cumsum(seg)])
+
+
+def source_hash(path, chunk=2**20):
+    """blake2b (16 hex chars) of the file bytes and the cache version."""
+    h = hashlib.blake2b(str(TRACK_CACHE_VERSION).encode(), digest_size=8)
+    with open(path, "rb") as f:
+        while block := f.read(chunk):
+            h.update(block)
+    return h.hexdigest()
+
+
+def track_cache_path(path, cache_dir=None):
+    """Cache file for the current contents of ``path``."""
+    base = os.path.basename(path)
+    root = cache_dir or os.path.dirname(os.path.abspath(path))
+    return os.path.join(root, f".{base}.{source_hash(path)}{TRACK_CACHE_SUFFIX}")
+
+
+def load_track(path, cache_dir=None):
+    """``Track`` for a GPX or GeoJSON file, from its cache when the contents are unchanged."""
+    cache = track_cache_path(path, cache_dir)
+    if os.path.exists(cache):
+        with np.load(cache, allow_pickle=False) as z:
+            return Track(*(z[k] for k in ("lng", "lat", "ele", "time", "chainage", "segments")))
+    track = parse_gpx(path) if str(path).lower().endswith(".gpx") else parse_geojson_track(path)
+    tmp = f"{cache}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            np.savez(f, **vars(track))
+        os.replace(tmp, cache)
+        _prune_track_caches(path, cache)
+    except OSError:
+        pass  # read-only source directory: just skip caching
+    return track
+
+
+def _prune_track_caches(path, keep):
+    """Remove ``path``'s cached tracks other than ``keep`` (stale contents)."""
+    root = os.path.dirname(keep)
+    stale = re.compile(rf"\.{re.escape(os.path.basename(path))}\.[0-9a-f]{{16}}{re.escape(TRACK_CACHE_SUFFIX)}")
+    for name in os.listdir(root):
+        other = os.path.join(root, name)
+        if stale.fullmatch(name) and other != keep:
+            try:
+                os.remove(other)
+            except FileNotFoundError:
+                pass  # pruned by a concurrent loader
+
+
+def read_track(path):
+    """Read every track point of a GPX / GeoJSON route as (lng, lat) float64 arrays (cached)."""
+    track = load_track(path)
+    return track.lng, track.lat
+
+
+def read_waypoints(path):
+    """Read a waypoint GeoJSON (e.g. ``TOR330_waypoints.geojson``) -> (names, lng, lat)."""
+    with open(path, encoding="utf-8") as f:
+        features = json.load(f)["features"]
+    points = [f for f in features if f["geometry"]["type"] == "Point"]
+    names = [f["properties"].get("name") or f"wpt{i}" for i, f in enumerate(points)]
+    lng = np.array([f["geometry"]["coordinates"][0] for f in points], dtype=np.float64)
+    lat = np.array([f["geometry"]["coordinates"][1] for f in points], dtype=np.float64)
+    return names, lng, lat
+
+
+def chainage(x, y):
+    """Cumulative distance along a polyline in projected coordinates (starts at 0)."""
+    seg = np.hypot(np.diff(x), np.diff(y))
+    return np.concatenate([[0.0], np.cumsum(seg)])
+
+
+def resample(x, y, spacing):
+    """Resample a polyline every ``spacing`` metres -> (x, y, chainage)."""
+    ch = chainage(x, y)
+    at = np.arange(0.0, ch[-1] + spacing, spacing)
+    at[-1] = min(at[-1], ch[-1])
+    return np.interp(at, ch, x), np.interp(at, ch, y), at
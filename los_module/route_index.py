@@ -0,0 +1,180 @@
+"""Spatial index over route segments and waypoints.
+
+Built once from a ``route.Track`` (and optionally the waypoint GeoJSON), it
+answers batched queries in O(log n) each instead of scanning every GPX point::
+
+    index = RouteIndex.from_files("TOR330-CERT-2025.gpx", "TOR330_waypoints.geojson")
+    p = index.project(lng, lat)                  # nearest segment, chainage, distance
+    wpt, dist = index.nearest_waypoint(lng, lat)
+    pts, segs = index.segments_within(lng, lat, 500)
+
+Geometry lives in a metric CRS (the local UTM zone unless ``crs`` is given) in
+shapely ``STRtree``s. Chainage is the track's great-circle chainage, so it
+agrees with ``Track.chainage`` and the LOS service's chainage ticks.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass
+class RouteProjection:
+    """Per query point: nearest segment (-1 if none in range), position along it
+    ``t`` in [0, 1], route chainage and distance in metres (NaN if none)."""
+
+    segment: np.ndarray
+    t: np.ndarray
+    chainage: np.ndarray
+    distance: np.ndarray
+
+    @property
+    def found(self):
+        return self.segment >= 0
+
+
+class RouteIndex:
+    """STR-trees over a track's segments and, optionally, waypoints.
+
+    Segments never bridge two track segments. ``waypoints`` is
+    ``(names, lng, lat)`` as returned by ``route.read_waypoints``.
+    """
+
+    def __init__(self, track, waypoints=None, crs=None):
+        import shapely
+        from pyproj import Transformer
+
+        self.track = track
+        self.crs = crs or _utm_crs(track.bounds)
+        self._to_xy = Transformer.from_crs("EPSG:4326", self.crs, always_xy=True)
+        x, y = self.to_xy(track.lng, track.lat)
+
+        starts = np.arange(len(x) - 1)
+        # Drop the joins between track segments.
+        starts = starts[~np.isin(starts + 1, track.segments)]
+        self._start = starts
+        self._a = np.column_stack([x[starts], y[starts]])
+        self._b = np.column_stack([x[starts + 1], y[starts + 1]])
+        self._ch = np.column_stack([track.chainage[starts], track.chainage[starts + 1]])
+        self._segments = shapely.STRtree(shapely.linestrings(np.stack([self._a, self._b], axis=1)))
+
+        self.waypoint_names = []
+        self._waypoints = None
+        if waypoints is not None:
+            names, w_lng, w_lat = waypoints
+            self.waypoint_names = list(names)
+            self._waypoints = shapely.STRtree(shapely.points(np.column_stack(self.to_xy(w_lng, w_lat))))
+
+    @classmethod
+    def from_files(cls, track_path, waypoints_path=None, crs=None):
+        """Index a GPX / GeoJSON track (through the ``route`` cache) and a waypoint GeoJSON."""
+        from .route import load_track, read_waypoints
+
+        waypoints = read_waypoints(waypoints_path) if waypoints_path else None
+        return cls(load_track(track_path), waypoints, crs)
+
+    def __len__(self):
+        return len(self._start)
+
+    def to_xy(self, lng, lat):
+        """WGS84 -> index CRS, as float64 arrays."""
+        x, y = self._to_xy.transform(np.asarray(lng, np.float64), np.asarray(lat, np.float64))
+        return np.atleast_1d(x), np.atleast_1d(y)
+
+    def _points(self, lng, lat):
+        import shapely
+
+        return shapely.points(np.column_stack(self.to_xy(lng, lat)))
+
+    def project(self, lng, lat, max_distance=None):
+        """Snap lng/lat points onto the nearest route segment (within ``max_distance`` metres)."""
+        points = self._points(lng, lat)
+        n = len(points)
+        seg = np.full(n, -1, dtype=np.intp)
+        t = np.full(n, np.nan)
+        (q, s), _ = self._segments.query_nearest(points, max_distance=max_distance, return_distance=True)
+        # Ties return several segments per point; keep the first.
+        q, first = np.unique(q, return_index=True)
+        s = s[first]
+        seg[q] = s
+
+        p = np.column_stack(self.to_xy(lng, lat))[q]
+        a, ab = self._a[s], self._b[s] - self._a[s]
+        denom = np.einsum("ij,ij->i", ab, ab)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            tq = np.clip(np.einsum("ij,ij->i", p - a, ab) / denom, 0.0, 1.0)
+        tq[denom == 0] = 0.0
+        t[q] = tq
+
+        chainage = np.full(n, np.nan)
+        distance = np.full(n, np.nan)
+        c0, c1 = self._ch[s, 0], self._ch[s, 1]
+        chainage[q] = c0 + tq * (c1 - c0)
+        distance[q] = np.hypot(*(a + tq[:, None] * ab - p).T)
+        return RouteProjection(seg, t, chainage, distance)
+
+    def nearest_segment(self, lng, lat, max_distance=None):
+        """(segment index, distance m) per point; -1 / NaN when none is in range."""
+        p = self.project(lng, lat, max_distance)
+        return p.segment, p.distance
+
+    def segment_points(self, segment):
+        """Track point indices (start, end) of segment(s) from this index."""
+        start = self._start[np.asarray(segment)]
+        return start, start + 1
+
+    def segments_within(self, lng, lat, radius):
+        """(query index, segment index) pairs for every segment within ``radius`` metres."""
+        pts, segs = self._segments.query(self._points(lng, lat), predicate="dwithin", distance=radius)
+        return pts, segs
+
+    def chainage_within(self, lng, lat, radius):
+        """Per query point, merged (start, end) chainage intervals of route within ``radius``."""
+        n = len(np.atleast_1d(lng))
+        if not n:
+            return []
+        pts, segs = self.segments_within(lng, lat, radius)
+        # Group the pairs by query point once instead of scanning them per point.
+        order = np.argsort(pts, kind="stable")
+        starts = np.searchsorted(pts[order], np.arange(1, n))
+        return [_merge(self._ch[group]) for group in np.split(segs[order], starts)]
+
+    def nearest_waypoint(self, lng, lat, max_distance=None):
+        """(waypoint index, distance m) per point; -1 / NaN when none is in range."""
+        if self._waypoints is None:
+            raise ValueError("index was built without waypoints")
+        points = self._points(lng, lat)
+        idx = np.full(len(points), -1, dtype=np.intp)
+        dist = np.full(len(points), np.nan)
+        (q, w), d = self._waypoints.query_nearest(points, max_distance=max_distance, return_distance=True)
+        q, first = np.unique(q, return_index=True)
+        idx[q], dist[q] = w[first], d[first]
+        return idx, dist
+
+    def waypoints_within(self, lng, lat, radius):
+        """(query index, waypoint index) pairs for every waypoint within ``radius`` metres."""
+        if self._waypoints is None:
+            raise ValueError("index was built without waypoints")
+        return self._waypoints.query(self._points(lng, lat), predicate="dwithin", distance=radius)
+
+
+def _merge(ch):
+    """Union of (start, end) chainage intervals sorted by start -> (k, 2) array."""
+    if not len(ch):
+        return np.empty((0, 2))
+    ch = ch[np.argsort(ch[:, 0])]
+    # A new interval begins wherever the start exceeds every earlier end.
+    new = np.concatenate([[True], ch[1:, 0] > np.maximum.accumulate(ch[:-1, 1])])
+    groups = np.cumsum(new) - 1
+    ends = np.full(groups[-1] + 1, -np.inf)
+    np.maximum.at(ends, groups, ch[:, 1])
+    return np.column_stack([ch[new, 0], ends])
+
+
+def _utm_crs(bounds):
+    """WGS84 UTM zone of the centre of lng/lat ``bounds``."""
+    w, s, e, n = bounds
+    zone = int((((w + e) / 2 + 180) // 6) % 60) + 1
+    return f"EPSG:{(32600 if (s + n) / 2 >= 0 else 32700) + zone}"
@@ -0,0 +1,63 @@
+"""Shared fixtures: a small synthetic DEM near Courmayeur, in memory and as a GeoTIFF.
+
+    python -m pytest los_module/tests
+"""
+
+import numpy as np
+import pytest
+from affine import Affine
+from rasterio.crs import CRS
+
+from los_module.dem import Dem
+
+# EPSG:25832 like ``DEM.tif``; the origin is a few km west of Courmayeur.
+CRS_UTM = CRS.from_epsg(25832)
+ORIGIN = (336_000.0, 5_086_000.0)
+RES = 30.0
+SIZE = 161
+
+
+def terrain(size=SIZE):
+    """Two hills, a north-south ridge and some ripple (metres), row 0 at the top."""
+    r, c = np.mgrid[0:size, 0:size].astype(np.float64)
+    z = 1200.0
+    z = z + 700.0 * np.exp(-((r - 40) ** 2 + (c - 45) ** 2) / (2 * 18.0**2))
+    z = z + 500.0 * np.exp(-((r - 120) ** 2 + (c - 120) ** 2) / (2 * 25.0**2))
+    z = z + 350.0 * np.exp(-((c - 95) ** 2) / (2 * 3.0**2))
+    z = z + 15.0 * np.sin(r / 5.0) * np.cos(c / 7.0)
+    return z.astype(np.float32)
+
+
+def make_dem(data=None, origin=ORIGIN, res=RES, path=None):
+    data = terrain() if data is None else np.asarray(data, dtype=np.float32)
+    transform = Affine(res, 0.0, origin[0], 0.0, -res, origin[1])
+    return Dem(data, transform, CRS_UTM, float("nan"), path)
+
+
+def write_dem(path, dem):
+    """Write ``dem`` as a single-band float32 GeoTIFF (NaN nodata)."""
+    import rasterio
+
+    h, w = dem.shape
+    with rasterio.open(
+        path, "w", driver="GTiff", height=h, width=w, count=1, dtype="float32",
+        crs=dem.crs, transform=dem.transform, nodata=float("nan"),
+    ) as dst:
+        dst.write(np.asarray(dem.data, dtype=np.float32), 1)
+    return str(path)
+
+
+@pytest.fixture
+def dem():
+    return make_dem()
+
+
+@pytest.fixture
+def dem_path(tmp_path):
+    return write_dem(tmp_path / "dem.tif", make_dem())
+
+
+def cell_centres(dem, rows, cols):
+    """Map x/y of integer cell centres as an (N, 2) array."""
+    x, y = dem.xy(np.asarray(rows), np.asarray(cols))
+    return np.column_stack([x, y])
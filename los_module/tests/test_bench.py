@@ -0,0 +1,61 @@
+import json
+
+import numpy as np
+import pytest
+
+from los_module import bench
+from los_module.dem import Dem
+
+
+def test_fractal_dem_is_reproducible(tmp_path):
+    a = Dem.open(bench.fractal_dem(str(tmp_path / "a.tif"), size=64, seed=3))
+    b = Dem.open(bench.fractal_dem(str(tmp_path / "b.tif"), size=64, seed=3))
+    c = Dem.open(bench.fractal_dem(str(tmp_path / "c.tif"), size=64, seed=4))
+    np.testing.assert_array_equal(a.data, b.data)
+    assert not np.array_equal(a.data, c.data)
+    assert a.shape == (64, 64) and a.res == (30.0, 30.0)
+    assert np.nanmin(a.data) == pytest.approx(400.0) and np.nanmax(a.data) == pytest.approx(2900.0)
+
+
+def test_crop_dem_keeps_the_centre(dem, dem_path, tmp_path):
+    crop = Dem.open(bench.crop_dem(dem_path, str(tmp_path / "crop.tif"), size=1_200.0))
+    assert crop.shape == (40, 40)
+    x, y = crop.transform * (20.5, 20.5)
+    assert crop.sample(x, y) == pytest.approx(dem.sample(x, y))
+
+
+def test_suite_writes_json_and_compares_to_a_baseline(tmp_path, capsys):
+    args = [
+        "suite", "--dem", str(tmp_path / "missing.tif"), "--size", "256", "--radii", "600", "1200",
+        "--pairs", "200", "--los-distance", "2000", "--points", "1000", "--tiles", "2", "--repeat", "1",
+        "--workdir", str(tmp_path),
+    ]
+    bench.main([*args, "--json", str(tmp_path / "base.json")])
+    bench.main([*args, "--json", str(tmp_path / "run.json"), "--baseline", str(tmp_path / "base.json")])
+    assert "running on the fractal DEM only" in capsys.readouterr().out
+
+    with open(tmp_path / "run.json", encoding="utf-8") as f:
+        doc = json.load(f)
+    assert doc["version"] == bench.SUITE_VERSION
+    (run,) = doc["runs"]
+    assert run["dem"] == "fractal" and run["shape"] == [256, 256]
+    assert [r["radius"] for r in run["viewshed"]] == [600, 1200]
+    assert [r["pass"] for r in run["tiles"]] == ["cold", "warm"]
+
+    metrics = bench.headline_metrics(doc)
+    assert metrics["fractal.los.pairs_per_s"] > 0
+    assert "fractal.viewshed.r1200.median_ms" in metrics
+    assert "fractal.tiles.warm.p99_ms" in metrics
+
+    with open(tmp_path / "base.json", encoding="utf-8") as f:
+        rows = bench.compare(doc, json.load(f))
+    assert {r["metric"] for r in rows} == set(metrics)
+    assert all(r["change"].endswith("%") or r["change"] == "n/a" for r in rows)
+
+
+def test_compare_skips_metrics_missing_from_the_baseline():
+    doc = {"runs": [{"dem": "fractal", "los": {"pairs_per_s": 150.0}, "peak_rss_mb": {"los": 90.0}}]}
+    base = {"runs": [{"dem": "fractal", "los": {"pairs_per_s": 100.0}}]}
+    assert bench.compare(doc, base) == [
+        {"metric": "fractal.los.pairs_per_s", "baseline": 100.0, "current": 150.0, "change": "+50.0%"}
+    ]
@@ -0,0 +1,90 @@
+import os
+
+import numpy as np
+
+from los_module.cache import ViewshedCache, viewshed_key
+from los_module.dem import Dem
+from los_module.viewshed import viewshed
+
+from .conftest import cell_centres, make_dem
+
+
+def test_hit_miss_and_snapping(dem_path):
+    dem = Dem.open(dem_path)
+    cache = ViewshedCache()
+    x, y = cell_centres(dem, 80, 60)[0]
+    first = cache.get_or_compute(dem, (x, y), 1_000)
+    # A spectator a few metres away snaps to the same cell.
+    second = cache.get_or_compute(dem, (x + 7.0, y - 9.0), 1_000)
+    assert second is first
+    assert (cache.misses, cache.hits) == (1, 1)
+    cache.get_or_compute(dem, (x + 30.0, y), 1_000)
+    assert cache.misses == 2
+
+
+def test_disk_tier_and_mtime_invalidation(dem_path, tmp_path):
+    dem = Dem.open(dem_path)
+    observer = tuple(cell_centres(dem, 80, 60)[0])
+    computed = ViewshedCache(cache_dir=tmp_path / "vs").get_or_compute(dem, observer, 1_000)
+
+    cold = ViewshedCache(cache_dir=tmp_path / "vs")
+    loaded = cold.get_or_compute(dem, observer, 1_000)
+    assert (cold.disk_hits, cold.misses) == (1, 0)
+    np.testing.assert_array_equal(loaded.mask, computed.mask)
+    assert loaded.transform == computed.transform
+
+    key = viewshed_key(dem, observer, 1_000)
+    st = os.stat(dem_path)
+    os.utime(dem_path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert viewshed_key(dem, observer, 1_000) != key
+    cold.get_or_compute(dem, observer, 1_000)
+    assert cold.misses == 1
+
+
+def test_windows_of_one_file_do_not_collide(dem, dem_path, tmp_path):
+    # Two windows of the same file with different origins; each observer sits
+    # at row/col (20, 20) of its own window but ~1.7 km from the other.
+    a = Dem.open(dem_path).window(40, 20, 60, 60)
+    b = Dem.open(dem_path).window(80, 60, 60, 60)
+    obs_a = tuple(cell_centres(a, 20, 20)[0])
+    obs_b = tuple(cell_centres(b, 20, 20)[0])
+    assert a.path == b.path
+    assert viewshed_key(a, obs_a, 600) != viewshed_key(b, obs_b, 600)
+
+    cache = ViewshedCache(cache_dir=tmp_path / "vs")
+    cache.get_or_compute(a, obs_a, 600)
+    got = cache.get_or_compute(b, obs_b, 600)
+    assert cache.misses == 2
+    assert got.observer == obs_b
+    np.testing.assert_array_equal(got.mask, viewshed(b, obs_b, 600).mask)
+
+
+def test_in_memory_dems_are_keyed_by_content(dem):
+    observer = tuple(cell_centres(dem, 80, 60)[0])
+    key = viewshed_key(dem, observer, 600)
+    assert viewshed_key(make_dem(dem.data.copy()), observer, 600) == key
+    # Arrays freed in between often hand their id to the next one.
+    keys = set()
+    for bump in range(5):
+        keys.add(viewshed_key(make_dem(dem.data + bump), observer, 600))
+    assert len(keys) == 5 and key in keys
+
+    cache = ViewshedCache()
+    first = cache.get_or_compute(make_dem(dem.data + 1), observer, 600)
+    assert cache.get_or_compute(make_dem(dem.data + 500), observer, 600) is not first
+    assert cache.misses == 2
+
+
+def test_concurrent_saves_of_one_entry(dem_path, tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    dem = Dem.open(dem_path)
+    observer = tuple(cell_centres(dem, 80, 60)[0])
+    result = viewshed(dem, observer, 600)
+    cache = ViewshedCache(cache_dir=tmp_path / "vs")
+    key = viewshed_key(dem, observer, 600)
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(lambda _: cache.put(key, result), range(16)))
+    assert os.listdir(tmp_path / "vs") == [os.path.basename(cache._disk_path(key))]
+    loaded = ViewshedCache(cache_dir=tmp_path / "vs").get(key, dem)
+    np.testing.assert_array_equal(loaded.mask, result.mask)
@@ -0,0 +1,23 @@
+import numpy as np
+import rasterio
+
+from los_module.cog import to_cog, validate_cog
+from los_module.dem import Dem
+
+
+def test_to_cog_round_trip_and_overview_reads(dem, dem_path, tmp_path):
+    out = str(tmp_path / "dem_cog.tif")
+    to_cog(dem_path, out, blocksize=64)
+    valid, errors, _ = validate_cog(out)
+    assert valid, errors
+    assert not (tmp_path / "dem_cog.tif.tmp.tif").exists()
+
+    with rasterio.open(out) as src:
+        assert src.overviews(1) and src.block_shapes[0] == (64, 64)
+        np.testing.assert_array_equal(src.read(1), dem.data)
+
+    full = Dem.open(out)
+    coarse = Dem.open(out, res=4 * full.res[0])
+    assert coarse.shape == (round(161 / 4), round(161 / 4))
+    assert coarse.bounds == full.bounds
+    assert abs(float(np.nanmean(coarse.data)) - float(np.nanmean(full.data))) < 5.0
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from los_module.cumulative import cumulative_viewshed
+from los_module.dem import Dem
+from los_module.viewshed import viewshed
+
+from .conftest import cell_centres
+
+
+def test_counts_and_bits_match_single_viewsheds(dem, dem_path, tmp_path):
+    left, bottom, _, _ = dem.bounds
+    observers = np.vstack([
+        cell_centres(dem, [80, 30, 120], [60, 140, 100]),
+        [[left - 40_000.0, bottom - 40_000.0]],  # far off the DEM edge
+    ])
+    result = cumulative_viewshed(dem_path, observers, 1_500, bitset=True, workers=2, cache_dir=str(tmp_path))
+    assert result.valid.tolist() == [True, True, True, False]
+
+    raw = Dem.open(str(tmp_path / "dem.dem.json"))
+    expected = np.zeros(raw.shape, dtype=np.int32)
+    c0, r0 = ~raw.transform * (result.transform.c, result.transform.f)
+    r0, c0 = round(r0), round(c0)
+    h, w = result.counts.shape
+    for i, obs in enumerate(observers[:3]):
+        vs = viewshed(raw, tuple(obs), 1_500)
+        col, row = ~raw.transform * (vs.transform.c, vs.transform.f)
+        sl = np.s_[round(row):round(row) + vs.mask.shape[0], round(col):round(col) + vs.mask.shape[1]]
+        expected[sl] += vs.mask
+        single = np.zeros(raw.shape, dtype=bool)
+        single[sl] = vs.mask
+        np.testing.assert_array_equal(result.seen_by(i), single[r0:r0 + h, c0:c0 + w])
+    np.testing.assert_array_equal(result.counts, expected[r0:r0 + h, c0:c0 + w])
+    assert not result.seen_by(3).any()
+
+
+def test_seen_by_needs_bitset(dem, dem_path, tmp_path):
+    result = cumulative_viewshed(dem_path, cell_centres(dem, [80], [60]), 600, workers=1, cache_dir=str(tmp_path))
+    assert result.valid.all() and result.counts.max() == 1
+    with pytest.raises(ValueError):
+        result.seen_by(0)
@@ -0,0 +1,39 @@
+import math
+
+import numpy as np
+
+from los_module.los import EARTH_RADIUS, line_of_sight
+from los_module.viewshed import viewshed
+
+from .conftest import cell_centres, make_dem
+
+
+def horizon(eye, refraction):
+    """Distance at which a ground-level target sinks below an eye ``eye`` metres up."""
+    return math.sqrt(2 * EARTH_RADIUS * eye / (1 - refraction))
+
+
+def test_flat_earth_targets_sink_below_the_horizon():
+    dem = make_dem(np.zeros((200, 200)), res=100.0)
+    obs = cell_centres(dem, 100, 100)[0]
+    distances = np.array([3_000.0, 4_800.0, 6_000.0, 9_000.0])
+    targets = np.column_stack([obs[0] + distances, np.full(4, obs[1])])
+    assert horizon(1.7, 0.0) < 4_800 < horizon(1.7, 0.13) < 6_000
+
+    def visible(**kwargs):
+        return line_of_sight(dem, obs, targets, observer_height=1.7, step=10.0, **kwargs).visible.tolist()
+
+    assert visible(curvature=False) == [True, True, True, True]
+    assert visible(refraction=0.13) == [True, True, False, False]
+    assert visible(refraction=0.0) == [True, False, False, False]
+
+
+def test_viewshed_reaches_the_refracted_horizon():
+    dem = make_dem(np.zeros((200, 200)), res=100.0)
+    obs = tuple(cell_centres(dem, 100, 100)[0])
+    vs = viewshed(dem, obs, 9_000, observer_height=1.7)
+    rows, cols = np.nonzero(vs.mask)
+    x, y = vs.transform * (cols + 0.5, rows + 0.5)
+    far = np.hypot(x - obs[0], y - obs[1]).max()
+    assert abs(far - horizon(1.7, 0.13)) < 200
+    assert viewshed(dem, obs, 9_000, observer_height=1.7, curvature=False).mask.sum() > 3 * vs.mask.sum()
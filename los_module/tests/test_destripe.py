@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from scipy.ndimage import binary_closing, generate_binary_structure, median_filter
+
+from los_module.destripe import destripe_mask, visible_bbox
+
+
+def reference(mask):
+    cleaned = median_filter(mask.astype(np.uint8), size=3).astype(bool)
+    return binary_closing(cleaned, structure=generate_binary_structure(2, 2))
+
+
+@pytest.mark.parametrize("shape", [(40, 40), (37, 53), (9, 70)])
+def test_matches_scipy_median_and_closing(shape):
+    rng = np.random.default_rng(sum(shape))
+    for density in (0.2, 0.5, 0.8):
+        mask = rng.random(shape) < density
+        np.testing.assert_array_equal(destripe_mask(mask), reference(mask))
+
+
+def test_window_away_from_the_edges_matches_scipy():
+    rng = np.random.default_rng(1)
+    mask = np.zeros((120, 150), dtype=bool)
+    mask[30:70, 45:100] = rng.random((40, 55)) < 0.6
+    np.testing.assert_array_equal(destripe_mask(mask), reference(mask))
+
+
+def test_steps_can_be_switched_off():
+    mask = np.random.default_rng(2).random((30, 30)) < 0.5
+    np.testing.assert_array_equal(
+        destripe_mask(mask, closing=False), median_filter(mask.astype(np.uint8), size=3).astype(bool)
+    )
+    np.testing.assert_array_equal(destripe_mask(mask, median=False, closing=False), mask)
+
+
+def test_visible_bbox():
+    mask = np.zeros((20, 30), dtype=bool)
+    assert visible_bbox(mask) is None
+    assert not destripe_mask(mask).any()
+    mask[5, 7] = mask[9, 12] = True
+    assert visible_bbox(mask) == (slice(5, 10), slice(7, 13))
+    assert visible_bbox(mask, pad=6) == (slice(0, 16), slice(1, 19))
@@ -0,0 +1,79 @@
+import json
+
+import numpy as np
+import pytest
+import shapely
+
+from los_module.export import (
+    _dumps, los_to_geojson, rle_visible, viewshed_polygons, viewshed_to_geojson, viewshed_to_rle,
+)
+from los_module.los import line_of_sight
+from los_module.overlay import Overlay
+from los_module.viewshed import viewshed
+
+from .conftest import RES, cell_centres
+
+
+@pytest.fixture
+def vs(dem):
+    return viewshed(dem, tuple(cell_centres(dem, 80, 60)[0]), 1_500)
+
+
+def test_unsimplified_polygons_cover_the_visible_cells(vs):
+    geom = viewshed_polygons(vs, tolerance=0)
+    assert geom.area == pytest.approx(vs.mask.sum() * RES * RES)
+
+    rows, cols = np.nonzero(vs.mask)
+    x, y = vs.transform * (cols + 0.5, rows + 0.5)
+    assert shapely.contains_xy(geom, x, y).all()
+    rows, cols = np.nonzero(~vs.mask)
+    x, y = vs.transform * (cols + 0.5, rows + 0.5)
+    assert not shapely.contains_xy(geom, x, y).any()
+
+
+def test_geojson_fits_the_size_budget(vs):
+    full = viewshed_to_geojson(vs)
+    props = full["features"][0]["properties"]
+    assert props["radius"] == 1_500 and props["tolerance"] == RES
+    budget = len(_dumps(full)) // 2
+    small = viewshed_to_geojson(vs, max_bytes=budget)
+    assert len(_dumps(small)) <= budget
+    assert small["features"][0]["properties"]["tolerance"] > RES
+    with pytest.raises(ValueError):
+        viewshed_to_geojson(vs, max_bytes=100)
+
+
+def test_rle_round_trips_the_lnglat_grid(vs):
+    doc = viewshed_to_rle(vs)
+    doc = json.loads(json.dumps(doc))
+    mask, _ = Overlay.from_viewshed(vs).image()
+    assert doc["shape"] == list(mask.shape)
+
+    west, south, east, north = doc["bounds"]
+    h, w = mask.shape
+    rows, cols = np.mgrid[0:h, 0:w]
+    lng = west + (cols.ravel() + 0.5) / w * (east - west)
+    lat = north - (rows.ravel() + 0.5) / h * (north - south)
+    np.testing.assert_array_equal(rle_visible(doc, lng, lat).reshape(h, w), mask)
+    assert not rle_visible(doc, [west - 1, east + 1], [south, north]).any()
+
+
+def test_rle_coarsens_to_fit(vs):
+    full = viewshed_to_rle(vs)
+    small = viewshed_to_rle(vs, max_bytes=len(_dumps(full)) // 3)
+    assert small["shape"][0] < full["shape"][0]
+    assert small["bounds"][0] == full["bounds"][0] and small["bounds"][3] == full["bounds"][3]
+    with pytest.raises(ValueError):
+        viewshed_to_rle(vs, max_bytes=50)
+
+
+def test_los_geojson_marks_blocking_points(dem):
+    observer = cell_centres(dem, 80, 60)[0]
+    targets = cell_centres(dem, [80, 20, 150], [70, 140, 150])
+    result = line_of_sight(dem, observer, targets)
+    doc = los_to_geojson(dem, observer, targets, result)
+    features = doc["features"]
+    assert features[0]["properties"] == {"role": "observer"}
+    assert [f["properties"]["visible"] for f in features[1:]] == result.visible.tolist()
+    for f, block in zip(features[1:], result.block_distance):
+        assert ("blocked_at" in f["properties"]) == bool(np.isfinite(block))
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+from pyproj import Transformer
+
+from los_module.horizon import build_horizons, horizon_profile, load_horizons, save_horizons
+from los_module.los import line_of_sight
+
+from .conftest import cell_centres
+
+
+@pytest.fixture
+def profile(dem):
+    return horizon_profile(dem, tuple(cell_centres(dem, 80, 60)[0]), 2_400, n_azimuths=1024)
+
+
+def test_agrees_with_line_of_sight(dem, profile):
+    rows, cols = np.mgrid[0:161:3, 0:161:3]
+    targets = cell_centres(dem, rows.ravel(), cols.ravel())
+    d = np.hypot(*(targets - profile.observer).T)
+    targets = targets[(d > 0) & (d <= profile.radius)]
+
+    got = profile.visible(dem, targets[:, 0], targets[:, 1], target_height=1.7)
+    los = line_of_sight(dem, profile.observer, targets, observer_height=1.7, target_height=1.7)
+    assert los.visible.any() and not los.visible.all()
+    assert (got == los.visible).mean() > 0.95
+
+
+def test_scalar_queries(dem, profile):
+    x, y = cell_centres(dem, [80, 60], [70, 100]).T
+    expected = profile.visible(dem, x, y, 1.7)
+    assert [bool(profile.visible(dem, xi, yi, 1.7)) for xi, yi in zip(x, y)] == expected.tolist()
+
+    az, band, dist = profile.lookup(x[0], y[0])
+    assert np.ndim(band) == 0 and band >= 0 and dist == pytest.approx(300.0)
+    assert profile.lookup(x[0] + 5_000, y[0])[1] == -1
+    assert not profile.visible_z(x[0] + 5_000, y[0], 1e6)
+    assert profile.visible_z(x[1], y[1], 1e5)
+
+
+def test_skyline(profile):
+    sky = profile.skyline()
+    assert sky["azimuth_step"] == 360.0 / 1024
+    assert len(sky["elevation_deg"]) == len(sky["distance"]) == 1024
+    assert max(sky["distance"]) <= profile.radius
+
+
+def test_build_save_load(dem, tmp_path):
+    left, bottom, _, _ = dem.bounds
+    xy = np.vstack([cell_centres(dem, [80, 120], [60, 60]), [[left - 5_000, bottom - 5_000]]])
+    lng, lat = Transformer.from_crs(dem.crs, "EPSG:4326", always_xy=True).transform(xy[:, 0], xy[:, 1])
+    profiles = build_horizons(dem, ["hut", "camp", "off"], lng, lat, 1_500, n_azimuths=256)
+    assert list(profiles) == ["hut", "camp"]
+
+    path = save_horizons(str(tmp_path / "horizons.npz"), profiles)
+    loaded = load_horizons(path)
+    assert list(loaded) == ["hut", "camp"]
+    for name, p in profiles.items():
+        q = loaded[name]
+        np.testing.assert_allclose(q.observer, p.observer)
+        np.testing.assert_array_equal(q.horizon, p.horizon)
+        np.testing.assert_array_equal(q.edges, p.edges)
+        assert (q.z_obs, q.radius, q.curvature, q.refraction) == (p.z_obs, p.radius, p.curvature, p.refraction)
+    targets = cell_centres(dem, [60, 100, 150], [40, 80, 150])
+    np.testing.assert_array_equal(
+        loaded["hut"].visible(dem, targets[:, 0], targets[:, 1]),
+        profiles["hut"].visible(dem, targets[:, 0], targets[:, 1]),
+    )
+
+    with pytest.raises(ValueError):
+        save_horizons(str(tmp_path / "empty.npz"), {})
+
+
+def test_save_refuses_mixed_profiles(dem, tmp_path):
+    a, b = (tuple(xy) for xy in cell_centres(dem, [80, 120], [60, 60]))
+    base = horizon_profile(dem, a, 1_500, n_azimuths=256)
+    path = str(tmp_path / "mixed.npz")
+    variants = {
+        "radius": horizon_profile(dem, b, 1_200, n_azimuths=256),
+        "azimuths": horizon_profile(dem, b, 1_500, n_azimuths=128),
+        "bands": horizon_profile(dem, b, 1_500, n_azimuths=256, near=300, band_ratio=1.2),
+        "curvature": horizon_profile(dem, b, 1_500, n_azimuths=256, curvature=False),
+        "refraction": horizon_profile(dem, b, 1_500, n_azimuths=256, refraction=0.0),
+    }
+    for name, other in variants.items():
+        with pytest.raises(ValueError, match="other"):
+            save_horizons(path, {"base": base, "other": other})
+    assert not (tmp_path / "mixed.npz").exists()
+    save_horizons(path, {"base": base, "same": horizon_profile(dem, b, 1_500, n_azimuths=256)})
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from los_module.incremental import ViewshedTracker
+from los_module.viewshed import viewshed
+
+from .conftest import cell_centres, make_dem
+
+
+def in_grid(vs, other):
+    """``other``'s mask placed on ``vs``'s grid (same cell size)."""
+    col, row = ~vs.transform * (other.transform.c, other.transform.f)
+    row, col = round(row), round(col)
+    out = np.zeros(vs.mask.shape, dtype=bool)
+    h, w = other.mask.shape
+    r0, c0 = max(row, 0), max(col, 0)
+    r1, c1 = min(row + h, out.shape[0]), min(col + w, out.shape[1])
+    out[r0:r1, c0:c1] = other.mask[r0 - row:r1 - row, c0 - col:c1 - col]
+    return out
+
+
+def test_full_update_matches_viewshed(dem):
+    observer = tuple(cell_centres(dem, 80, 60)[0])
+    tracker = ViewshedTracker(dem, 1_800, near=600)
+    vs = tracker.update(observer)
+    np.testing.assert_array_equal(vs.mask, in_grid(vs, viewshed(dem, observer, 1_800)))
+    assert tracker.full_updates == 1
+
+
+def test_partial_updates_stay_close_to_viewshed(dem):
+    x, y = cell_centres(dem, 80, 60)[0]
+    tracker = ViewshedTracker(dem, 1_800, near=600)
+    tracker.update((x, y))
+    for k in range(1, 6):
+        observer = (x + 12.0 * k, y - 7.0 * k)
+        vs = tracker.update(observer)
+        expected = in_grid(vs, viewshed(dem, observer, 1_800))
+        # Reused far cells come from the anchor's rays: ~1-2 % of visible cells
+        # on this 60-cell radius (see test_partial_updates_at_20_km for the bound).
+        assert (vs.mask != expected).sum() <= 0.03 * expected.sum()
+    assert (tracker.full_updates, tracker.partial_updates) == (1, 5)
+
+    # Past max_move: a fresh anchor.
+    tracker.update((x + 500.0, y))
+    assert tracker.full_updates == 2
+
+
+def fractal_terrain(size, seed, relief=2_500.0, beta=3.4):
+    """Power-law (fractal) terrain, rougher and more alpine than ``terrain()``."""
+    rng = np.random.default_rng(seed)
+    k = np.hypot(np.fft.fftfreq(size)[:, None], np.fft.rfftfreq(size)[None, :])
+    k[0, 0] = 1.0
+    spectrum = (rng.normal(size=k.shape) + 1j * rng.normal(size=k.shape)) * k ** (-beta / 2)
+    spectrum[0, 0] = 0.0
+    z = np.fft.irfft2(spectrum, (size, size))
+    return 800.0 + relief * (z - z.min()) / (z.max() - z.min())
+
+
+def test_partial_updates_at_20_km(dem):
+    # The accuracy bound in the module docs: under 0.5 % of visible cells.
+    big = make_dem(fractal_terrain(1_401, seed=0))
+    x, y = cell_centres(big, 700, 700)[0]
+    tracker = ViewshedTracker(big, 20_000)
+    tracker.update((x, y))
+    for k in (1, 3, 5):
+        observer = (x + 16.0 * k, y - 5.0 * k)
+        vs = tracker.update(observer)
+        expected = in_grid(vs, viewshed(big, observer, 20_000))
+        assert (vs.mask != expected).sum() <= 0.005 * expected.sum()
+    assert (tracker.full_updates, tracker.partial_updates) == (1, 3)
+
+    vs = tracker.update(observer, exact=True)
+    np.testing.assert_array_equal(vs.mask, in_grid(vs, viewshed(big, observer, 20_000)))
+    assert tracker.full_updates == 2
+
+
+def test_off_dem_observer_raises_value_error(dem):
+    left, bottom, _, _ = dem.bounds
+    tracker = ViewshedTracker(dem, 1_800)
+    for observer in [(left - 100.0, bottom + 100.0), (left - 50_000.0, bottom - 50_000.0)]:
+        with pytest.raises(ValueError):
+            tracker.update(observer)
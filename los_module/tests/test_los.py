@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from los_module.los import EARTH_RADIUS, curvature_drop, line_of_sight
+
+from .conftest import cell_centres, make_dem
+
+
+def brute_force_los(dem, obs, tgt, observer_height, target_height, step):
+    """One pair at a time: walk the profile and compare each sample with the sightline."""
+    z0 = dem.sample(*obs) + observer_height
+    z1 = dem.sample(*tgt) + target_height
+    if not (np.isfinite(z0) and np.isfinite(z1)):
+        return False, False
+    dist = np.hypot(tgt[0] - obs[0], tgt[1] - obs[1])
+    k = 1
+    while k * step < dist:
+        t = k * step / dist
+        ground = dem.sample(obs[0] + t * (tgt[0] - obs[0]), obs[1] + t * (tgt[1] - obs[1]))
+        if ground > z0 + t * (z1 - z0):
+            return True, False
+        k += 1
+    return True, True
+
+
+def test_matches_brute_force_profile(dem):
+    rng = np.random.default_rng(1)
+    obs = cell_centres(dem, rng.integers(5, 155, 300), rng.integers(5, 155, 300))
+    tgt = cell_centres(dem, rng.integers(5, 155, 300), rng.integers(5, 155, 300))
+    # A small max_samples forces several chunks.
+    res = line_of_sight(dem, obs, tgt, observer_height=1.7, target_height=1.7,
+                        curvature=False, max_samples=5_000)
+    expected = [brute_force_los(dem, o, t, 1.7, 1.7, 30.0) for o, t in zip(obs, tgt)]
+    assert res.valid.all()
+    assert res.visible.tolist() == [vis for _, vis in expected]
+    # Both outcomes occur on this terrain.
+    assert 0 < res.visible.sum() < len(res.visible)
+
+
+def test_wall_blocks_and_reports_distance():
+    data = np.full((50, 50), 100.0, dtype=np.float32)
+    data[:, 25] = 300.0
+    dem = make_dem(data)
+    obs = cell_centres(dem, 20, 10)[0]
+    res = line_of_sight(dem, obs, cell_centres(dem, [20, 20], [40, 20]), curvature=False)
+    assert res.visible.tolist() == [False, True]
+    assert res.block_distance[0] == pytest.approx(15 * 30.0)
+    assert np.isnan(res.block_distance[1])
+
+
+def test_off_dem_pairs_are_invalid(dem):
+    obs = cell_centres(dem, 80, 80)[0]
+    res = line_of_sight(dem, obs, [[0.0, 0.0], tuple(cell_centres(dem, 10, 10)[0])])
+    assert res.valid.tolist() == [False, True]
+    assert not res.visible[0]
+
+
+def test_curvature_drop():
+    assert curvature_drop(10_000.0, refraction=0.0) == pytest.approx(1e8 / (2 * EARTH_RADIUS))
+    assert curvature_drop(10_000.0, refraction=0.13) == pytest.approx(0.87 * 1e8 / (2 * EARTH_RADIUS))
+    assert curvature_drop(10_000.0, curvature=False) == 0.0
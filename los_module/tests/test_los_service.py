@@ -0,0 +1,104 @@
+import base64
+import json
+
+import numpy as np
+import pytest
+from pyproj import Transformer
+from starlette.testclient import TestClient
+
+from los_module.los import line_of_sight
+from los_module.los_service import LosService, VisibilityDiff, create_los_app
+from los_module.route import parse_geojson_track
+
+from .conftest import cell_centres
+
+
+def lnglat(dem, xy):
+    lng, lat = Transformer.from_crs(dem.crs, "EPSG:4326", always_xy=True).transform(xy[:, 0], xy[:, 1])
+    return lng.tolist(), lat.tolist()
+
+
+@pytest.fixture
+def service(dem, tmp_path):
+    # Route straight along row 80, from column 10 to column 150.
+    lng, lat = lnglat(dem, cell_centres(dem, [80, 80], [10, 150]))
+    path = tmp_path / "route.geojson"
+    path.write_text(json.dumps({"type": "LineString", "coordinates": list(map(list, zip(lng, lat)))}))
+    return LosService(dem, parse_geojson_track(str(path)), max_range=3_000)
+
+
+@pytest.fixture
+def tick(dem):
+    (o_lng,), (o_lat,) = lnglat(dem, cell_centres(dem, [80], [60]))
+    lng, lat = lnglat(dem, cell_centres(dem, [80, 20, 150, 5], [70, 140, 150, 155]))
+    return {
+        "tick": 1, "observer": {"lng": o_lng, "lat": o_lat}, "ids": ["a", "b", "c", "far"], "lng": lng, "lat": lat,
+    }
+
+
+def expected(dem, tick):
+    obs = np.array(dem.lnglat_to_xy(tick["observer"]["lng"], tick["observer"]["lat"]))
+    targets = np.column_stack(dem.lnglat_to_xy(tick["lng"], tick["lat"]))
+    res = line_of_sight(dem, obs, targets, observer_height=1.7, target_height=1.7)
+    near = np.hypot(*(targets - obs).T) <= 3_000
+    return res.visible & res.valid & near
+
+
+def test_visible_matches_line_of_sight(dem, service, tick):
+    ids, visible = service.visible(tick)
+    want = expected(dem, tick)
+    assert ids == tick["ids"] and visible.tolist() == want.tolist()
+    assert want.any() and not want.all()
+    assert not visible[3]  # beyond max_range, though nothing blocks it
+
+
+def test_chainage_ticks_follow_the_route(dem, service):
+    xy = service.positions({"chainage": [0.0, 1_500.0]})
+    start = cell_centres(dem, [80], [10])[0]
+    np.testing.assert_allclose(xy[0], start, atol=0.5)
+    # Chainage is spherical (haversine): ~0.3 % short of UTM metres east-west here.
+    np.testing.assert_allclose(xy[1], start + [1_500.0, 0.0], atol=0.005 * 1_500)
+    with pytest.raises(ValueError):
+        LosService(dem).positions({"chainage": [0.0]})
+
+
+def test_post_returns_the_bitmap(dem, service, tick):
+    with TestClient(create_los_app(service)) as client:
+        doc = client.post("/los", json=tick).json()
+        want = expected(dem, tick)
+        bits = np.unpackbits(np.frombuffer(base64.b64decode(doc["bitmap"]), dtype=np.uint8))[:len(want)]
+        assert bits.astype(bool).tolist() == want.tolist()
+        assert doc["visible"] == [i for i, v in zip(tick["ids"], want) if v] and doc["count"] == want.sum()
+
+        assert client.options("/los").status_code == 204
+        for bad in ("{", "[1, 2]", json.dumps({**tick, "ids": ["a"]})):
+            response = client.post("/los", content=bad, headers={"content-type": "application/json"})
+            assert response.status_code == 400 and "error" in response.json()
+        assert client.get("/metrics").json()["served"] == 1
+
+
+def test_stream_sends_changes_and_survives_bad_frames(dem, service, tick):
+    visible = [i for i, v in zip(tick["ids"], expected(dem, tick)) if v]
+    with TestClient(create_los_app(service)) as client, client.websocket_connect("/los/stream") as ws:
+        ws.send_json(tick)
+        assert ws.receive_json() == {"tick": 1, "seen": visible, "lost": []}
+
+        ws.send_text("{not json")
+        assert ws.receive_json() == {"error": "expected a JSON text frame"}
+        ws.send_bytes(b"\x00\x01")
+        assert ws.receive_json() == {"error": "expected a JSON text frame"}
+        ws.send_json([1, 2])
+        assert ws.receive_json()["tick"] is None
+        ws.send_json({"tick": 2, "observer": tick["observer"]})
+        assert ws.receive_json()["tick"] == 2
+
+        ws.send_json({**tick, "tick": 3})  # unchanged: no reply
+        ws.send_json({**tick, "tick": 4, "ids": [], "lng": [], "lat": []})
+        assert ws.receive_json() == {"tick": 4, "seen": [], "lost": visible}
+
+
+def test_visibility_diff():
+    diff = VisibilityDiff()
+    assert diff.update(["a", "b", "c"], [True, False, True]) == (["a", "c"], [])
+    assert diff.update(["a", "b"], [True, True]) == (["b"], ["c"])
+    assert diff.update(["a", "b"], [True, True]) == ([], [])
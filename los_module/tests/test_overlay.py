@@ -0,0 +1,89 @@
+from io import BytesIO
+
+import morecantile
+import numpy as np
+import pytest
+from PIL import Image
+from starlette.testclient import TestClient
+
+from los_module.cache import viewshed_key
+from los_module.overlay import OverlayService, create_overlay_app, empty_tile, encode_mask_png
+from los_module.viewshed import viewshed
+
+from .conftest import cell_centres
+
+
+def decode(body):
+    img = Image.open(BytesIO(body))
+    assert img.mode in ("P", "1")
+    return np.asarray(img).astype(bool)
+
+
+@pytest.fixture
+def vs(dem):
+    return viewshed(dem, tuple(cell_centres(dem, 80, 60)[0]), 1_500)
+
+
+@pytest.fixture
+def service():
+    return OverlayService(max_overlays=2)
+
+
+def test_encode_mask_png_round_trip():
+    mask = np.random.default_rng(0).random((37, 50)) < 0.4
+    body = encode_mask_png(mask)
+    np.testing.assert_array_equal(decode(body), mask)
+    img = Image.open(BytesIO(body))
+    assert img.info["transparency"] == bytes([0, 180])
+    assert img.getpalette()[3:6] == [0, 200, 0]
+
+
+def test_overlay_is_the_visible_crop(dem, vs, service):
+    token = service.add(viewshed_key(dem, vs.observer, vs.radius), vs)
+    assert service.add(viewshed_key(dem, vs.observer, vs.radius), vs) == token and len(service) == 1
+    overlay = service.get(token)
+    crop = vs.crop(pad=1)
+    np.testing.assert_array_equal(overlay.mask, crop.mask)
+
+    west, south, east, north = service.bounds(token)
+    assert west < east and south < north
+    image, _ = overlay.image()
+    # Nearest reprojection of a near-square crop keeps the visible share.
+    assert abs(image.mean() - crop.mask.mean()) < 0.05
+    body, tag = service.render(token)
+    np.testing.assert_array_equal(decode(body), image)
+    assert service.lookup(token) == (body, tag)
+
+
+def test_keeps_the_most_recent_overlays(dem, service):
+    tokens = []
+    for col in (40, 60, 80):
+        vs = viewshed(dem, tuple(cell_centres(dem, 80, col)[0]), 900)
+        tokens.append(service.add(viewshed_key(dem, vs.observer, vs.radius), vs))
+    assert len(service) == 2
+    assert service.get(tokens[0]) is None and service.render(tokens[0]) is None
+
+
+def test_app_serves_image_tiles_and_info(dem, vs, service):
+    token = service.add(viewshed_key(dem, vs.observer, vs.radius), vs)
+    with TestClient(create_overlay_app(service, "http://overlay")) as client:
+        info = client.get(f"/overlay/{token}.json").json()
+        assert info["image"] == f"http://overlay/overlay/{token}.png"
+        assert info["tileSize"] == 256
+
+        image = client.get(f"/overlay/{token}.png")
+        assert image.status_code == 200 and image.headers["content-type"] == "image/png"
+        again = client.get(f"/overlay/{token}.png", headers={"If-None-Match": image.headers["etag"]})
+        assert again.status_code == 304
+
+        west, south, east, north = info["bounds"]
+        tms = morecantile.tms.get("WebMercatorQuad")
+        tile = tms.tile((west + east) / 2, (south + north) / 2, 14)
+        body = client.get(f"/overlay/{token}/{tile.z}/{tile.x}/{tile.y}.png").content
+        assert decode(body).any()
+        far = tms.tile(west - 1, south, 14)
+        assert client.get(f"/overlay/{token}/{far.z}/{far.x}/{far.y}.png").content == empty_tile()
+
+        assert client.get("/overlay/unknown.png").status_code == 404
+        assert client.get("/overlay/unknown.json").status_code == 404
+        assert client.get("/metrics").json()["overlays"] == 1
@@ -0,0 +1,65 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import los_module
+from los_module.__main__ import COMMANDS, main
+
+# Directory holding the los_module package.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(los_module.__file__)))
+
+
+def loaded_after(code):
+    """Modules (and their top-level packages) imported by a fresh interpreter running ``code``."""
+    out = subprocess.run(
+        [sys.executable, "-c", f"{code}\nimport json, sys\nprint(json.dumps(sorted(sys.modules)))"],
+        capture_output=True, text=True, check=True, cwd=ROOT,
+    ).stdout
+    names = json.loads(out.splitlines()[-1])
+    return set(names) | {name.split(".")[0] for name in names}
+
+
+HEAVY = {"starlette", "shapely", "geopandas", "PIL", "scipy", "rio_tiler", "uvicorn", "marimo", "pyproj"}
+
+
+def test_import_loads_only_the_headless_core():
+    loaded = loaded_after("import los_module")
+    assert not HEAVY & loaded
+    assert {"los_module.dem", "los_module.los", "los_module.viewshed"} <= loaded
+    assert "los_module.tile_server" not in loaded
+
+
+def test_lazy_attributes_load_their_module_on_access():
+    loaded = loaded_after("import los_module; los_module.RouteIndex")
+    assert "los_module.route_index" in loaded and "los_module.tile_server" not in loaded
+
+    for name in los_module.__all__:
+        assert getattr(los_module, name) is not None
+    assert set(los_module.__all__) <= set(dir(los_module))
+    with pytest.raises(AttributeError):
+        los_module.not_a_thing
+
+
+def test_commands_resolve_to_module_mains():
+    import importlib
+
+    for module, _ in COMMANDS.values():
+        assert callable(importlib.import_module(f"los_module.{module}").main)
+
+
+def test_main_usage_and_unknown_commands(capsys):
+    assert main([]) == 2
+    assert main(["--help"]) == 0
+    out = capsys.readouterr().out
+    assert all(name in out for name in COMMANDS)
+
+    assert main(["frobnicate"]) == 2
+    assert "unknown command 'frobnicate'" in capsys.readouterr().err
+
+
+def test_main_dispatches_to_the_command(tmp_path, dem_path):
+    assert main(["raw", dem_path, "--cache-dir", str(tmp_path / "cache")]) == 0
+    assert (tmp_path / "cache" / "dem.dem.json").exists()
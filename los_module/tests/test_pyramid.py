@@ -0,0 +1,23 @@
+from los_module.pyramid import MBTilesReader, dem_bounds_4326, export_mbtiles, pyramid_tiles
+from los_module.tiles import TerrainTileRenderer
+
+
+def test_export_matches_live_rendering(dem_path, tmp_path):
+    out = tmp_path / "terrain.mbtiles"
+    n = export_mbtiles(dem_path, str(out), 10, 12, tilesize=256, workers=1)
+    tiles = pyramid_tiles(dem_bounds_4326(dem_path), 10, 12)
+    assert n == len(tiles) and not (tmp_path / "terrain.mbtiles.tmp").exists()
+
+    reader = MBTilesReader(str(out))
+    renderer = TerrainTileRenderer(dem_path, 256)
+    try:
+        assert reader.metadata["encoding"] == "mapbox"
+        assert (reader.metadata["minzoom"], reader.metadata["maxzoom"]) == ("10", "12")
+        for z, x, y in tiles:
+            # Stored by XYZ address, TMS rows inside the archive.
+            assert reader.get(z, x, y) == renderer.render(z, x, y)
+        assert reader.get(12, 0, 0) is None
+        assert reader.first(12) is not None and reader.first(13) is None
+    finally:
+        reader.close()
+        renderer.close()
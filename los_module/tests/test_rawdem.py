@@ -0,0 +1,56 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+import rasterio
+
+from los_module.dem import Dem
+from los_module.rawdem import build_raw_cache, cache_paths, ensure_raw_cache
+
+from .conftest import make_dem, write_dem
+
+
+def test_memmap_matches_geotiff(dem, dem_path):
+    sidecar = ensure_raw_cache(dem_path)
+    raw = Dem.open(sidecar)
+    assert isinstance(raw.data, np.memmap) and not raw.data.flags.writeable
+    np.testing.assert_array_equal(raw.data, dem.data)
+    assert raw.transform == dem.transform and raw.crs == dem.crs
+
+    # The VRT exposes the same file to GDAL readers.
+    with rasterio.open(cache_paths(dem_path)[2]) as src:
+        np.testing.assert_array_equal(src.read(1), dem.data)
+
+    window = Dem.open(sidecar, bounds=(raw.bounds[0], raw.bounds[1], raw.bounds[0] + 300, raw.bounds[1] + 300))
+    np.testing.assert_array_equal(window.data, dem.data[-10:, :10])
+
+
+def test_reused_until_the_source_changes(dem_path):
+    sidecar = ensure_raw_cache(dem_path)
+    built = os.stat(sidecar).st_mtime_ns
+    assert ensure_raw_cache(dem_path) == sidecar
+    assert os.stat(sidecar).st_mtime_ns == built
+
+    st = os.stat(dem_path)
+    os.utime(dem_path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    ensure_raw_cache(dem_path)
+    assert os.stat(sidecar).st_mtime_ns != built
+
+
+def test_int16_refuses_nodata(tmp_path):
+    data = make_dem().data.copy()
+    data[3, 4] = np.nan
+    path = write_dem(tmp_path / "holes.tif", make_dem(data))
+    with pytest.raises(ValueError):
+        build_raw_cache(path, dtype="int16")
+    assert sorted(os.listdir(tmp_path)) == ["holes.tif"]
+
+
+def test_concurrent_builders_do_not_interleave(dem, dem_path, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    with ProcessPoolExecutor(4) as pool:
+        # Small blocks so the builders' writes overlap in time.
+        list(pool.map(build_raw_cache, [dem_path] * 8, [cache_dir] * 8, ["float32"] * 8, [1] * 8, [4] * 8))
+    assert sorted(os.listdir(cache_dir)) == ["dem.dem.json", "dem.f32", "dem.vrt"]
+    np.testing.assert_array_equal(Dem.open(os.path.join(cache_dir, "dem.dem.json")).data, dem.data)
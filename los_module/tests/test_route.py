@@ -0,0 +1,92 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from los_module import route
+from los_module.route import geodesic_chainage, load_track, parse_geojson_track, parse_gpx, track_cache_path
+
+GPX = """<?xml version="1.0"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1">
+  <wpt lat="45.80" lon="7.00"><ele>999</ele><name>not a track point</name></wpt>
+  <trk><trkseg>
+    <trkpt lat="45.7500" lon="6.9500"><ele>1200.5</ele><time>2025-09-07T10:00:00Z</time></trkpt>
+    <trkpt lat="45.7509" lon="6.9500"><ele>1210.0</ele><time>2025-09-07T12:10:00+02:00</time></trkpt>
+  </trkseg><trkseg>
+    <trkpt lat="45.7509" lon="6.9513"></trkpt>
+  </trkseg></trk>
+</gpx>
+"""
+
+
+@pytest.fixture
+def gpx(tmp_path):
+    path = tmp_path / "race.gpx"
+    path.write_text(GPX)
+    return str(path)
+
+
+def test_parse_gpx(gpx):
+    track = parse_gpx(gpx)
+    assert len(track) == 3 and track.segments.tolist() == [0, 2]
+    np.testing.assert_array_equal(track.ele, [1200.5, 1210.0, np.nan])
+    assert track.time.astype(str).tolist() == ["2025-09-07T10:00:00.000", "2025-09-07T10:10:00.000", "NaT"]
+    # 0.0009 deg of latitude, then 0.0013 deg of longitude at 45.75 N: about 100 m each.
+    np.testing.assert_allclose(np.diff(track.chainage), [100.1, 100.8], atol=0.2)
+    assert [len(s) for s in track.split(track.lng)] == [2, 1]
+
+
+def test_parse_geojson_track(tmp_path):
+    path = tmp_path / "race.geojson"
+    geometries = [
+        {"type": "Point", "coordinates": [7.0, 45.8]},
+        {"type": "LineString", "coordinates": [[6.95, 45.75, 1200], [6.95, 45.76, 1300]]},
+        {"type": "MultiLineString", "coordinates": [[[6.96, 45.76], [6.97, 45.76]]]},
+    ]
+    path.write_text(json.dumps({
+        "type": "FeatureCollection",
+        "features": [{"type": "Feature", "geometry": g} for g in geometries],
+    }))
+    track = parse_geojson_track(str(path))
+    assert track.segments.tolist() == [0, 2]
+    np.testing.assert_array_equal(track.ele, [1200, 1300, np.nan, np.nan])
+    assert np.isnat(track.time).all()
+    np.testing.assert_array_equal(track.chainage, geodesic_chainage(track.lng, track.lat))
+
+    path.write_text(json.dumps({"type": "Point", "coordinates": [7.0, 45.8]}))
+    with pytest.raises(ValueError):
+        parse_geojson_track(str(path))
+
+
+def test_cache_is_reused_until_the_contents_change(gpx, monkeypatch):
+    first = load_track(gpx)
+    cache = track_cache_path(gpx)
+    assert os.path.exists(cache)
+
+    def no_parse(path):
+        raise AssertionError("parsed despite a cache hit")
+
+    monkeypatch.setattr(route, "parse_gpx", no_parse)
+    cached = load_track(gpx)
+    for name, values in vars(first).items():
+        np.testing.assert_array_equal(getattr(cached, name), values)
+    monkeypatch.undo()
+
+    with open(gpx, "a") as f:
+        f.write("<!-- edited -->\n")
+    assert track_cache_path(gpx) != cache
+    assert len(load_track(gpx)) == 3
+    assert not os.path.exists(cache)
+
+
+def test_pruning_leaves_other_sources_alone(gpx, tmp_path):
+    other = tmp_path / "race.gpx.bak.gpx"
+    other.write_text(GPX.replace("1200.5", "1201.5"))
+    load_track(str(other))
+    load_track(gpx)
+    with open(gpx, "a") as f:
+        f.write("\n")
+    load_track(gpx)
+    caches = sorted(n for n in os.listdir(tmp_path) if n.endswith(route.TRACK_CACHE_SUFFIX))
+    assert caches == sorted(os.path.basename(track_cache_path(p)) for p in (gpx, str(other)))
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from los_module.route import Track, geodesic_chainage
+from los_module.route_index import RouteIndex, _merge
+
+
+@pytest.fixture
+def index():
+    # Random walk of ~50 m steps near Courmayeur, in two track segments.
+    rng = np.random.default_rng(0)
+    steps = rng.normal(0.0, 0.0005, (400, 2)).cumsum(axis=0)
+    lng, lat = 6.97 + steps[:, 0], 45.79 + steps[:, 1]
+    track = Track(
+        lng, lat, np.full(400, np.nan), np.full(400, np.datetime64("NaT"), "datetime64[ms]"),
+        geodesic_chainage(lng, lat), np.array([0, 250]),
+    )
+    names = ["start", "mid", "end"]
+    waypoints = (names, lng[[0, 200, 399]], lat[[0, 200, 399]])
+    return RouteIndex(track, waypoints)
+
+
+def queries(index, n=300, seed=1):
+    w, s, e, n_ = index.track.bounds
+    rng = np.random.default_rng(seed)
+    return rng.uniform(w - 0.01, e + 0.01, n), rng.uniform(s - 0.01, n_ + 0.01, n)
+
+
+def brute_force(index, lng, lat):
+    """Distance from every query point to every segment (metres, index CRS)."""
+    p = np.column_stack(index.to_xy(lng, lat))[:, None, :]
+    a, ab = index._a[None], (index._b - index._a)[None]
+    t = np.clip(np.sum((p - a) * ab, axis=-1) / np.sum(ab * ab, axis=-1), 0.0, 1.0)
+    return np.hypot(*np.moveaxis(a + t[..., None] * ab - p, -1, 0)), t
+
+
+def test_segments_skip_the_gap_between_track_segments(index):
+    assert len(index) == 398
+    start, end = index.segment_points(np.arange(len(index)))
+    assert 249 not in start and (end - start == 1).all()
+
+
+def test_project_matches_brute_force(index):
+    lng, lat = queries(index)
+    d, t = brute_force(index, lng, lat)
+    p = index.project(lng, lat)
+    assert p.found.all()
+    np.testing.assert_allclose(p.distance, d.min(axis=1), atol=1e-6)
+    rows = np.arange(len(lng))
+    np.testing.assert_allclose(p.t, t[rows, p.segment], atol=1e-9)
+    c0, c1 = index._ch[p.segment].T
+    np.testing.assert_allclose(p.chainage, c0 + p.t * (c1 - c0))
+    assert (p.chainage >= 0).all() and (p.chainage <= index.track.chainage[-1]).all()
+
+    near = index.project(lng, lat, max_distance=200)
+    np.testing.assert_array_equal(near.found, d.min(axis=1) <= 200)
+    assert np.isnan(near.distance[~near.found]).all()
+
+
+def test_track_points_project_to_their_own_chainage(index):
+    track = index.track
+    p = index.project(track.lng[10:240], track.lat[10:240])
+    np.testing.assert_allclose(p.distance, 0.0, atol=1e-6)
+    np.testing.assert_allclose(p.chainage, track.chainage[10:240], atol=1e-6)
+
+
+def test_within_radius_matches_brute_force(index):
+    lng, lat = queries(index, n=50)
+    d, _ = brute_force(index, lng, lat)
+    pts, segs = index.segments_within(lng, lat, 300)
+    got = set(zip(pts.tolist(), segs.tolist()))
+    assert got == set(zip(*np.nonzero(d <= 300)))
+
+    within = index.chainage_within(lng, lat, 300)
+    assert len(within) == len(lng) and any(not len(i) for i in within)
+    for i, intervals in enumerate(within):
+        np.testing.assert_array_equal(intervals, _merge(index._ch[d[i] <= 300]))
+    assert index.chainage_within([], [], 300) == []
+
+
+def test_waypoint_queries(index):
+    lng, lat = queries(index, n=100)
+    wx, wy = index.to_xy(index.track.lng[[0, 200, 399]], index.track.lat[[0, 200, 399]])
+    x, y = index.to_xy(lng, lat)
+    d = np.hypot(x[:, None] - wx, y[:, None] - wy)
+    idx, dist = index.nearest_waypoint(lng, lat)
+    np.testing.assert_array_equal(idx, d.argmin(axis=1))
+    np.testing.assert_allclose(dist, d.min(axis=1))
+    pts, wpts = index.waypoints_within(lng, lat, 500)
+    assert set(zip(pts.tolist(), wpts.tolist())) == set(zip(*np.nonzero(d <= 500)))
+
+    bare = RouteIndex(index.track)
+    with pytest.raises(ValueError):
+        bare.nearest_waypoint(lng, lat)
+
+
+def test_merge():
+    ch = np.array([[5.0, 7.0], [0.0, 2.0], [1.0, 3.0], [3.0, 4.0], [8.0, 9.0]])
+    np.testing.assert_array_equal(_merge(ch), [[0.0, 4.0], [5.0, 7.0], [8.0, 9.0]])
+    assert _merge(np.empty((0, 2))).shape == (0, 2)
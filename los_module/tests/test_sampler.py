@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from pyproj import Transformer
+
+from los_module.sampler import METHODS, DemSampler
+
+from .conftest import make_dem
+
+
+@pytest.fixture
+def plane():
+    r, c = np.mgrid[0:40, 0:50]
+    return make_dem(1000.0 + 3.0 * r - 2.0 * c)
+
+
+@pytest.mark.parametrize("method", ["bilinear", "bicubic"])
+def test_interpolation_is_exact_on_a_plane(plane, method):
+    rng = np.random.default_rng(0)
+    rows, cols = rng.uniform(2, 37, 500), rng.uniform(2, 47, 500)
+    x, y = plane.xy(rows, cols)
+    got = DemSampler(plane).sample_xy(x, y, method, chunk=128)
+    np.testing.assert_allclose(got.values, 1000.0 + 3.0 * rows - 2.0 * cols, atol=1e-3)
+    assert got.valid.all() and not got.outside.any()
+
+
+def test_nearest_and_bilinear_match_dem(dem):
+    rng = np.random.default_rng(1)
+    rows, cols = rng.uniform(0, 160, 1000), rng.uniform(0, 160, 1000)
+    x, y = dem.xy(rows, cols)
+    sampler = DemSampler(dem)
+    np.testing.assert_allclose(sampler.sample_xy(x, y).values, dem.sample(x, y), rtol=1e-6)
+    nearest = sampler.sample_xy(x, y, "nearest").values
+    np.testing.assert_array_equal(nearest, dem.data[np.rint(rows).astype(int), np.rint(cols).astype(int)])
+
+
+def test_wgs84_points_go_through_the_dem_crs(dem):
+    x, y = dem.xy(np.array([10.5, 80.0, 150.2]), np.array([20.0, 80.7, 3.3]))
+    lng, lat = Transformer.from_crs(dem.crs, "EPSG:4326", always_xy=True).transform(x, y)
+    sampler = DemSampler(dem)
+    np.testing.assert_allclose(sampler.sample(lng, lat).values, sampler.sample_xy(x, y).values, atol=1e-3)
+
+
+def test_nodata_and_off_raster(plane):
+    plane.data[10, 10] = np.nan
+    sampler = DemSampler(plane)
+    x, y = plane.xy(np.array([10.0, 10.6, 20.0, 20.0, -5.0]), np.array([10.0, 9.4, 20.0, 20.0, 3.0]))
+    x[3] += 1e6
+    for method in METHODS:
+        got = sampler.sample_xy(x, y, method)
+        assert got.valid.tolist() == [False, method == "nearest", True, False, False]
+        assert got.outside.tolist() == [False, False, False, True, True]
+    with pytest.raises(ValueError):
+        sampler.sample_xy(x, y, "lanczos")
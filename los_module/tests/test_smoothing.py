@@ -0,0 +1,30 @@
+import os
+
+import numpy as np
+
+from los_module.cog import validate_cog
+from los_module.smoothing import iter_blocks, smooth_dem
+
+
+def test_blocks_cover_the_raster_exactly_once():
+    seen = np.zeros((1000, 777), dtype=np.int32)
+    for row, col, rows, cols in iter_blocks(*seen.shape, 256):
+        assert 0 < rows <= 256 and 0 < cols <= 256
+        seen[row:row + rows, col:col + cols] += 1
+    assert np.all(seen == 1)
+
+
+def test_smooth_dem_matches_whole_raster_filter(dem, dem_path, tmp_path):
+    import rasterio
+    from scipy.ndimage import gaussian_filter
+
+    out = str(tmp_path / "smooth.tif")
+    assert smooth_dem(dem_path, out, sigma=2.0, block=64) == out
+    assert sorted(os.listdir(tmp_path)) == ["dem.tif", "smooth.tif"]
+
+    expected = gaussian_filter(dem.data, sigma=2.0, output=np.float32, truncate=4.0)
+    with rasterio.open(out) as src:
+        np.testing.assert_array_equal(src.read(1), expected)
+        assert src.transform == dem.transform and src.crs == dem.crs
+    valid, errors, _ = validate_cog(out)
+    assert valid, errors
@@ -0,0 +1,178 @@
+import json
+import os
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image
+from pyproj import Transformer
+
+from los_module.dem import Dem
+from los_module.los import line_of_sight
+from los_module.pyramid import dem_bounds_4326, export_mbtiles, pyramid_tiles
+from los_module.tile_dem import TilePyramid, _decode, is_pyramid, shared_pyramid
+from los_module.tiles import elevation_to_terrain_rgb
+from los_module.viewshed import viewshed, viewshed_from_file
+
+from .conftest import cell_centres, write_dem
+
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "wb").close()
+
+
+def test_is_pyramid_needs_a_tile_layout(tmp_path):
+    assert is_pyramid("terrain.mbtiles")
+    assert not is_pyramid(tmp_path / "missing")
+    assert not is_pyramid(tmp_path)
+
+    plain = tmp_path / "plain"
+    touch(plain / "12" / "notes.txt")
+    touch(plain / "12" / "2130" / "readme.md")
+    touch(plain / "data" / "1" / "2.png")
+    assert not is_pyramid(plain)
+
+    xyz = tmp_path / "xyz"
+    touch(xyz / "12" / "2130" / "1456.webp")
+    assert is_pyramid(xyz)
+
+    described = tmp_path / "described"
+    touch(described / "metadata.json")
+    assert is_pyramid(described)
+
+
+def encode(rgba):
+    buf = BytesIO()
+    Image.fromarray(rgba).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def test_blank_and_nodata_tiles_decode_to_nan():
+    rgba = np.zeros((8, 8, 4), dtype=np.uint8)
+    assert np.isnan(_decode(encode(rgba))).all()  # fully transparent
+    rgba[..., 3] = 255
+    assert np.isnan(_decode(encode(rgba))).all()  # (0, 0, 0) == -10000 m
+
+    elev = np.full((8, 8), 1234.5)
+    elev[0, :3] = [np.nan, -9999.0, -10000.0]
+    rgba[..., :3] = np.moveaxis(elevation_to_terrain_rgb(elev), 0, -1)
+    rgba[7, 7, 3] = 0
+    decoded = _decode(encode(rgba))
+    # Display tiles carry NaN as sea level, never as a -10000 m pit.
+    assert decoded[0, 0] == 0.0
+    expected = np.zeros((8, 8), dtype=bool)
+    expected[0, 1:3] = expected[7, 7] = True
+    np.testing.assert_array_equal(np.isnan(decoded), expected)
+    np.testing.assert_allclose(decoded[0, 3:], 1234.5, atol=0.1)
+
+
+@pytest.fixture
+def pyramid(dem_path, tmp_path):
+    out = tmp_path / "terrain.mbtiles"
+    export_mbtiles(dem_path, str(out), 12, 12, tilesize=256, workers=1)
+    pyr = TilePyramid(str(out))
+    yield pyr
+    pyr.close()
+
+
+def test_mosaic_is_nan_off_the_pyramid_bounds(dem, dem_path, pyramid):
+    assert pyramid.bounds == pytest.approx(dem_bounds_4326(dem_path), abs=1e-6)
+    left, bottom, right, top = dem.bounds
+    lng, lat = Transformer.from_crs(dem.crs, "EPSG:4326", always_xy=True).transform(
+        [left - 3_000, right + 3_000], [bottom - 3_000, top + 3_000]
+    )
+    mosaic = pyramid.read((lng[0], lat[0], lng[1], lat[1]))
+
+    h, w = mosaic.shape
+    rows, cols = np.mgrid[0:h, 0:w]
+    x, y = Transformer.from_crs(mosaic.crs, dem.crs, always_xy=True).transform(
+        *(mosaic.transform * (cols + 0.5, rows + 0.5))
+    )
+    res = abs(dem.transform.a)
+    inside = (x > left + 2 * res) & (x < right - 2 * res) & (y > bottom + 2 * res) & (y < top - 2 * res)
+    assert inside.any() and np.isfinite(mosaic.data[inside]).all()
+    # Past the metadata bounds: NaN. Off the DEM but inside them (the UTM
+    # footprint is skewed in lng/lat): rendered as sea level, never a pit.
+    lng, lat = Transformer.from_crs(mosaic.crs, "EPSG:4326", always_xy=True).transform(
+        *(mosaic.transform * (cols + 0.5, rows + 0.5))
+    )
+    west, south, east, north = pyramid.bounds
+    margin = 2 * res / 111_000
+    beyond = (lng < west - margin) | (lng > east + margin) | (lat < south - margin) | (lat > north + margin)
+    within = (lng > west + margin) & (lng < east - margin) & (lat > south + margin) & (lat < north - margin)
+    off_dem = within & ((x < left - res) | (x > right + res) | (y < bottom - res) | (y > top + res))
+    assert beyond.any() and off_dem.any()
+    assert np.isnan(mosaic.data[beyond]).all()
+    assert (mosaic.data[off_dem] == 0.0).all()
+    values = mosaic.data[inside]
+    assert values.min() >= np.nanmin(dem.data) - 50 and values.max() <= np.nanmax(dem.data) + 50
+
+
+def test_directory_pyramid_uses_metadata_bounds(dem, pyramid, tmp_path):
+    root = tmp_path / "xyz"
+    reader = pyramid._mbtiles
+    for z, x, y in pyramid_tiles(pyramid.bounds, 12, 12):
+        body = reader.get(z, x, y)
+        if body is not None:
+            os.makedirs(root / str(z) / str(x), exist_ok=True)
+            (root / str(z) / str(x) / f"{y}.png").write_bytes(body)
+    west, south, east, north = pyramid.bounds
+    inner = (west + (east - west) / 4, south, east, north)
+    (root / "metadata.json").write_text(json.dumps({"bounds": list(inner)}))
+
+    xyz = TilePyramid(str(root))
+    assert xyz.bounds == inner
+    full = pyramid.read(pyramid.bounds)
+    cut = xyz.read(pyramid.bounds)
+    assert full.transform == cut.transform
+    x = full.transform.c + (np.arange(full.shape[1]) + 0.5) * full.transform.a
+    kept = x > Transformer.from_crs("EPSG:4326", "EPSG:3857", always_xy=True).transform(inner[0], north)[0]
+    np.testing.assert_array_equal(cut.data[:, kept], full.data[:, kept])
+    assert np.isnan(cut.data[:, ~kept]).all()
+
+
+
+def test_open_reprojects_through_one_shared_pyramid(dem, pyramid):
+    left, bottom, right, top = dem.bounds
+    bounds = (left + 600, bottom + 600, right - 600, top - 600)
+    shared = shared_pyramid(pyramid.source)
+    assert shared_pyramid(os.path.relpath(pyramid.source)) is shared
+
+    metric = Dem.open(pyramid.source, bounds=bounds, crs=dem.crs)
+    assert metric.crs == dem.crs and metric.is_metric
+    assert metric.bounds == pytest.approx(bounds, abs=2 * metric.res[0])
+    misses = shared.misses
+    Dem.open(pyramid.source, bounds=bounds, crs=dem.crs)
+    assert shared.misses == misses and shared.hits > 0
+
+    xy = cell_centres(dem, [40, 80, 120], [45, 95, 120])
+    np.testing.assert_allclose(metric.sample(*xy.T), dem.sample(*xy.T), atol=25)
+
+    to_3857 = Transformer.from_crs(dem.crs, "EPSG:3857", always_xy=True)
+    mercator = Dem.open(pyramid.source, bounds=to_3857.transform_bounds(*bounds))
+    assert not mercator.is_metric
+    with pytest.raises(ValueError):
+        line_of_sight(mercator, to_3857.transform(*xy[0]), np.column_stack(to_3857.transform(*xy.T)))
+    with pytest.raises(ValueError):
+        Dem.open(write_dem(os.path.join(os.path.dirname(pyramid.source), "utm.tif"), dem), crs="EPSG:3857")
+
+
+def mask_at(vs, xy):
+    cols, rows = ~vs.transform * tuple(xy.T)
+    return vs.mask[rows.astype(int), cols.astype(int)]
+
+
+def test_viewshed_from_a_pyramid_needs_a_metric_crs(dem, pyramid):
+    observer = tuple(cell_centres(dem, 80, 60)[0])
+    want = viewshed(dem, observer, 1_500)
+    got = viewshed_from_file(pyramid.source, observer, 1_500, crs=dem.crs)
+    assert got.crs == dem.crs
+
+    rows, cols = np.mgrid[40:121:2, 10:111:2].reshape(2, -1)
+    xy = cell_centres(dem, rows, cols)
+    xy = xy[np.hypot(*(xy - observer).T) <= 1_400]
+    assert (mask_at(got, xy) == mask_at(want, xy)).mean() > 0.85
+
+    with pytest.raises(ValueError):
+        viewshed_from_file(pyramid.source, observer, 1_500)
@@ -0,0 +1,61 @@
+import pytest
+from starlette.testclient import TestClient
+
+from los_module import tile_server
+from los_module.tile_server import TerrainTileService, app_from_env, create_app
+
+from .test_tiles import centre_tile
+
+
+@pytest.fixture
+def client(dem_path):
+    service = TerrainTileService(dem_path, tilesize=256)
+    with TestClient(create_app(service, concurrency=2)) as client:
+        yield client
+
+
+def test_serves_tiles_with_etags(dem, client):
+    z, x, y = centre_tile(dem, 13)
+    first = client.get(f"/tiles/{z}/{x}/{y}.png")
+    assert first.status_code == 200
+    assert first.headers["content-type"] == "image/png"
+    assert first.headers["access-control-allow-origin"] == "*"
+
+    again = client.get(f"/tiles/{z}/{x}/{y}.png", headers={"If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304
+    assert client.get(f"/tiles/{z}/{x}/{y}.webp").status_code == 404
+    for bad in (f"/tiles/{z}/{x}/y.png", f"/tiles/{z}/-{x}/{y}.png", f"/tiles/z/{x}/{y}.png"):
+        assert client.get(bad).status_code == 404
+
+    metrics = client.get("/metrics").json()
+    assert metrics["served"] == 2 and metrics["rendered"] == 1
+    assert metrics["cache"] == {"tiles": 1, "bytes": len(first.content), "hits": 1, "misses": 1}
+    assert metrics["concurrency"] == 2 and metrics["in_flight"] == 0
+
+
+def test_seeded_workers_serve_from_cache(dem, dem_path, monkeypatch):
+    from pyproj import Transformer
+
+    left, bottom, right, top = dem.bounds
+    lng, lat = Transformer.from_crs(dem.crs, "EPSG:4326", always_xy=True).transform(
+        [left + 1_000, right - 1_000], [bottom + 1_000, top - 1_000]
+    )
+    runs = []
+    monkeypatch.setattr("uvicorn.run", lambda *args, **kwargs: runs.append(kwargs))
+    argv = [dem_path, "--tilesize", "256", "--seed-bounds", str(lng[0]), str(lat[0]), str(lng[1]), str(lat[1])]
+    # main() configures the workers through the environment; undo that afterwards.
+    for name in ("SOURCE", "SIZE", "CONCURRENCY", "CACHE_MB", "RESAMPLING", "ENCODER", "SEED"):
+        monkeypatch.setenv(f"LOS_TILE_{name}", "")
+    tile_server.main([*argv, "--seed-zooms", "13", "13"])
+    assert runs and runs[0]["factory"]
+
+    z, x, y = centre_tile(dem, 13)
+    with TestClient(app_from_env()) as client:
+        assert client.get("/metrics").json()["cache"]["tiles"] > 0
+        assert client.get(f"/tiles/{z}/{x}/{y}.png").status_code == 200
+        assert client.get("/metrics").json()["rendered"] == 0
+
+    tile_server.main([dem_path])
+    assert "LOS_TILE_SEED" not in tile_server.os.environ
+    with pytest.raises(SystemExit):
+        tile_server.main(["terrain.mbtiles", *argv[3:]])
@@ -0,0 +1,91 @@
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from los_module.tiles import (
+    ENCODERS,
+    TileCache,
+    blank_tile,
+    elevation_to_terrain_rgb,
+    encode_tile,
+    etag,
+    terrain_rgb_to_elevation,
+)
+from los_module.tile_server import TerrainTileService
+
+
+def centre_tile(dem, zoom):
+    """(z, x, y) of the Web-Mercator tile holding the DEM centre."""
+    import morecantile
+    from pyproj import Transformer
+
+    left, bottom, right, top = dem.bounds
+    lng, lat = Transformer.from_crs(dem.crs, "EPSG:4326", always_xy=True).transform(
+        (left + right) / 2, (bottom + top) / 2
+    )
+    t = morecantile.tms.get("WebMercatorQuad").tile(lng, lat, zoom)
+    return t.z, t.x, t.y
+
+
+def test_tile_cache_evicts_least_recently_used_by_bytes():
+    cache = TileCache(max_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    assert cache.get("a") == (b"aaaa", etag(b"aaaa"))
+    cache.put("c", b"cccc")
+    assert "b" not in cache and "a" in cache and "c" in cache
+    assert cache.nbytes == 8
+    # Larger than the whole budget: returned but never stored.
+    body, tag = cache.put("d", b"d" * 11)
+    assert tag == etag(b"d" * 11) and "d" not in cache
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_service_renders_once_then_serves_from_cache(dem, dem_path):
+    service = TerrainTileService(dem_path, tilesize=256)
+    try:
+        z, x, y = centre_tile(dem, 13)
+        assert service.lookup(z, x, y) is None
+        body, tag = service.tile(z, x, y)
+        assert service.tile(z, x, y) == (body, tag)
+        assert service.cache.hits == 1
+
+        elev = service.renderer.elevation(z, x, y)
+        inside = np.isfinite(elev) & (elev != 0)
+        assert inside.any()
+        assert elev[inside].min() >= float(np.nanmin(dem.data)) - 50
+        assert elev[inside].max() <= float(np.nanmax(dem.data)) + 50
+
+        # Far off the DEM: the flat sea-level tile.
+        assert service.tile(z, 0, 0)[0] == blank_tile(256, "png")
+    finally:
+        service.close()
+
+
+def test_unknown_encoder_is_rejected(dem_path):
+    with pytest.raises(ValueError):
+        TerrainTileService(dem_path, encoder="jpeg")
+
+
+def decode_image(body):
+    with Image.open(BytesIO(body)) as img:
+        return np.moveaxis(np.asarray(img.convert("RGB")), -1, 0)
+
+
+@pytest.mark.parametrize("encoder", sorted(ENCODERS))
+def test_encoders_are_lossless(encoder):
+    rng = np.random.default_rng(0)
+    elev = rng.uniform(-50.0, 4800.0, (64, 64))
+    rgb = elevation_to_terrain_rgb(elev)
+    assert np.array_equal(decode_image(encode_tile(rgb, encoder)), rgb)
+    # Terrain-RGB itself truncates to 0.1 m steps.
+    decoded = terrain_rgb_to_elevation(rgb)
+    assert np.all((elev - decoded >= -1e-3) & (elev - decoded < 0.1 + 1e-3))
+
+
+def test_blank_tile_is_sea_level():
+    elev = terrain_rgb_to_elevation(decode_image(blank_tile(64, "webp")))
+    assert elev.shape == (64, 64) and np.all(elev == 0.0)
+    assert blank_tile(64, "webp") is blank_tile(64, "webp")
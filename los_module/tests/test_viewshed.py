@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from los_module.los import line_of_sight
+from los_module.viewshed import viewshed, viewshed_from_file
+
+from .conftest import cell_centres
+
+
+def los_mask(dem, vs, radius):
+    """Per-cell LOS from the viewshed's observer for every cell inside ``radius``."""
+    h, w = vs.mask.shape
+    rows, cols = np.mgrid[0:h, 0:w]
+    x, y = vs.transform * (cols.ravel() + 0.5, rows.ravel() + 0.5)
+    d = np.hypot(x - vs.observer[0], y - vs.observer[1])
+    inside = (d > 0) & (d <= radius)
+    res = line_of_sight(dem, vs.observer, np.column_stack([x[inside], y[inside]]))
+    return vs.mask.ravel()[inside], res.visible
+
+
+def test_agrees_with_per_cell_los(dem):
+    vs = viewshed(dem, tuple(cell_centres(dem, 80, 60)[0]), 2_000)
+    swept, los = los_mask(dem, vs, 2_000)
+    assert 0.1 < los.mean() < 0.9
+    assert (swept == los).mean() > 0.97
+
+
+def test_window_clipped_at_dem_edge(dem):
+    vs = viewshed(dem, tuple(cell_centres(dem, 3, 150)[0]), 1_500)
+    assert vs.mask.shape[0] < 2 * 50 and vs.mask.shape[1] < 2 * 50
+    swept, los = los_mask(dem, vs, 1_500)
+    assert (swept == los).mean() > 0.97
+
+
+def test_off_dem_observer_raises_value_error(dem):
+    left, bottom, _, _ = dem.bounds
+    # Inside the radius of the raster edge, then far beyond it (empty window).
+    for observer in [(left - 100.0, bottom + 100.0), (left - 50_000.0, bottom - 50_000.0)]:
+        with pytest.raises(ValueError):
+            viewshed(dem, observer, 2_000)
+
+
+def test_from_file_reads_only_the_radius_window(dem, dem_path):
+    observer = tuple(cell_centres(dem, 80, 60)[0])
+    full = viewshed(dem, observer, 1_200)
+    windowed = viewshed_from_file(dem_path, observer, 1_200)
+    assert windowed.bounds == full.bounds
+    np.testing.assert_array_equal(windowed.mask, full.mask)
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from pyproj import Transformer
+
+from los_module.los import line_of_sight
+from los_module.route import geodesic_chainage
+from los_module.visibility_index import RouteVisibilityIndex, build_route_index
+
+from .conftest import cell_centres
+
+
+def to_lnglat(dem, xy):
+    lng, lat = Transformer.from_crs(dem.crs, "EPSG:4326", always_xy=True).transform(xy[:, 0], xy[:, 1])
+    return np.asarray(lng), np.asarray(lat)
+
+
+@pytest.fixture
+def route(dem):
+    # A zig-zag across the ridge and past both hills.
+    corners = cell_centres(dem, [150, 100, 60, 20, 10], [10, 40, 150, 110, 20])
+    return to_lnglat(dem, corners)
+
+
+def test_intervals_match_los_at_great_circle_chainage(dem, route, tmp_path):
+    stations = to_lnglat(dem, cell_centres(dem, [60, 120], [95, 60]))
+    index = build_route_index(dem, route, (["ridge", "valley"], *stations), max_range=4_000)
+    assert index.route_length == pytest.approx(geodesic_chainage(*route)[-1])
+
+    # Dense route points with their great-circle chainage.
+    lng, lat = route
+    ch = geodesic_chainage(lng, lat)
+    at = np.linspace(0, ch[-1], 2_000)
+    lng, lat = np.interp(at, ch, lng), np.interp(at, ch, lat)
+    x, y = dem.lnglat_to_xy(lng, lat)
+    for i, (sx, sy) in enumerate(zip(*dem.lnglat_to_xy(*stations))):
+        res = line_of_sight(dem, (sx, sy), np.column_stack([x, y]), target_height=1.7)
+        los = res.visible & (np.hypot(x - sx, y - sy) <= 4_000)
+        assert (index.visible(i, at) == los).mean() > 0.97
+
+    saved = tmp_path / "index.json"
+    index.save(saved)
+    loaded = RouteVisibilityIndex.load(saved)
+    assert loaded.names == ["ridge", "valley"]
+    np.testing.assert_allclose(loaded.starts[0], index.starts[0], atol=0.05)
+
+
+def test_station_lookup_accepts_numpy_integers():
+    index = RouteVisibilityIndex(["a", "b"], [[0.0], [100.0, 500.0]], [[50.0], [200.0, 600.0]], 1_000.0)
+    c = np.array([25.0, 75.0, 150.0, 550.0, 700.0])
+    assert index.visible(np.int64(1), c).tolist() == [False, False, True, True, False]
+    assert index.visible("a", c).tolist() == index.visible(np.intp(0), c).tolist()
+    assert index.stations_seeing(550.0) == ["b"]
@@ -0,0 +1,244 @@
+"""DEM backed by a terrain-RGB tile pyramid (the tiles the spectator app renders).
+
+A pyramid is an MBTiles archive (see ``pyramid``) or a ``{z}/{x}/{y}.png|webp``
+directory. Tiles are decoded on demand into float32 and kept in an LRU, then
+stitched into a Web-Mercator mosaic covering only the requested bounds::
+
+    pyr = TilePyramid("terrain.mbtiles")
+    dem = pyr.read(lnglat_bounds)                # EPSG:3857, exact tile values
+    dem = pyr.read(lnglat_bounds, crs="EPSG:25832")  # metric, for LOS / viewshed
+
+``Dem.open`` accepts a pyramid path too, through one ``shared_pyramid`` per
+file, with ``bounds`` in EPSG:3857 or in its ``crs=``. Missing tiles,
+transparent pixels, heights at or below ``tiles.NODATA_MAX`` and pixels
+outside the pyramid's metadata bounds read as NaN. Web-Mercator units are not
+ground metres (x1.43 at 45.8 N), so the LOS and viewshed kernels refuse them;
+run those on a metric reprojection (``crs=`` or ``Dem.to_crs``).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from io import BytesIO
+
+import numpy as np
+from affine import Affine
+
+from .dem import Dem
+from .tiles import NODATA_MAX, terrain_rgb_to_elevation
+
+# Half the Web-Mercator world width (EPSG:3857 metres).
+ORIGIN_SHIFT = 20037508.342789244
+_TILE_EXTS = (".png", ".webp")
+
+
+def is_pyramid(path):
+    """Whether ``path`` is an MBTiles archive or a z/x/y tile directory.
+
+    A directory counts only if it holds a ``metadata.json`` (as written by
+    ``mb-util``) or at least one ``{z}/{x}/{y}.png|webp`` tile.
+    """
+    if str(path).endswith(".mbtiles"):
+        return True
+    if not os.path.isdir(path):
+        return False
+    return os.path.isfile(os.path.join(path, "metadata.json")) or _find_tile(path) is not None
+
+
+def shared_pyramid(source, zoom=None):
+    """Process-wide ``TilePyramid`` for ``source`` at ``zoom``, so its decoded-tile LRU is reused.
+
+    Shared instances are never closed; do not call ``close`` on them.
+    """
+    return _shared_pyramid(os.path.abspath(source), zoom)
+
+
+@lru_cache(maxsize=None)
+def _shared_pyramid(source, zoom):
+    return TilePyramid(source, zoom)
+
+
+class TilePyramid:
+    """Decoded-tile access to a terrain-RGB pyramid at one zoom level.
+
+    ``zoom`` defaults to the deepest level present; ``max_tiles`` bounds the
+    LRU of decoded float32 tiles (512 px tiles are 1 MiB each).
+    """
+
+    def __init__(self, source, zoom=None, max_tiles=256):
+        self.source = os.path.abspath(source)
+        self.max_tiles = max_tiles
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+        if self.source.endswith(".mbtiles"):
+            from .pyramid import MBTilesReader
+
+            self._mbtiles = MBTilesReader(self.source)
+            meta = self._mbtiles.metadata
+            self.zoom = int(zoom if zoom is not None else meta["maxzoom"])
+            self._size = int(meta.get("tileSize", 0)) or None
+        else:
+            self._mbtiles = None
+            levels = [int(d) for d in os.listdir(self.source) if d.isdigit()]
+            if not levels:
+                raise ValueError(f"{source} has no z/x/y tile levels")
+            self.zoom = int(zoom if zoom is not None else max(levels))
+            self._size = None
+            meta = {}
+            meta_path = os.path.join(self.source, "metadata.json")
+            if os.path.isfile(meta_path):
+                with open(meta_path, encoding="utf-8") as f:
+                    meta = json.load(f)
+        self.bounds = _parse_bounds(meta.get("bounds"))
+
+    @property
+    def tilesize(self):
+        """Tile width in pixels (read from metadata or the first tile)."""
+        if self._size is None:
+            self._size = _decode(self._first_body()).shape[0]
+        return self._size
+
+    @property
+    def res(self):
+        """Pixel size in EPSG:3857 units at ``zoom``."""
+        return 2 * ORIGIN_SHIFT / (self.tilesize << self.zoom)
+
+    def tile(self, x, y):
+        """Decoded elevation of tile (zoom, x, y), or None if the pyramid lacks it."""
+        key = (self.zoom, x, y)
+        with self._lock:
+            if key in self._tiles:
+                self._tiles.move_to_end(key)
+                self.hits += 1
+                return self._tiles[key]
+        body = self._body(x, y)
+        elev = None if body is None else _decode(body)
+        with self._lock:
+            self.misses += 1
+            self._tiles[key] = elev
+            while len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+        return elev
+
+    def read(self, bounds, crs=None, res=None):
+        """Dem covering lng/lat ``bounds`` (w, s, e, n).
+
+        Without ``crs`` the mosaic stays in EPSG:3857 with the decoded tile
+        values untouched; with ``crs`` it is reprojected (bilinear) at ``res``
+        or about the tiles' ground resolution.
+        """
+        from rasterio.warp import transform_bounds
+
+        dem = self.mosaic(transform_bounds("EPSG:4326", "EPSG:3857", *bounds, densify_pts=21))
+        return dem if crs is None else dem.to_crs(crs, res)
+
+    def mosaic(self, bounds):
+        """Dem (EPSG:3857) of the tile pixels covering ``bounds`` in EPSG:3857 metres.
+
+        Pixels outside the pyramid's lng/lat ``bounds`` (when its metadata has
+        them) are NaN, like pixels of missing tiles.
+        """
+        from rasterio.crs import CRS
+        from rasterio.warp import transform_bounds
+
+        ts, res = self.tilesize, self.res
+        n = 1 << self.zoom
+        left, bottom, right, top = bounds
+        # Global pixel window, clipped to the world.
+        c0 = max(int(np.floor((left + ORIGIN_SHIFT) / res)), 0)
+        c1 = min(int(np.ceil((right + ORIGIN_SHIFT) / res)), n * ts)
+        r0 = max(int(np.floor((ORIGIN_SHIFT - top) / res)), 0)
+        r1 = min(int(np.ceil((ORIGIN_SHIFT - bottom) / res)), n * ts)
+        if c1 <= c0 or r1 <= r0:
+            raise ValueError("bounds do not intersect the tile pyramid")
+
+        data = np.full((r1 - r0, c1 - c0), np.nan, dtype=np.float32)
+        for ty in range(r0 // ts, (r1 - 1) // ts + 1):
+            for tx in range(c0 // ts, (c1 - 1) // ts + 1):
+                elev = self.tile(tx, ty)
+                if elev is None:
+                    continue
+                # Overlap of this tile with the window, in global pixels.
+                gr0, gr1 = max(ty * ts, r0), min((ty + 1) * ts, r1)
+                gc0, gc1 = max(tx * ts, c0), min((tx + 1) * ts, c1)
+                data[gr0 - r0:gr1 - r0, gc0 - c0:gc1 - c0] = elev[
+                    gr0 - ty * ts:gr1 - ty * ts, gc0 - tx * ts:gc1 - tx * ts
+                ]
+        if self.bounds is not None:
+            # Edge tiles are rendered past the data; cut them back to the extent.
+            west, south, east, north = transform_bounds("EPSG:4326", "EPSG:3857", *self.bounds, densify_pts=21)
+            x = (np.arange(c0, c1) + 0.5) * res - ORIGIN_SHIFT
+            y = ORIGIN_SHIFT - (np.arange(r0, r1) + 0.5) * res
+            data[(y < south) | (y > north)] = np.nan
+            data[:, (x < west) | (x > east)] = np.nan
+        transform = Affine(res, 0.0, c0 * res - ORIGIN_SHIFT, 0.0, -res, ORIGIN_SHIFT - r0 * res)
+        return Dem(data, transform, CRS.from_epsg(3857), float("nan"), None)
+
+    def close(self):
+        if self._mbtiles is not None:
+            self._mbtiles.close()
+
+    def _body(self, x, y):
+        if self._mbtiles is not None:
+            return self._mbtiles.get(self.zoom, x, y)
+        for ext in _TILE_EXTS:
+            path = os.path.join(self.source, str(self.zoom), str(x), f"{y}{ext}")
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    return f.read()
+        return None
+
+    def _first_body(self):
+        if self._mbtiles is not None:
+            body = self._mbtiles.first(self.zoom)
+            if body is None:
+                raise ValueError(f"{self.source} has no tiles at zoom {self.zoom}")
+            return body
+        path = _find_tile(self.source, [self.zoom])
+        if path is None:
+            raise ValueError(f"{self.source} has no tiles at zoom {self.zoom}")
+        with open(path, "rb") as f:
+            return f.read()
+
+
+def _find_tile(root, zooms=None):
+    """Path of the first ``{z}/{x}/{y}.png|webp`` tile under ``root`` (at ``zooms``), or None."""
+    for z in _numeric_dirs(root) if zooms is None else map(str, zooms):
+        level = os.path.join(root, z)
+        for x in _numeric_dirs(level):
+            for name in os.listdir(os.path.join(level, x)):
+                stem, ext = os.path.splitext(name)
+                if stem.isdigit() and ext in _TILE_EXTS:
+                    return os.path.join(level, x, name)
+    return None
+
+
+def _numeric_dirs(path):
+    if not os.path.isdir(path):
+        return []
+    return sorted((d for d in os.listdir(path) if d.isdigit() and os.path.isdir(os.path.join(path, d))), key=int)
+
+
+def _parse_bounds(value):
+    """(w, s, e, n) from MBTiles/TileJSON ``bounds`` ("w,s,e,n" or a list), or None."""
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = value.split(",")
+    return tuple(float(v) for v in value)
+
+
+def _decode(body):
+    """Elevation of a terrain-RGB tile; nodata and transparent pixels are NaN."""
+    from PIL import Image
+
+    with Image.open(BytesIO(body)) as img:
+        rgba = np.asarray(img.convert("RGBA"))
+    elev = terrain_rgb_to_elevation(np.moveaxis(rgba[..., :3], -1, 0))
+    elev[(elev <= NODATA_MAX) | (rgba[..., 3] == 0)] = np.nan
+    return elev
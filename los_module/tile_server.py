@@ -0,0 +1,270 @@
+"""Local terrain-RGB tile server (Starlette) with an encoded-tile cache.
+
+Standalone, with several worker processes::
+
+    python -m los_module.tile_server DEM_4326_smooth.tif --workers 4 --concurrency 8
+
+``--seed-bounds W S E N`` (with ``--seed-zooms MIN MAX``) pre-renders the
+tiles over a route into every worker's cache before it starts serving.
+Cache hits are answered on the event loop; misses are rendered in a thread
+pool capped at ``--concurrency`` renders per worker. ``/metrics`` reports
+queue depth, cache counters and per-tile latency for the worker that
+answers it.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from .tiles import ENCODERS, TerrainTileRenderer, TileCache, blank_tile
+
+TILE_ROUTE = "/tiles/{z:int}/{x:int}/{y:int}.{ext}"
+CORS = {"Access-Control-Allow-Origin": "*"}
+DEFAULT_CONCURRENCY = 8
+
+
+class TerrainTileService:
+    """Serves cached terrain-RGB tiles for one DEM."""
+
+    def __init__(
+        self, dem_path, tilesize=512, cache_bytes=128 * 2**20, resampling="cubic_spline", encoder="png"
+    ):
+        self.tilesize = tilesize
+        self.encoder = encoder
+        self.renderer = TerrainTileRenderer(dem_path, tilesize, resampling, encoder)
+        self.cache = TileCache(cache_bytes)
+
+    def lookup(self, z, x, y):
+        """Cached (body, etag) or None; never renders."""
+        return self.cache.get((z, x, y, self.tilesize))
+
+    def fill(self, z, x, y):
+        """Render tile z/x/y and store it -> (body, etag). Blocking."""
+        from rio_tiler.errors import TileOutsideBounds
+
+        try:
+            body = self.renderer.render(z, x, y)
+        except TileOutsideBounds:
+            # Tile outside DEM extent — flat sea-level tile
+            body = blank_tile(self.tilesize, self.encoder)
+        return self.cache.put((z, x, y, self.tilesize), body)
+
+    def tile(self, z, x, y):
+        """(body, etag) for tile z/x/y, rendering on a cache miss."""
+        return self.lookup(z, x, y) or self.fill(z, x, y)
+
+    def seed(self, bounds, minzoom, maxzoom):
+        """Pre-render every tile covering lng/lat ``bounds`` (w, s, e, n) for the zoom range."""
+        import morecantile
+
+        tms = morecantile.tms.get("WebMercatorQuad")
+        n = 0
+        for t in tms.tiles(*bounds, zooms=list(range(minzoom, maxzoom + 1))):
+            self.tile(t.z, t.x, t.y)
+            n += 1
+        return n
+
+    def close(self):
+        self.renderer.close()
+
+
+class MBTilesService:
+    """Serves tiles straight from a pre-rendered MBTiles pyramid (see ``pyramid``)."""
+
+    def __init__(self, path, cache_bytes=32 * 2**20):
+        from .pyramid import MBTilesReader
+
+        self.reader = MBTilesReader(path)
+        self.tilesize = int(self.reader.metadata.get("tileSize", 512))
+        self.encoder = self.reader.metadata.get("format", "png")
+        self.cache = TileCache(cache_bytes)
+
+    def lookup(self, z, x, y):
+        return self.cache.get((z, x, y, self.tilesize))
+
+    def fill(self, z, x, y):
+        body = self.reader.get(z, x, y)
+        return self.cache.put(
+            (z, x, y, self.tilesize),
+            body if body is not None else blank_tile(self.tilesize, self.encoder),
+        )
+
+    def tile(self, z, x, y):
+        return self.lookup(z, x, y) or self.fill(z, x, y)
+
+    def close(self):
+        self.reader.close()
+
+
+class TileMetrics:
+    """Rolling per-tile latency and request counters for one server process."""
+
+    def __init__(self, window=4096):
+        self.latency_ms = deque(maxlen=window)
+        self.render_ms = deque(maxlen=window)
+        self.served = 0
+        self.rendered = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency_ms, render_ms=None):
+        with self._lock:
+            self.served += 1
+            self.latency_ms.append(latency_ms)
+            if render_ms is not None:
+                self.rendered += 1
+                self.render_ms.append(render_ms)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "served": self.served,
+                "rendered": self.rendered,
+                "latency_ms": _percentiles(self.latency_ms),
+                "render_ms": _percentiles(self.render_ms),
+            }
+
+
+def _percentiles(values):
+    if not values:
+        return {}
+    p50, p90, p99 = np.percentile(np.fromiter(values, np.float64), [50, 90, 99])
+    return {"p50": round(p50, 2), "p90": round(p90, 2), "p99": round(p99, 2), "max": round(max(values), 2)}
+
+
+def create_app(service, concurrency=DEFAULT_CONCURRENCY):
+    """Starlette app serving ``service`` tiles with ETag / If-None-Match support.
+
+    Renders run in worker threads, at most ``concurrency`` at a time.
+    """
+    import anyio
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse, Response
+    from starlette.routing import Route
+
+    limiter = None
+    metrics = TileMetrics()
+    _, _, media_type, ext = ENCODERS[service.encoder]
+
+    async def tile_handler(request):
+        nonlocal limiter
+        if limiter is None:
+            limiter = anyio.CapacityLimiter(concurrency)
+        start = time.perf_counter()
+        if request.path_params["ext"] != ext:
+            return Response(status_code=404, headers=CORS)
+        z, x, y = (request.path_params[k] for k in ("z", "x", "y"))
+        entry = service.lookup(z, x, y)
+        render_ms = None
+        if entry is None:
+            entry = await anyio.to_thread.run_sync(service.fill, z, x, y, limiter=limiter)
+            render_ms = (time.perf_counter() - start) * 1000
+        body, tag = entry
+        headers = {**CORS, "ETag": tag, "Cache-Control": "public, max-age=3600"}
+        metrics.record((time.perf_counter() - start) * 1000, render_ms)
+        if request.headers.get("if-none-match") == tag:
+            return Response(status_code=304, headers=headers)
+        return Response(body, media_type=media_type, headers=headers)
+
+    async def metrics_handler(request):
+        stats = limiter.statistics() if limiter is not None else None
+        cache = service.cache
+        return JSONResponse({
+            "pid": os.getpid(),
+            "concurrency": concurrency,
+            "in_flight": stats.borrowed_tokens if stats else 0,
+            "queue_depth": stats.tasks_waiting if stats else 0,
+            "cache": {"tiles": len(cache), "bytes": cache.nbytes, "hits": cache.hits, "misses": cache.misses},
+            **metrics.snapshot(),
+        }, headers=CORS)
+
+    return Starlette(
+        routes=[Route(TILE_ROUTE, tile_handler), Route("/metrics", metrics_handler)],
+        on_shutdown=[service.close],
+    )
+
+
+def serve_in_thread(app, host="127.0.0.1", port=8765):
+    """Run ``app`` under uvicorn in a daemon thread (notebook use)."""
+    import uvicorn
+
+    thread = threading.Thread(
+        target=uvicorn.run,
+        args=(app,),
+        kwargs={"host": host, "port": port, "log_level": "warning"},
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+def app_from_env():
+    """uvicorn factory for multi-worker runs; configured through ``LOS_TILE_*`` variables."""
+    source = os.environ["LOS_TILE_SOURCE"]
+    cache_bytes = int(os.environ.get("LOS_TILE_CACHE_MB", "128")) * 2**20
+    if source.endswith(".mbtiles"):
+        service = MBTilesService(source, cache_bytes=cache_bytes)
+    else:
+        service = TerrainTileService(
+            source,
+            tilesize=int(os.environ.get("LOS_TILE_SIZE", "512")),
+            cache_bytes=cache_bytes,
+            resampling=os.environ.get("LOS_TILE_RESAMPLING", "cubic_spline"),
+            encoder=os.environ.get("LOS_TILE_ENCODER", "png"),
+        )
+        seed = os.environ.get("LOS_TILE_SEED")
+        if seed:
+            *bounds, minzoom, maxzoom = map(float, seed.split(","))
+            service.seed(bounds, int(minzoom), int(maxzoom))
+    return create_app(service, int(os.environ.get("LOS_TILE_CONCURRENCY", DEFAULT_CONCURRENCY)))
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve terrain-RGB tiles from a DEM or MBTiles pyramid.")
+    parser.add_argument("source", help="DEM GeoTIFF or .mbtiles archive")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="max concurrent renders per worker")
+    parser.add_argument("--tilesize", type=int, default=512)
+    parser.add_argument("--cache-mb", type=int, default=128)
+    parser.add_argument("--resampling", default="cubic_spline")
+    parser.add_argument("--encoder", choices=sorted(ENCODERS), default="png")
+    parser.add_argument("--seed-bounds", type=float, nargs=4, metavar=("W", "S", "E", "N"),
+                        help="pre-render the DEM tiles over these lng/lat bounds before serving")
+    parser.add_argument("--seed-zooms", type=int, nargs=2, metavar=("MIN", "MAX"), default=(8, 14))
+    args = parser.parse_args(argv)
+    if args.seed_bounds and args.source.endswith(".mbtiles"):
+        parser.error("--seed-bounds renders DEM tiles; an MBTiles pyramid is already rendered")
+
+    os.environ.pop("LOS_TILE_SEED", None)
+    if args.seed_bounds:
+        os.environ["LOS_TILE_SEED"] = ",".join(map(str, [*args.seed_bounds, *args.seed_zooms]))
+    os.environ.update({
+        "LOS_TILE_SOURCE": os.path.abspath(args.source),
+        "LOS_TILE_SIZE": str(args.tilesize),
+        "LOS_TILE_CONCURRENCY": str(args.concurrency),
+        "LOS_TILE_CACHE_MB": str(args.cache_mb),
+        "LOS_TILE_RESAMPLING": args.resampling,
+        "LOS_TILE_ENCODER": args.encoder,
+    })
+    uvicorn.run(
+        "los_module.tile_server:app_from_env",
+        factory=True,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level="warning",
+    )
+
+
+if __name__ == "__main__":
+    main()
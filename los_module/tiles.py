@@ -0,0 +1,175 @@
+"""Terrain-RGB tile rendering and an encoded-tile cache."""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from io import BytesIO
+
+import numpy as np
+
+# Flat sea-level colour: -10000 + (1*65536 + 134*256 + 160) * 0.1 == 0 m.
+# Also written for nodata cells: anything lower shows up as a pit in the 3D
+# view, and canvas decoding premultiplies alpha, so a transparent pixel would
+# read back as (0, 0, 0) == -10000 m.
+SEA_LEVEL_RGB = (1, 134, 160)
+# Decoders treat heights at or below this as nodata: the (0, 0, 0) triplet
+# and -9999 fills rendered as terrain by other tools.
+NODATA_MAX = -9999.0
+
+# name -> (PIL format, save options, media type, file extension). All lossless:
+# terrain-RGB tiles are data, any colour loss is an elevation error.
+ENCODERS = {
+    "png": ("PNG", {}, "image/png", "png"),
+    "png-fast": ("PNG", {"compress_level": 1}, "image/png", "png"),
+    "webp": ("WEBP", {"lossless": True, "quality": 25, "method": 1}, "image/webp", "webp"),
+}
+
+
+def elevation_to_terrain_rgb(elev):
+    """Encode elevation (metres) -> Mapbox terrain-RGB (3 x uint8); NaN -> ``SEA_LEVEL_RGB``."""
+    elev = np.asarray(elev, dtype=np.float64)
+    v = np.where(np.isfinite(elev), (elev + 10000.0) / 0.1, 100000.0).clip(0, 256**3 - 1).astype(np.uint32)
+    r = ((v >> 16) & 0xFF).astype(np.uint8)
+    g = ((v >> 8) & 0xFF).astype(np.uint8)
+    b = (v & 0xFF).astype(np.uint8)
+    return np.stack([r, g, b], axis=0)
+
+
+def terrain_rgb_to_elevation(rgb):
+    """Decode Mapbox terrain-RGB (3 x uint8, channels first) -> float32 elevation (metres)."""
+    rgb = np.asarray(rgb)
+    v = (rgb[0].astype(np.uint32) << 16) | (rgb[1].astype(np.uint32) << 8) | rgb[2].astype(np.uint32)
+    return (v.astype(np.float64) * 0.1 - 10000.0).astype(np.float32)
+
+
+def encode_tile(rgb, encoder="png"):
+    """(3, h, w) uint8 -> image bytes with one of ``ENCODERS``."""
+    from PIL import Image
+
+    fmt, options, _, _ = ENCODERS[encoder]
+    buf = BytesIO()
+    Image.fromarray(np.ascontiguousarray(np.transpose(rgb, (1, 2, 0)))).save(buf, format=fmt, **options)
+    return buf.getvalue()
+
+
+@lru_cache(maxsize=None)
+def blank_tile(tilesize, encoder="png"):
+    """Encoded flat sea-level tile; built once per (tilesize, encoder)."""
+    rgb = np.empty((3, tilesize, tilesize), dtype=np.uint8)
+    rgb[:] = np.array(SEA_LEVEL_RGB, dtype=np.uint8)[:, None, None]
+    return encode_tile(rgb, encoder)
+
+
+class TerrainTileRenderer:
+    """Renders terrain-RGB PNG tiles from a DEM.
+
+    Each worker thread keeps one open ``rio_tiler`` reader instead of reopening
+    the dataset per request.
+    """
+
+    def __init__(self, dem_path, tilesize=512, resampling="cubic_spline", encoder="png"):
+        if encoder not in ENCODERS:
+            raise ValueError(f"unknown tile encoder {encoder!r}; expected one of {sorted(ENCODERS)}")
+        self.dem_path = dem_path
+        self.tilesize = tilesize
+        self.resampling = resampling
+        self.encoder = encoder
+        self._local = threading.local()
+        self._readers = []
+        self._readers_lock = threading.Lock()
+
+    def _reader(self):
+        src = getattr(self._local, "reader", None)
+        if src is None:
+            from rio_tiler.io import Reader
+
+            src = Reader(self.dem_path)
+            self._local.reader = src
+            with self._readers_lock:
+                self._readers.append(src)
+        return src
+
+    def elevation(self, z, x, y):
+        """Resampled elevation for tile z/x/y, NaN where the DEM has no data.
+
+        Raises ``TileOutsideBounds`` off the DEM.
+        """
+        img = self._reader().tile(
+            x, y, z, tilesize=self.tilesize, resampling_method=self.resampling
+        )
+        return img.array[0].astype(np.float64).filled(np.nan)
+
+    def render(self, z, x, y):
+        """Encoded bytes for tile z/x/y, nodata as sea level; raises ``TileOutsideBounds`` off the DEM."""
+        return encode_tile(elevation_to_terrain_rgb(self.elevation(z, x, y)), self.encoder)
+
+    def close(self):
+        """Close the readers; ones opened by other threads are left to process exit."""
+        from rasterio.errors import EnvError
+
+        with self._readers_lock:
+            for src in self._readers:
+                try:
+                    src.close()
+                except EnvError:
+                    # GDAL environments are per thread.
+                    pass
+            self._readers.clear()
+        self._local = threading.local()
+
+
+class TileCache:
+    """Thread-safe LRU of encoded tiles bounded by total bytes.
+
+    Entries are ``(body, etag)`` keyed by ``(z, x, y, tilesize)``.
+    """
+
+    def __init__(self, max_bytes=128 * 2**20):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body):
+        entry = (body, etag(body))
+        if len(body) > self.max_bytes:
+            return entry
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._entries[key] = entry
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+        return entry
+
+
+def etag(body):
+    """Strong ETag for tile bytes."""
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
@@ -0,0 +1,242 @@
+"""In-process viewshed over the observer's radius window (R2-style radial sweep).
+
+    python -m los_module viewshed DEM.tif 7.0517 45.7876 --radius 10000 -o viewshed.tif
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+from dataclasses import dataclass
+
+import numpy as np
+from affine import Affine
+
+from .dem import bilinear
+from .destripe import destripe_mask, visible_bbox
+from .los import DEFAULT_MAX_SAMPLES, DEFAULT_REFRACTION, curvature_drop
+
+
+@dataclass
+class Viewshed:
+    """Visibility mask for the square window around an observer.
+
+    ``mask`` covers only the window (``transform`` is the window's affine);
+    cells outside the radius circle are always False.
+    """
+
+    mask: np.ndarray
+    transform: Affine
+    crs: object
+    observer: tuple
+    observer_height: float
+    radius: float
+
+    @property
+    def bounds(self):
+        """(left, bottom, right, top) of the window in the DEM CRS."""
+        h, w = self.mask.shape
+        left, top = self.transform * (0, 0)
+        right, bottom = self.transform * (w, h)
+        return min(left, right), min(bottom, top), max(left, right), max(bottom, top)
+
+    def crop(self, pad=0):
+        """Same viewshed cropped to the bounding box of its visible cells (plus ``pad``)."""
+        bbox = visible_bbox(self.mask, pad)
+        if bbox is None:
+            return self
+        rows, cols = bbox
+        transform = self.transform * Affine.translation(cols.start, rows.start)
+        return Viewshed(
+            self.mask[bbox], transform, self.crs, self.observer, self.observer_height, self.radius
+        )
+
+    def to_geotiff(self, path):
+        """Write the window as uint8 (1 = visible, 0 = nodata)."""
+        import rasterio
+
+        h, w = self.mask.shape
+        with rasterio.open(
+            path, "w", driver="GTiff", height=h, width=w, count=1, dtype="uint8",
+            crs=self.crs, transform=self.transform, nodata=0, compress="deflate",
+        ) as dst:
+            dst.write(self.mask.astype(np.uint8), 1)
+
+
+def viewshed(
+    dem,
+    observer,
+    radius,
+    observer_height=1.7,
+    target_height=0.0,
+    step=None,
+    max_samples=DEFAULT_MAX_SAMPLES,
+    curvature=True,
+    refraction=DEFAULT_REFRACTION,
+    destripe=False,
+):
+    """Compute the viewshed of one observer out to ``radius`` metres.
+
+    Rays are cast from the observer to every cell on the perimeter of the
+    radius window and sampled every ``step`` metres (default: one cell) up to
+    ``radius``; a cell is visible when its slope from the observer is at least
+    the running maximum terrain slope nearer along the ray. Only the
+    ``radius`` window of ``dem`` is read. Curvature and refraction enter as a
+    per-distance drop table added to the observer height (see ``curvature_drop``).
+    ``destripe`` fills the gaps between far rays (see ``los_module.destripe``).
+    """
+    dem.require_metric()
+    x, y = map(float, observer)
+    step = float(step or min(dem.res))
+    res_x, res_y = dem.res
+
+    row, col = dem.rowcol(x, y)
+    half_r, half_c = math.ceil(radius / res_y), math.ceil(radius / res_x)
+    r0, c0 = int(math.floor(row)) - half_r, int(math.floor(col)) - half_c
+    win = dem.window(r0, c0, 2 * half_r + 2, 2 * half_c + 2)
+    # Observer position inside the (possibly edge-clipped) window.
+    o_row, o_col = float(row) - max(r0, 0), float(col) - max(c0, 0)
+
+    # An observer more than ``radius`` off the raster leaves an empty window.
+    z_obs = float(bilinear(win.data, o_row, o_col)) + observer_height if win.data.size else math.nan
+    if not math.isfinite(z_obs):
+        raise ValueError("observer is outside the DEM or on a nodata cell")
+
+    az = _ray_azimuths(half_r, half_c, res_x, res_y)
+    sample_dist = np.arange(1, int(radius // step) + 1, dtype=np.float64) * step
+    mask = np.zeros(win.data.shape, dtype=bool)
+    mask[_cell(o_row, mask.shape[0]), _cell(o_col, mask.shape[1])] = True
+    if len(sample_dist) == 0:
+        return Viewshed(mask, win.transform, dem.crs, (x, y), observer_height, radius)
+
+    # Observer height relative to each sample distance, drop included.
+    z_ref = z_obs + curvature_drop(sample_dist, curvature, refraction)
+    chunk = max(1, max_samples // len(sample_dist))
+    for lo in range(0, len(az), chunk):
+        _sweep(win.data, mask, o_row, o_col, z_ref, az[lo:lo + chunk], sample_dist,
+               res_x, res_y, target_height)
+    if destripe:
+        mask = destripe_mask(mask)
+    return Viewshed(mask, win.transform, dem.crs, (x, y), observer_height, radius)
+
+
+def viewshed_from_file(path, observer, radius, res=None, crs=None, **kwargs):
+    """Viewshed that reads only the radius window of ``path`` from disk.
+
+    ``path`` is anything ``Dem.open`` reads, with ``observer`` in its CRS. A
+    terrain-RGB tile pyramid needs a metric ``crs`` to be reprojected into;
+    ``observer`` is then in ``crs``. ``res`` computes a coarser preview, served
+    from COG overviews when present.
+    """
+    from .dem import Dem
+
+    pad = 2 * max(res or 0, _cell_size(path))
+    x, y = map(float, observer)
+    r = radius + pad
+    dem = Dem.open(path, bounds=(x - r, y - r, x + r, y + r), res=res, crs=crs)
+    return viewshed(dem, (x, y), radius, **kwargs)
+
+
+def _cell_size(path):
+    """Largest native cell side of ``path``, without reading its pixels."""
+    import rasterio
+
+    from .dem import Dem
+    from .tile_dem import is_pyramid, shared_pyramid
+
+    if is_pyramid(path):
+        # Web-Mercator units, never smaller than ground metres.
+        return shared_pyramid(path).res
+    if str(path).endswith(".dem.json"):
+        return max(Dem.open(path).res)
+    with rasterio.open(path) as src:
+        return max(src.res)
+
+
+def _ray_azimuths(half_r, half_c, res_x, res_y):
+    """Azimuths (radians, map space) of rays through every window perimeter cell."""
+    r = np.arange(-half_r, half_r + 1)
+    c = np.arange(-half_c, half_c + 1)
+    dr = np.concatenate([np.full(len(c), -half_r), np.full(len(c), half_r), r[1:-1], r[1:-1]])
+    dc = np.concatenate([c, c, np.full(len(r) - 2, -half_c), np.full(len(r) - 2, half_c)])
+    return np.arctan2(dc * res_x, -dr * res_y)
+
+
+def _sweep(data, mask, o_row, o_col, z_ref, az, sample_dist, res_x, res_y, target_height, horizon0=None):
+    """Sweep one chunk of rays, OR their visible cells into ``mask``.
+
+    Returns each ray's horizon slope after its last sample and the highest
+    target slope it met. ``horizon0`` continues rays whose nearer samples were
+    swept by an earlier call.
+    """
+    rows = o_row - np.cos(az)[:, None] * (sample_dist / res_y)[None, :]
+    cols = o_col + np.sin(az)[:, None] * (sample_dist / res_x)[None, :]
+    ground = bilinear(data, rows, cols)
+
+    slope = (ground - z_ref[None, :]) / sample_dist[None, :]
+    horizon = np.maximum.accumulate(np.nan_to_num(slope, nan=-np.inf), axis=1)
+    start = np.full(len(az), -np.inf) if horizon0 is None else np.asarray(horizon0, dtype=np.float64)
+    horizon = np.maximum(horizon, start[:, None])
+    prev = np.concatenate([start[:, None], horizon[:, :-1]], axis=1)
+    target = slope + target_height / sample_dist[None, :]
+    seen = target >= prev
+
+    h, w = mask.shape
+    mask[_cell(rows[seen], h), _cell(cols[seen], w)] = True
+    return horizon[:, -1], np.nan_to_num(target, nan=-np.inf).max(axis=1)
+
+
+def _cell(v, n):
+    return np.clip(np.rint(v), 0, n - 1).astype(np.intp)
+
+
+def main(argv=None):
+    import rasterio
+    from pyproj import Transformer
+
+    from .tile_dem import is_pyramid
+
+    parser = argparse.ArgumentParser(description="Viewshed of one observer, read from the radius window only.")
+    parser.add_argument("dem", help="projected DEM (metres), or a terrain-RGB tile pyramid with --crs")
+    parser.add_argument("lng", type=float)
+    parser.add_argument("lat", type=float)
+    parser.add_argument("-o", "--output", default="viewshed.tif", help=".tif, .geojson or .fgb")
+    parser.add_argument("--radius", type=float, default=10_000)
+    parser.add_argument("--observer-height", type=float, default=1.7)
+    parser.add_argument("--target-height", type=float, default=0.0)
+    parser.add_argument("--refraction", type=float, default=DEFAULT_REFRACTION)
+    parser.add_argument("--no-curvature", action="store_true")
+    parser.add_argument("--destripe", action="store_true")
+    parser.add_argument("--crs", help="metric CRS to reproject a tile pyramid into, e.g. EPSG:25832")
+    args = parser.parse_args(argv)
+
+    crs = args.crs
+    if crs is None:
+        if is_pyramid(args.dem):
+            parser.error("tile pyramids are Web Mercator; pass a metric --crs to reproject them")
+        with rasterio.open(args.dem) as src:
+            crs = src.crs
+    observer = Transformer.from_crs("EPSG:4326", crs, always_xy=True).transform(args.lng, args.lat)
+    vs = viewshed_from_file(
+        args.dem, observer, args.radius, crs=args.crs,
+        observer_height=args.observer_height,
+        target_height=args.target_height,
+        curvature=not args.no_curvature,
+        refraction=args.refraction,
+        destripe=args.destripe,
+    )
+    if args.output.endswith((".geojson", ".json")):
+        from .export import save_json, viewshed_to_geojson
+
+        save_json(viewshed_to_geojson(vs), args.output)
+    elif args.output.endswith(".fgb"):
+        from .export import viewshed_to_flatgeobuf
+
+        viewshed_to_flatgeobuf(vs, args.output)
+    else:
+        vs.to_geotiff(args.output)
+    print(f"{int(vs.mask.sum())} of {vs.mask.size} cells visible -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Precomputed route visibility per waypoint, stored as chainage intervals.
+
+Build once offline::
+
+    python -m los_module.visibility_index DEM.tif TOR330-CERT-2025.gpx \\
+        ../apps/spectator/public/TOR330_waypoints.geojson -o route_visibility.json
+
+The JSON holds, per station, a flat ``[start0, end0, start1, end1, ...]`` list of
+route chainages (metres from the start) visible from it. Starts are sorted, so
+"is a runner at chainage c visible from station s" is one binary search.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import numbers
+
+import numpy as np
+
+from .los import DEFAULT_REFRACTION, line_of_sight
+from .route import chainage, geodesic_chainage, resample
+
+INDEX_VERSION = 1
+
+
+class RouteVisibilityIndex:
+    """Per-station visible chainage intervals with O(log n) lookups."""
+
+    def __init__(self, names, starts, ends, route_length, meta=None):
+        self.names = list(names)
+        self.starts = [np.asarray(s, dtype=np.float64) for s in starts]
+        self.ends = [np.asarray(e, dtype=np.float64) for e in ends]
+        self.route_length = float(route_length)
+        self.meta = dict(meta or {})
+        self._by_name = {name: i for i, name in enumerate(self.names)}
+
+    def station(self, name):
+        return self._by_name[name]
+
+    def visible(self, station, chainage):
+        """Whether ``chainage`` (scalar or array, metres) is visible from ``station``."""
+        i = station if isinstance(station, numbers.Integral) else self._by_name[station]
+        starts, ends = self.starts[i], self.ends[i]
+        c = np.asarray(chainage, dtype=np.float64)
+        j = np.searchsorted(starts, c, side="right") - 1
+        return (j >= 0) & (c <= ends[np.maximum(j, 0)]) if len(starts) else np.zeros(c.shape, bool)
+
+    def stations_seeing(self, chainage):
+        """Names of every station that sees the given chainage."""
+        return [n for i, n in enumerate(self.names) if self.visible(i, chainage)]
+
+    def to_json(self):
+        return {
+            "version": INDEX_VERSION,
+            "route_length": round(self.route_length, 1),
+            **self.meta,
+            "stations": [
+                {
+                    "name": name,
+                    "intervals": np.column_stack([s, e]).round(1).ravel().tolist(),
+                }
+                for name, s, e in zip(self.names, self.starts, self.ends)
+            ],
+        }
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_json(), f, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            doc = json.load(f)
+        if doc.get("version") != INDEX_VERSION:
+            raise ValueError(f"unsupported route visibility index version: {doc.get('version')}")
+        stations = doc.pop("stations")
+        route_length = doc.pop("route_length")
+        doc.pop("version")
+        flat = [np.asarray(s["intervals"], dtype=np.float64).reshape(-1, 2) for s in stations]
+        return cls(
+            [s["name"] for s in stations],
+            [f[:, 0] for f in flat],
+            [f[:, 1] for f in flat],
+            route_length,
+            doc,
+        )
+
+
+def build_route_index(
+    dem,
+    route_lnglat,
+    stations,
+    spacing=None,
+    max_range=20_000,
+    observer_height=1.7,
+    target_height=1.7,
+    curvature=True,
+    refraction=DEFAULT_REFRACTION,
+):
+    """Precompute visible route intervals for every station.
+
+    ``route_lnglat`` is the track as (lng, lat) arrays and ``stations`` is
+    ``(names, lng, lat)``. The route is resampled every ``spacing`` metres
+    (default: one DEM cell) and each station runs one batch LOS against the
+    route samples within ``max_range``. Intervals are stored in great-circle
+    chainage, the same as ``Track.chainage`` and the app's athlete distance.
+    """
+    spacing = float(spacing or min(dem.res))
+    lng, lat = (np.asarray(v, dtype=np.float64) for v in route_lnglat)
+    rx, ry = dem.lnglat_to_xy(lng, lat)
+    rx, ry = np.asarray(rx), np.asarray(ry)
+    planar, geodesic = chainage(rx, ry), geodesic_chainage(lng, lat)
+    rx, ry, ch = resample(rx, ry, spacing)
+
+    names, s_lng, s_lat = stations
+    sx, sy = dem.lnglat_to_xy(s_lng, s_lat)
+    starts, ends = [], []
+    for x, y in zip(np.atleast_1d(sx), np.atleast_1d(sy)):
+        near = np.flatnonzero(np.hypot(rx - x, ry - y) <= max_range)
+        seen = np.zeros(len(ch), dtype=bool)
+        if len(near) and np.isfinite(dem.sample(x, y)):
+            result = line_of_sight(
+                dem, (x, y), np.column_stack([rx[near], ry[near]]),
+                observer_height=observer_height, target_height=target_height,
+                curvature=curvature, refraction=refraction,
+            )
+            seen[near] = result.visible
+        s, e = _runs(seen, ch, spacing)
+        starts.append(np.interp(s, planar, geodesic))
+        ends.append(np.interp(e, planar, geodesic))
+
+    meta = {
+        "spacing": spacing,
+        "max_range": max_range,
+        "observer_height": observer_height,
+        "target_height": target_height,
+        "curvature": curvature,
+        "refraction": refraction,
+    }
+    return RouteVisibilityIndex(names, starts, ends, geodesic[-1], meta)
+
+
+def _runs(seen, ch, spacing):
+    """Chainage intervals covering runs of visible samples, padded by half a spacing."""
+    edges = np.diff(np.concatenate([[0], seen.astype(np.int8), [0]]))
+    first = np.flatnonzero(edges == 1)
+    last = np.flatnonzero(edges == -1) - 1
+    half = spacing / 2
+    return np.maximum(ch[first] - half, 0.0), np.minimum(ch[last] + half, ch[-1])
+
+
+def main(argv=None):
+    from .dem import Dem
+    from .route import read_track, read_waypoints
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("dem")
+    parser.add_argument("track")
+    parser.add_argument("waypoints")
+    parser.add_argument("-o", "--output", default="route_visibility.json")
+    parser.add_argument("--spacing", type=float, default=None)
+    parser.add_argument("--max-range", type=float, default=20_000)
+    parser.add_argument("--observer-height", type=float, default=1.7)
+    parser.add_argument("--target-height", type=float, default=1.7)
+    parser.add_argument("--refraction", type=float, default=DEFAULT_REFRACTION)
+    parser.add_argument("--no-curvature", action="store_true")
+    args = parser.parse_args(argv)
+
+    dem = Dem.open(args.dem)
+    index = build_route_index(
+        dem,
+        read_track(args.track),
+        read_waypoints(args.waypoints),
+        spacing=args.spacing,
+        max_range=args.max_range,
+        observer_height=args.observer_height,
+        target_height=args.target_height,
+        curvature=not args.no_curvature,
+        refraction=args.refraction,
+    )
+    index.save(args.output)
+    n = sum(len(s) for s in index.starts)
+    print(f"Wrote {args.output}: {len(index.names)} stations, {n} visible intervals")
+
+
+if __name__ == "__main__":
+    main()